@@ -0,0 +1,216 @@
+"""
+Fleet analytics over checkpoint sensor data.
+
+Grouping and counting run inside MongoDB as aggregation pipelines over the
+checkpoint_events collection. When percentiles or finer histograms are
+asked for, the relevant column is streamed out of MongoDB in batches (a
+projected find, or the aggregation's own cursor) into a compact array of
+floats and summarised with NumPy if it is installed (falling back to the
+standard library). Nothing server-side has to hold the whole column.
+
+Results are cached per sender and dropped as soon as that sender's packages
+get a new scan.
+"""
+
+import statistics
+import time
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from checkpoint_events import EVENTS_COLLECTION
+
+TEMPERATURE_BUCKETS = [-50, 0, 10, 20, 25, 30, 35, 40, 100]
+PERCENTILES = (50, 90, 95, 99)
+
+# Documents per round trip when streaming a column
+EXPORT_BATCH_SIZE = 10000
+
+
+def event_filter(sender_id: str, package_type=None, checkpoints=None, since=None, until=None) -> dict:
+    """`checkpoints` limits the events to those hubs (see CheckpointRegistry.between)."""
+    query = {"meta.sender_id": sender_id}
+    if package_type:
+        query["meta.package_type"] = package_type
+    if checkpoints is not None:
+        query["checkpoint_id"] = {"$in": list(checkpoints)}
+    window = {}
+    if since:
+        window["$gte"] = since
+    if until:
+        window["$lte"] = until
+    if window:
+        query["scanned_at"] = window
+    return query
+
+
+async def temperature_report(db, query: dict, threshold: float, columnar: bool = False) -> dict:
+    temperature = "$esp32_data.temperature"
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "by_checkpoint": [
+                {"$group": {
+                    "_id": "$checkpoint_id",
+                    "readings": {"$sum": 1},
+                    "avg_temperature": {"$avg": temperature},
+                    "min_temperature": {"$min": temperature},
+                    "max_temperature": {"$max": temperature},
+                    "readings_over_threshold": {"$sum": {"$cond": [{"$gt": [temperature, threshold]}, 1, 0]}}
+                }},
+                {"$sort": {"_id": 1}}
+            ],
+            "packages_over_threshold": [
+                {"$match": {"esp32_data.temperature": {"$gt": threshold}}},
+                {"$group": {"_id": "$meta.package_id"}},
+                {"$count": "count"}
+            ],
+            "histogram": [
+                {"$bucket": {
+                    "groupBy": temperature,
+                    "boundaries": TEMPERATURE_BUCKETS,
+                    "default": "out_of_range",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ]
+        }}
+    ]
+    facets = (await db[EVENTS_COLLECTION].aggregate(pipeline).to_list(length=1))[0]
+
+    report = {
+        "threshold": threshold,
+        "packages_over_threshold": facets["packages_over_threshold"][0]["count"] if facets["packages_over_threshold"] else 0,
+        "by_checkpoint": [
+            {"checkpoint_id": row.pop("_id"), **row} for row in facets["by_checkpoint"]
+        ],
+        "histogram": [
+            {"bucket_start": row["_id"], "count": row["count"]} for row in facets["histogram"]
+        ]
+    }
+    if columnar:
+        report["distribution"] = summarize(await export_column(db, query, "esp32_data.temperature"))
+    return report
+
+
+async def transit_time_report(db, query: dict, columnar: bool = False) -> dict:
+    """Time from a scan at each hub to the package's next scan, grouped by hub."""
+    pipeline = [
+        {"$match": query},
+        {"$setWindowFields": {
+            "partitionBy": "$meta.package_id",
+            "sortBy": {"scanned_at": 1},
+            "output": {"next_scanned_at": {"$shift": {"output": "$scanned_at", "by": 1}}}
+        }},
+        {"$match": {"next_scanned_at": {"$ne": None}}},
+        {"$project": {
+            "checkpoint_id": 1,
+            "seconds": {"$divide": [{"$subtract": ["$next_scanned_at", "$scanned_at"]}, 1000]}
+        }}
+    ]
+    grouped = pipeline + [
+        {"$group": {
+            "_id": "$checkpoint_id",
+            "departures": {"$sum": 1},
+            "avg_seconds": {"$avg": "$seconds"},
+            "max_seconds": {"$max": "$seconds"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    rows = await db[EVENTS_COLLECTION].aggregate(grouped).to_list(length=None)
+    report = {"by_checkpoint": [{"checkpoint_id": row.pop("_id"), **row} for row in rows]}
+
+    if columnar:
+        columns = {}
+        cursor = db[EVENTS_COLLECTION].aggregate(pipeline, allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+        async for row in cursor:
+            columns.setdefault(row["checkpoint_id"], array("d")).append(row["seconds"])
+        distributions = {checkpoint_id: summarize(values) for checkpoint_id, values in columns.items()}
+        for row in report["by_checkpoint"]:
+            row["distribution"] = distributions.get(row["checkpoint_id"])
+    return report
+
+
+async def export_column(db, query: dict, field: str) -> array:
+    """Stream one numeric field (a dotted path) of every matching event into an array of floats."""
+    path = field.split(".")
+    values = array("d")
+    cursor = db[EVENTS_COLLECTION].find(
+        {**query, field: {"$type": "number"}}, {field: 1, "_id": 0}
+    ).batch_size(EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        for part in path:
+            doc = doc[part]
+        values.append(doc)
+    return values
+
+
+def summarize(values, bins: int = 10) -> dict:
+    """Percentiles and an equal-width histogram of a column of numbers."""
+    if not values:
+        return {"count": 0}
+
+    if np is not None:
+        column = np.asarray(values, dtype=float)
+        counts, edges = np.histogram(column, bins=bins)
+        return {
+            "count": int(column.size),
+            "mean": float(column.mean()),
+            "percentiles": {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(column, PERCENTILES))},
+            "histogram": {"edges": edges.tolist(), "counts": counts.tolist()}
+        }
+
+    ordered = sorted(values)
+    low, high = ordered[0], ordered[-1]
+    width = (high - low) / bins or 1
+    counts = [0] * bins
+    for v in ordered:
+        counts[min(int((v - low) / width), bins - 1)] += 1
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else [ordered[0]] * 99
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "percentiles": {f"p{p}": cuts[p - 1] for p in PERCENTILES},
+        "histogram": {"edges": [low + i * width for i in range(bins + 1)], "counts": counts}
+    }
+
+
+class AnalyticsCache:
+    """
+    Small LRU of report results, keyed by sender and query. Each sender has
+    a generation number that new scans bump, which makes all of that
+    sender's cached reports stale at once.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    def get(self, sender_id: str, key):
+        entry = self._entries.get((sender_id, key))
+        if entry is None:
+            return None
+        generation, stored_at, value = entry
+        if generation != self._generations.get(sender_id, 0) or time.monotonic() - stored_at > self.ttl:
+            del self._entries[(sender_id, key)]
+            return None
+        self._entries.move_to_end((sender_id, key))
+        return value
+
+    def generation(self, sender_id: str) -> int:
+        return self._generations.get(sender_id, 0)
+
+    def put(self, sender_id: str, key, value, generation: int):
+        """Store a report computed when the sender was at `generation`."""
+        self._entries[(sender_id, key)] = (generation, time.monotonic(), value)
+        self._entries.move_to_end((sender_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, sender_id: str):
+        self._generations[sender_id] = self._generations.get(sender_id, 0) + 1
@@ -0,0 +1,171 @@
+"""
+Streaming anomaly detection over ESP32 sensor readings.
+
+Each device keeps a fixed-size state object (exponentially weighted mean and
+variance per series, the previous reading and a smoothed battery drain
+rate), so processing a reading is O(1) and memory is bounded by the number
+of devices tracked. Devices that stop reporting are evicted least recently
+seen first once `max_devices` is reached.
+
+Checks per reading:
+  - threshold: temperature / humidity outside the allowed range
+  - spike: temperature changing faster than `temp_rate_max` per minute
+  - outlier: temperature or humidity more than `z_threshold` standard
+    deviations from the device's EWMA (after a warm-up period)
+  - battery_drain: smoothed battery drain faster than `battery_drain_max`
+    percent per hour
+  - shock: the device reported a shock
+The same kind of alert is raised at most once per `cooldown` seconds per
+device.
+"""
+
+import math
+from collections import OrderedDict
+
+
+class DeviceState:
+    __slots__ = (
+        "count", "last_at",
+        "temp_mean", "temp_var", "last_temp",
+        "hum_mean", "hum_var",
+        "battery_last", "battery_at", "drain_rate",
+        "alerted_at",
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.last_at = None
+        self.temp_mean = None
+        self.temp_var = 0.0
+        self.last_temp = None
+        self.hum_mean = None
+        self.hum_var = 0.0
+        self.battery_last = None
+        self.battery_at = None
+        self.drain_rate = None
+        self.alerted_at = {}
+
+
+class AnomalyDetector:
+    def __init__(
+        self,
+        max_devices: int = 100_000,
+        alpha: float = 0.1,
+        warmup: int = 10,
+        z_threshold: float = 4.0,
+        temp_min: float = -10.0,
+        temp_max: float = 45.0,
+        humidity_max: float = 90.0,
+        temp_rate_max: float = 2.0,
+        battery_drain_max: float = 5.0,
+        cooldown: float = 600.0,
+    ):
+        self.max_devices = max_devices
+        self.alpha = alpha
+        self.warmup = warmup
+        self.z_threshold = z_threshold
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.humidity_max = humidity_max
+        self.temp_rate_max = temp_rate_max
+        self.battery_drain_max = battery_drain_max
+        self.cooldown = cooldown
+        self._states = OrderedDict()
+        self.metrics = {"readings": 0, "alerts": 0, "evicted": 0}
+
+    def _state(self, device_id: str) -> DeviceState:
+        state = self._states.get(device_id)
+        if state is None:
+            if len(self._states) >= self.max_devices:
+                self._states.popitem(last=False)
+                self.metrics["evicted"] += 1
+            state = DeviceState()
+            self._states[device_id] = state
+        else:
+            self._states.move_to_end(device_id)
+        return state
+
+    def observe(self, device_id: str, reading: dict, at) -> list:
+        """
+        Feed one reading (fields as in ESP32Data / TelemetryReading) taken at
+        datetime `at`. Returns the alerts it triggered.
+        """
+        self.metrics["readings"] += 1
+        state = self._state(device_id)
+        now = at.timestamp()
+        alerts = []
+
+        temperature = reading.get("temperature")
+        humidity = reading.get("humidity")
+        battery = reading.get("battery_level")
+        elapsed = now - state.last_at if state.last_at is not None else None
+
+        if temperature is not None:
+            if temperature < self.temp_min or temperature > self.temp_max:
+                alerts.append(("threshold", f"Temperature {temperature}°C outside {self.temp_min}–{self.temp_max}°C"))
+            if elapsed and elapsed > 0 and state.last_temp is not None:
+                rate = abs(temperature - state.last_temp) / (elapsed / 60)
+                if rate > self.temp_rate_max:
+                    alerts.append(("spike", f"Temperature changing {rate:.1f}°C/min"))
+            z = self._zscore(temperature, state.temp_mean, state.temp_var, state.count)
+            if z is not None and abs(z) > self.z_threshold:
+                alerts.append(("outlier", f"Temperature {temperature}°C is {z:+.1f}σ from recent readings"))
+            state.temp_mean, state.temp_var = self._ewma(temperature, state.temp_mean, state.temp_var)
+            state.last_temp = temperature
+
+        if humidity is not None:
+            if humidity > self.humidity_max:
+                alerts.append(("threshold", f"Humidity {humidity}% above {self.humidity_max}%"))
+            z = self._zscore(humidity, state.hum_mean, state.hum_var, state.count)
+            if z is not None and abs(z) > self.z_threshold:
+                alerts.append(("outlier", f"Humidity {humidity}% is {z:+.1f}σ from recent readings"))
+            state.hum_mean, state.hum_var = self._ewma(humidity, state.hum_mean, state.hum_var)
+
+        if battery is not None:
+            if state.battery_last is not None and now > state.battery_at:
+                hours = (now - state.battery_at) / 3600
+                drop = state.battery_last - battery
+                if drop < 0:
+                    # Charged or swapped; start measuring again
+                    state.drain_rate = None
+                else:
+                    rate = drop / hours
+                    state.drain_rate = rate if state.drain_rate is None else state.drain_rate + self.alpha * (rate - state.drain_rate)
+                    if state.count >= self.warmup and state.drain_rate > self.battery_drain_max:
+                        alerts.append(("battery_drain", f"Battery draining {state.drain_rate:.1f}%/h"))
+            state.battery_last = battery
+            state.battery_at = now
+
+        if reading.get("shock_detected"):
+            alerts.append(("shock", "Shock detected"))
+
+        state.count += 1
+        if state.last_at is None or now > state.last_at:
+            state.last_at = now
+
+        raised = []
+        for kind, message in alerts:
+            last = state.alerted_at.get(kind)
+            if last is not None and now - last < self.cooldown:
+                continue
+            state.alerted_at[kind] = now
+            raised.append({"type": kind, "message": message, "device_id": device_id, "detected_at": at})
+        self.metrics["alerts"] += len(raised)
+        return raised
+
+    def _zscore(self, value, mean, var, count):
+        if mean is None or count < self.warmup or var <= 0:
+            return None
+        return (value - mean) / math.sqrt(var)
+
+    def _ewma(self, value, mean, var):
+        if mean is None:
+            return value, 0.0
+        delta = value - mean
+        return mean + self.alpha * delta, (1 - self.alpha) * (var + self.alpha * delta * delta)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["devices"] = len(self._states)
+        stats["max_devices"] = self.max_devices
+        return stats
@@ -0,0 +1,100 @@
+"""
+Replays synthetic ESP32 telemetry through the AnomalyDetector.
+
+Every device reports once a minute: temperature and humidity wandering
+around a per-device baseline, and a slowly draining battery. A small share
+of devices misbehave partway through (temperature spike, runaway battery
+drain, shock). Reports readings per second, alerts by type, and the memory
+held by the detector's per-device state once all devices are tracked.
+
+    python benchmarks/anomaly_replay.py [--devices 100000] [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomaly import AnomalyDetector  # noqa: E402
+
+
+def replay(detector: AnomalyDetector, devices: int, rounds: int, faulty: float, seed: int) -> tuple:
+    rng = random.Random(seed)
+    baselines = [(rng.uniform(2, 30), rng.uniform(30, 70)) for _ in range(devices)]
+    faults = {
+        device: rng.choice(("spike", "drain", "shock"))
+        for device in rng.sample(range(devices), int(devices * faulty))
+    }
+    fault_round = rounds // 2
+    ids = [f"ESP32-{device:06d}" for device in range(devices)]
+    start = datetime(2026, 1, 1)
+
+    alerts = Counter()
+    readings = 0
+    elapsed = 0.0
+    for r in range(rounds):
+        at = start + timedelta(minutes=r)
+        batch = []
+        for device in range(devices):
+            temperature, humidity = baselines[device]
+            reading = {
+                "temperature": temperature + rng.gauss(0, 0.3),
+                "humidity": humidity + rng.gauss(0, 1.0),
+                "battery_level": 100 - r // 30,
+                "shock_detected": False,
+            }
+            fault = faults.get(device) if r >= fault_round else None
+            if fault == "spike":
+                reading["temperature"] += 15
+            elif fault == "drain":
+                reading["battery_level"] = max(0, 100 - 2 * (r - fault_round + 1))
+            elif fault == "shock" and r == fault_round:
+                reading["shock_detected"] = True
+            batch.append((ids[device], reading))
+
+        started = time.perf_counter()
+        for device_id, reading in batch:
+            for alert in detector.observe(device_id, reading, at):
+                alerts[alert["type"]] += 1
+        elapsed += time.perf_counter() - started
+        readings += len(batch)
+    return readings, elapsed, alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--faulty", type=float, default=0.01, help="share of devices that misbehave")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    detector = AnomalyDetector(max_devices=args.devices)
+    # One round to track every device, measured on its own for memory
+    replay(detector, args.devices, 1, 0, args.seed)
+    held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    readings, elapsed, alerts = replay(
+        AnomalyDetector(max_devices=args.devices), args.devices, args.rounds, args.faulty, args.seed
+    )
+
+    print(f"Devices tracked:     {detector.stats()['devices']}")
+    print(f"Detector memory:     {held / 2**20:.1f} MiB ({held / args.devices:.0f} bytes per device)")
+    print(f"Readings replayed:   {readings} over {args.rounds} rounds")
+    print(f"Throughput:          {readings / elapsed:,.0f} readings/s "
+          f"({elapsed / readings * 1e6:.2f} µs per reading)")
+    print(f"Alerts:              {dict(sorted(alerts.items()))}")
+    print(f"Misbehaving devices: {int(args.devices * args.faulty)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Package ID, token and PIN generation throughput across workers.
+
+Starts `--workers` processes, each with its own PackageIdGenerator node id
+as separate API workers would have, generates `--ids` package IDs in each,
+and checks that all of them are unique and that each worker's IDs sort in
+generation order. Tokens and PINs are timed the same way. The target is
+100k IDs/s across workers.
+
+    python benchmarks/id_throughput.py [--workers 4] [--ids 250000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_generator import PackageIdGenerator, new_package_token, new_pin  # noqa: E402
+
+TARGET_PER_SECOND = 100_000
+
+
+def generate_ids(node_id: int, count: int) -> tuple:
+    generator = PackageIdGenerator(node_id)
+    started = time.perf_counter()
+    ids = generator.next_ids(count)
+    return time.perf_counter() - started, ids
+
+
+def generate_tokens(count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        new_package_token()
+        new_pin()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ids", type=int, default=250_000, help="IDs per worker")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        # Warm the pool up so process start-up isn't timed
+        list(pool.map(generate_tokens, [1] * args.workers))
+
+        started = time.perf_counter()
+        results = list(pool.map(generate_ids, range(args.workers), [args.ids] * args.workers))
+        wall = time.perf_counter() - started
+        token_times = list(pool.map(generate_tokens, [args.ids] * args.workers))
+
+    total = args.workers * args.ids
+    all_ids = set()
+    for _, ids in results:
+        if ids != sorted(ids):
+            raise SystemExit("❌ A worker's IDs are not in generation order")
+        all_ids.update(ids)
+    if len(all_ids) != total:
+        raise SystemExit(f"❌ {total - len(all_ids)} duplicate IDs")
+
+    per_worker = [args.ids / elapsed for elapsed, _ in results]
+    combined = total / wall
+    print(f"{total} IDs from {args.workers} workers, all unique and ordered per worker")
+    print(f"  per worker:  {min(per_worker):,.0f} - {max(per_worker):,.0f} IDs/s")
+    print(f"  combined:    {combined:,.0f} IDs/s (wall clock, including result transfer)")
+    print(f"  tokens+PINs: {sum(args.ids / t for t in token_times):,.0f} pairs/s combined")
+    print(f"{'✅' if combined >= TARGET_PER_SECOND else '⚠️'} target {TARGET_PER_SECOND:,} IDs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Bytes on the wire and latency of the dashboard listing queries, before and
+after pushing the shaping into MongoDB.
+
+Seeds a scratch database with 10k packages that still embed 20 checkpoints
+each (the layout the old code read), then compares, per listing:
+
+  - before: find() returning whole package documents, shaped in Python
+  - after:  the aggregation the endpoints run now ($project of
+            DELIVERY_LISTING_FIELDS / SENDER_LISTING_FIELDS)
+
+Bytes are the BSON size of what the server returned. Needs a MongoDB
+server (MONGO_URI, default localhost); the scratch database is dropped
+afterwards.
+
+    python benchmarks/listing_queries.py [--packages 10000] [--checkpoints 20]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET", "benchmark")
+
+from main import DELIVERY_LISTING_FIELDS, SENDER_LISTING_FIELDS  # noqa: E402
+from pagination import DEFAULT_PAGE_SIZE  # noqa: E402
+
+DATABASE = "veriseal_listing_benchmark"
+SENDER = "sender-1"
+
+
+def legacy_package(i: int, checkpoints: int, now: datetime) -> dict:
+    created = now - timedelta(minutes=i)
+    return {
+        "package_id": f"PKG{i:013d}",
+        "package_token": f"token-{i:026d}",
+        "order_id": f"ORD-{i}",
+        "package_type": "electronics",
+        "device_id": f"ESP32-{i % 500}",
+        "sender_id": SENDER,
+        "receiver_phone": "+910000000000",
+        "pin": "123456",
+        "authenticated": False,
+        "current_status": "at_checkpoint",
+        "current_checkpoint": "CP003",
+        "current_location": "Delhi Transit Hub",
+        "checkpoints": [
+            {
+                "checkpoint_id": f"CP00{c % 6 + 1}",
+                "name": "Transit Hub",
+                "location": "Delhi Transit Hub",
+                "scanned_by": "courier-1",
+                "scanned_at": created + timedelta(minutes=c),
+                "esp32_data": {
+                    "temperature": 20.0 + c % 7,
+                    "humidity": 55.0,
+                    "tamper_status": "secure",
+                    "battery_level": 90 - c,
+                    "shock_detected": False,
+                    "gps_location": "28.7041,77.1025",
+                },
+                "status": "passed",
+                "notes": None,
+            }
+            for c in range(checkpoints)
+        ],
+        "created_at": created,
+        "updated_at": created + timedelta(minutes=checkpoints),
+        "notes": None,
+    }
+
+
+def shape_delivery(package: dict) -> dict:
+    """What get_delivery_packages used to build from each full document."""
+    return {
+        "_id": str(package["_id"]),
+        "package_id": package["package_id"],
+        "order_id": package["order_id"],
+        "package_type": package["package_type"],
+        "current_status": package["current_status"],
+        "current_location": package["current_location"],
+        "current_checkpoint": package.get("current_checkpoint"),
+        "updated_at": package["updated_at"],
+        "checkpoints_count": len(package.get("checkpoints", [])),
+    }
+
+
+def shape_sender(package: dict) -> dict:
+    """What get_sender_packages used to build from each full document."""
+    checkpoints = package.get("checkpoints", [])
+    return {
+        "_id": str(package["_id"]),
+        "package_id": package["package_id"],
+        "order_id": package["order_id"],
+        "package_type": package["package_type"],
+        "device_id": package["device_id"],
+        "current_status": package["current_status"],
+        "current_location": package["current_location"],
+        "current_checkpoint": package.get("current_checkpoint"),
+        "checkpoints_count": len(checkpoints),
+        "latest_esp32_data": checkpoints[-1]["esp32_data"] if checkpoints else None,
+        "created_at": package["created_at"],
+        "updated_at": package["updated_at"],
+    }
+
+
+async def before(collection, query: dict, sort: list, limit: int, shape) -> tuple:
+    started = time.perf_counter()
+    docs = await collection.find(query).sort(sort).limit(limit).to_list(length=None)
+    size = sum(len(bson.encode(doc)) for doc in docs)
+    [shape(doc) for doc in docs]
+    return time.perf_counter() - started, size
+
+
+async def after(collection, query: dict, sort: list, limit: int, fields: dict) -> tuple:
+    started = time.perf_counter()
+    pipeline = [{"$match": query}, {"$sort": dict(sort)}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": fields})
+    docs = await collection.aggregate(pipeline).to_list(length=None)
+    size = sum(len(bson.encode(doc)) for doc in docs)
+    return time.perf_counter() - started, size
+
+
+async def measure(label: str, runs: int, old, new):
+    results = {}
+    for name, run in (("before", old), ("after", new)):
+        await run()  # warm-up
+        timings, size = [], 0
+        for _ in range(runs):
+            elapsed, size = await run()
+            timings.append(elapsed)
+        results[name] = (statistics.median(timings), size)
+
+    (old_time, old_size), (new_time, new_size) = results["before"], results["after"]
+    print(f"{label}")
+    print(f"  before: {old_size / 1024:10.1f} KiB  {old_time * 1000:8.2f} ms")
+    print(f"  after:  {new_size / 1024:10.1f} KiB  {new_time * 1000:8.2f} ms")
+    print(f"  before/after: bytes {old_size / max(new_size, 1):.1f}x, latency {old_time / max(new_time, 1e-9):.2f}x")
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import ASCENDING, DESCENDING
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--packages", type=int, default=10_000)
+    parser.add_argument("--checkpoints", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    db = client[DATABASE]
+    packages = db.packages
+    try:
+        await packages.drop()
+        now = datetime.now()
+        print(f"Seeding {args.packages} packages with {args.checkpoints} embedded checkpoints each...")
+        for start in range(0, args.packages, 1000):
+            await packages.insert_many([
+                legacy_package(i, args.checkpoints, now) for i in range(start, min(start + 1000, args.packages))
+            ])
+        await packages.create_index([("updated_at", DESCENDING), ("_id", DESCENDING)])
+        await packages.create_index([("sender_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+
+        delivery_sort = [("updated_at", -1), ("_id", -1)]
+        sender_sort = [("created_at", -1), ("_id", -1)]
+        sender_query = {"sender_id": SENDER}
+        for label, limit in ((f"page of {DEFAULT_PAGE_SIZE}", DEFAULT_PAGE_SIZE), (f"all {args.packages}", 0)):
+            runs = args.runs if limit else max(1, args.runs // 10)
+            await measure(
+                f"/delivery/packages, {label}", runs,
+                lambda: before(packages, {}, delivery_sort, limit, shape_delivery),
+                lambda: after(packages, {}, delivery_sort, limit, DELIVERY_LISTING_FIELDS),
+            )
+            await measure(
+                f"/sender/packages, {label}", runs,
+                lambda: before(packages, sender_query, sender_sort, limit, shape_sender),
+                lambda: after(packages, sender_query, sender_sort, limit, SENDER_LISTING_FIELDS),
+            )
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,100 @@
+"""
+Helpers for reading large request bodies incrementally.
+"""
+
+import codecs
+import json
+
+# Longest single element aiter_json_array will buffer, in characters
+MAX_JSON_ITEM_SIZE = 1024 * 1024
+
+
+class InvalidBody(ValueError):
+    """The body isn't what the endpoint accepts; raised mid-stream, after earlier items were yielded."""
+
+
+async def aiter_lines(request):
+    """Yield the non-empty lines of a request body as bytes, without reading it all first."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def aiter_json_array(chunks, max_item_size: int = MAX_JSON_ITEM_SIZE):
+    """
+    Yield the elements of a JSON array as its bytes stream in (`chunks`,
+    e.g. request.stream()), holding at most one element's text at a time.
+    Raises InvalidBody if the body isn't a JSON array, or an element is
+    invalid or longer than `max_item_size` characters.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = chunks.__aiter__()
+    buffer, eof = "", False
+    expect = "["  # then "first" (a value or "]"), "," (or "]"), "value", "end"
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer and expect == "[":
+            if buffer[0] != "[":
+                raise InvalidBody("Body must be a JSON array")
+            buffer, expect = buffer[1:], "first"
+            continue
+        if buffer and expect in ("first", ","):
+            if buffer[0] == "]":
+                buffer, expect = buffer[1:], "end"
+                continue
+            if expect == ",":
+                if buffer[0] != ",":
+                    raise InvalidBody("Expected ',' between JSON array elements")
+                buffer, expect = buffer[1:], "value"
+                continue
+            expect = "value"
+        if buffer and expect == "value":
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                end = None
+            # A value running to the end of what has arrived may continue in the next chunk
+            if end is not None and (end < len(buffer) or eof):
+                yield item
+                buffer, expect = buffer[end:], ","
+                continue
+            if eof:
+                raise InvalidBody("Invalid JSON array element")
+            if len(buffer) > max_item_size:
+                raise InvalidBody(f"JSON array element longer than {max_item_size} characters")
+
+        if buffer and expect == "end":
+            raise InvalidBody("Unexpected data after the JSON array")
+        if eof:
+            if expect == "end":
+                return
+            raise InvalidBody("Body ended inside the JSON array")
+        try:
+            buffer += utf8.decode(await chunks.__anext__())
+        except StopAsyncIteration:
+            buffer += utf8.decode(b"", final=True)
+            eof = True
+        except UnicodeDecodeError as e:
+            raise InvalidBody(str(e))
+
+
+async def aiter_chunks(lines, size: int):
+    """Group an async iterator of items into lists of up to `size` items."""
+    chunk = []
+    async for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,150 @@
+"""
+Checkpoint scans stored as individual events.
+
+Each scan is one document in the `checkpoint_events` time-series collection,
+with the package it belongs to in the `meta` field. The package document
+only keeps a summary (count, latest sensor reading, last status), so it
+stays the same size however long the journey gets.
+
+Run this file directly to move checkpoints still embedded in package
+documents into the events collection:
+
+    python checkpoint_events.py
+"""
+
+import asyncio
+import os
+
+from pymongo import UpdateOne
+
+from indexes import ensure_timeseries_collection
+
+EVENTS_COLLECTION = "checkpoint_events"
+
+# Fields the event keeps from a checkpoint entry (everything but the package link)
+EVENT_FIELDS = ("checkpoint_id", "name", "location", "scanned_by", "scanned_at", "esp32_data", "status", "notes")
+
+
+async def ensure_events_collection(db):
+    """Create checkpoint_events as a time-series collection if it doesn't exist yet."""
+    await ensure_timeseries_collection(db, EVENTS_COLLECTION, "scanned_at", "meta", "minutes")
+
+
+def event_meta(package: dict) -> dict:
+    return {
+        "package_id": package["package_id"],
+        "sender_id": package.get("sender_id"),
+        "package_type": package.get("package_type"),
+        "device_id": package.get("device_id"),
+    }
+
+
+def build_event(package: dict, checkpoint_entry: dict) -> dict:
+    event = {field: checkpoint_entry.get(field) for field in EVENT_FIELDS}
+    event["meta"] = event_meta(package)
+    return event
+
+
+def summary_update(checkpoint_entry: dict) -> dict:
+    """Fields to $set on the package after one more checkpoint scan."""
+    return {
+        "latest_esp32_data": checkpoint_entry.get("esp32_data"),
+        "last_checkpoint_status": checkpoint_entry.get("status"),
+        "last_scanned_at": checkpoint_entry.get("scanned_at"),
+    }
+
+
+def summarize(checkpoints: list) -> dict:
+    """Summary fields for a package with the given full list of checkpoints."""
+    summary = {
+        "checkpoints_count": len(checkpoints),
+        "latest_esp32_data": None,
+        "last_checkpoint_status": None,
+        "last_scanned_at": None,
+        "hub_arrived_at": None,
+    }
+    if checkpoints:
+        summary.update(summary_update(checkpoints[-1]))
+        # First scan of the run at the package's current hub
+        arrival = len(checkpoints) - 1
+        while arrival > 0 and checkpoints[arrival - 1].get("checkpoint_id") == checkpoints[-1].get("checkpoint_id"):
+            arrival -= 1
+        summary["hub_arrived_at"] = checkpoints[arrival].get("scanned_at")
+    return summary
+
+
+def event_to_checkpoint(event: dict) -> dict:
+    """Shape an event the way embedded checkpoints used to look in API responses."""
+    return {field: event.get(field) for field in EVENT_FIELDS}
+
+
+async def migrate_embedded_checkpoints(db, batch_size: int = 500) -> int:
+    """
+    Stream packages that still embed a `checkpoints` array, write their
+    checkpoints out as events and replace the array with summary fields.
+    Safe to re-run: events from an interrupted batch are replaced, and
+    scans recorded on a package before it was migrated are kept.
+    """
+    migrated = 0
+    cursor = db.packages.find(
+        {"checkpoints": {"$exists": True}},
+        {"package_id": 1, "sender_id": 1, "package_type": 1, "device_id": 1, "checkpoints": 1, "last_scanned_at": 1},
+        batch_size=batch_size
+    )
+
+    batch = []
+    async for package in cursor:
+        batch.append(package)
+        if len(batch) >= batch_size:
+            migrated += await _migrate_batch(db, batch)
+            batch = []
+    if batch:
+        migrated += await _migrate_batch(db, batch)
+
+    return migrated
+
+
+async def _migrate_batch(db, packages: list) -> int:
+    package_ids = [p["package_id"] for p in packages]
+    await db[EVENTS_COLLECTION].delete_many({"meta.package_id": {"$in": package_ids}, "meta.migrated": True})
+
+    events = []
+    for p in packages:
+        for entry in p.get("checkpoints") or []:
+            event = build_event(p, entry)
+            event["meta"]["migrated"] = True
+            events.append(event)
+    if events:
+        await db[EVENTS_COLLECTION].insert_many(events, ordered=False)
+
+    updates = []
+    for p in packages:
+        checkpoints = p.get("checkpoints") or []
+        if p.get("last_scanned_at"):
+            # Scanned since the deploy: its summary is already newer than the array
+            update = {"$inc": {"checkpoints_count": len(checkpoints)}}
+        else:
+            update = {"$set": summarize(checkpoints)}
+        update["$unset"] = {"checkpoints": ""}
+        updates.append(UpdateOne({"_id": p["_id"]}, update))
+    await db.packages.bulk_write(updates, ordered=False)
+
+    return len(packages)
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    db = client["veriseal_db"]
+
+    await ensure_events_collection(db)
+    migrated = await migrate_embedded_checkpoints(db)
+    print(f"✅ Migrated checkpoints for {migrated} packages")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
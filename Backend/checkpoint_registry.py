@@ -0,0 +1,175 @@
+"""
+Checkpoint (hub) registry.
+
+Hubs live in the `checkpoints` collection: id, name, location, coordinates
+and the checkpoints a package may be scanned at next. The registry loads
+them into an immutable snapshot at startup and swaps in a fresh snapshot
+when the collection changes (via a change stream where available, or
+every `ttl` seconds otherwise), so lookups never touch the database. Each
+snapshot comes with its compiled journey state machine (`transitions`,
+see state_machine.py) and its hubs in journey order (see `between`).
+
+An empty collection is seeded with the original six hubs.
+"""
+
+import asyncio
+import bisect
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from state_machine import compile_transitions
+
+COLLECTION = "checkpoints"
+
+DEFAULT_CHECKPOINTS = [
+    {"checkpoint_id": "CP001", "name": "Warehouse Dispatch", "location": "Mumbai Warehouse",
+     "coordinates": [19.0760, 72.8777], "initial": True, "next_hops": ["CP002"]},
+    {"checkpoint_id": "CP002", "name": "Local Hub", "location": "Mumbai Central Hub",
+     "coordinates": [19.0760, 72.8777], "initial": False, "next_hops": ["CP003", "CP004", "CP005"]},
+    {"checkpoint_id": "CP003", "name": "Transit Hub", "location": "Delhi Transit Hub",
+     "coordinates": [28.7041, 77.1025], "initial": False, "next_hops": ["CP004"]},
+    {"checkpoint_id": "CP004", "name": "Destination Hub", "location": "Bangalore Hub",
+     "coordinates": [12.9716, 77.5946], "initial": False, "next_hops": ["CP005"]},
+    {"checkpoint_id": "CP005", "name": "Out for Delivery", "location": "Local Delivery Center",
+     "coordinates": [12.9716, 77.5946], "initial": False, "next_hops": ["CP006"]},
+    {"checkpoint_id": "CP006", "name": "Delivered", "location": "Customer Location",
+     "coordinates": None, "initial": False, "next_hops": []},
+]
+
+
+class Checkpoint(NamedTuple):
+    checkpoint_id: str
+    name: str
+    location: str
+    coordinates: Optional[tuple]
+    initial: bool
+    next_hops: frozenset
+
+    def to_dict(self) -> dict:
+        return {
+            "checkpoint_id": self.checkpoint_id,
+            "name": self.name,
+            "location": self.location,
+            "coordinates": list(self.coordinates) if self.coordinates else None,
+            "initial": self.initial,
+            "next_hops": sorted(self.next_hops),
+        }
+
+
+def _journey_order(checkpoints) -> tuple:
+    """
+    Checkpoint ids in journey order: every hub comes after the hubs that
+    lead to it (ties, and any hubs on a cycle, by id).
+    """
+    incoming = {checkpoint_id: 0 for checkpoint_id in checkpoints}
+    for checkpoint in checkpoints.values():
+        for hop in checkpoint.next_hops:
+            if hop in incoming:
+                incoming[hop] += 1
+    ready = sorted(checkpoint_id for checkpoint_id, count in incoming.items() if count == 0)
+    order = []
+    while ready:
+        checkpoint_id = ready.pop(0)
+        order.append(checkpoint_id)
+        for hop in sorted(checkpoints[checkpoint_id].next_hops):
+            if hop in incoming:
+                incoming[hop] -= 1
+                if incoming[hop] == 0:
+                    bisect.insort(ready, hop)
+    placed = set(order)
+    return tuple(order + sorted(checkpoint_id for checkpoint_id in checkpoints if checkpoint_id not in placed))
+
+
+def _snapshot(docs) -> MappingProxyType:
+    return MappingProxyType({
+        doc["checkpoint_id"]: Checkpoint(
+            checkpoint_id=doc["checkpoint_id"],
+            name=doc["name"],
+            location=doc["location"],
+            coordinates=tuple(doc["coordinates"]) if doc.get("coordinates") else None,
+            initial=bool(doc.get("initial", False)),
+            next_hops=frozenset(doc.get("next_hops", [])),
+        )
+        for doc in docs
+    })
+
+
+class CheckpointRegistry:
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        # Usable before startup (and if the database is unreachable) with the defaults
+        self._checkpoints = _snapshot(DEFAULT_CHECKPOINTS)
+        self._order = _journey_order(self._checkpoints)
+        self.transitions = compile_transitions(self._checkpoints.values())
+        self._task = None
+
+    # --- Lookups ---
+
+    def get(self, checkpoint_id: str) -> Optional[Checkpoint]:
+        return self._checkpoints.get(checkpoint_id)
+
+    def all(self) -> list:
+        return list(self._checkpoints.values())
+
+    def between(self, from_id: Optional[str] = None, to_id: Optional[str] = None) -> list:
+        """
+        Ids of the hubs from `from_id` to `to_id` inclusive, in journey
+        order; either end may be left open. Both must be known hubs.
+        """
+        start = self._order.index(from_id) if from_id else 0
+        end = self._order.index(to_id) + 1 if to_id else len(self._order)
+        return list(self._order[start:end])
+
+    def name(self, checkpoint_id: str) -> str:
+        checkpoint = self._checkpoints.get(checkpoint_id)
+        return checkpoint.name if checkpoint else f"Checkpoint {checkpoint_id}"
+
+    def location(self, checkpoint_id: str) -> str:
+        checkpoint = self._checkpoints.get(checkpoint_id)
+        return checkpoint.location if checkpoint else f"Location {checkpoint_id}"
+
+    # --- Loading ---
+
+    async def load(self, db):
+        docs = await db[COLLECTION].find({}, {"_id": 0}).to_list(length=None)
+        if not docs:
+            await db[COLLECTION].bulk_write([
+                UpdateOne({"checkpoint_id": doc["checkpoint_id"]}, {"$setOnInsert": doc}, upsert=True)
+                for doc in DEFAULT_CHECKPOINTS
+            ], ordered=False)
+            docs = await db[COLLECTION].find({}, {"_id": 0}).to_list(length=None)
+        checkpoints = _snapshot(docs)
+        self.transitions = compile_transitions(checkpoints.values())
+        self._order = _journey_order(checkpoints)
+        self._checkpoints = checkpoints
+
+    def start(self, db):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh(db))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh(self, db):
+        try:
+            async with db[COLLECTION].watch() as stream:
+                async for _ in stream:
+                    await self.load(db)
+        except PyMongoError as e:
+            print(f"Checkpoint change stream unavailable ({e}), refreshing every {self.ttl:.0f}s")
+
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.load(db)
+            except PyMongoError as e:
+                print(f"Error refreshing checkpoints: {e}")
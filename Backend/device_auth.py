@@ -0,0 +1,44 @@
+"""
+Per-device keys for ESP32 telemetry uploads.
+
+Each device gets its own random key, issued to the sender that owns the
+device and sent by the device with every upload in the X-Device-Key
+header. Only an HMAC-SHA256 of device id and key, under the server-side
+key that also protects PINs, is stored (in `devices`), and it is compared
+in constant time. Issuing a new key replaces the old one.
+"""
+
+import hashlib
+import hmac
+import secrets
+from datetime import datetime
+
+DEVICES_COLLECTION = "devices"
+DEVICE_KEY_HEADER = "X-Device-Key"
+
+
+def device_key_hash(key: bytes, device_id: str, device_key: str) -> str:
+    return hmac.new(key, f"{device_id}:{device_key}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+async def issue_device_key(db, key: bytes, device_id: str, sender_id: str) -> str:
+    """
+    Give `device_id` a new key, registering the device to `sender_id` if it
+    is new. Raises DuplicateKeyError if another sender owns the device.
+    """
+    device_key = secrets.token_urlsafe(32)
+    now = datetime.now()
+    await db[DEVICES_COLLECTION].update_one(
+        {"_id": device_id, "sender_id": sender_id},
+        {"$set": {"key_hash": device_key_hash(key, device_id, device_key), "key_issued_at": now},
+         "$setOnInsert": {"created_at": now}},
+        upsert=True
+    )
+    return device_key
+
+
+async def check_device_key(db, key: bytes, device_id: str, device_key: str) -> bool:
+    if not device_key:
+        return False
+    device = await db[DEVICES_COLLECTION].find_one({"_id": device_id}, {"key_hash": 1})
+    return device is not None and hmac.compare_digest(device["key_hash"], device_key_hash(key, device_id, device_key))
@@ -0,0 +1,181 @@
+"""
+Per-hub, per-hour dwell-time and throughput rollups.
+
+Every checkpoint scan updates up to two small documents in `hub_rollups`:
+  - the hub it was scanned at: an arrival if the package came from
+    elsewhere (a re-scan at the same hub is not one), plus a failure if
+    the scan didn't pass
+  - the hub it left, if it moved: departures, plus the time it sat there
+    since it arrived (the package's `hub_arrived_at`, which re-scans
+    don't move), counted into a fixed log-scaled histogram
+Both are keyed by (hub, hour), so a hub dashboard reads one document per
+hour regardless of how many packages went through.
+
+Run this file directly to rebuild all rollups from checkpoint_events,
+with checkpoint scans paused (see `backfill`):
+
+    python hub_rollups.py --scans-paused
+"""
+
+import argparse
+import asyncio
+import bisect
+import os
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from checkpoint_events import EVENTS_COLLECTION
+from indexes import INDEXES
+
+ROLLUP_COLLECTION = "hub_rollups"
+# Where backfill builds the new rollups before swapping them in
+STAGING_COLLECTION = "hub_rollups_rebuild"
+
+# Upper bounds (seconds) of the dwell-time buckets: 1m, 5m, 15m, 30m, 1h, 2h, 4h, 8h, 16h, 1d, 2d
+DWELL_BOUNDS = [60, 300, 900, 1800, 3600, 7200, 14400, 28800, 57600, 86400, 172800]
+DWELL_BUCKETS = [f"le_{bound}" for bound in DWELL_BOUNDS] + [f"gt_{DWELL_BOUNDS[-1]}"]
+
+
+def hour_of(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def dwell_bucket(seconds: float) -> str:
+    return DWELL_BUCKETS[bisect.bisect_left(DWELL_BOUNDS, seconds)]
+
+
+def scan_increments(previous_checkpoint, previous_arrived_at, checkpoint_id: str, status: str, scanned_at: datetime) -> dict:
+    """
+    Counter increments, keyed by (hub, hour), caused by one scan.
+    `previous_arrived_at` is when the package arrived at `previous_checkpoint`.
+    """
+    hour = hour_of(scanned_at)
+    increments = {}
+    if previous_checkpoint != checkpoint_id:
+        increments[(checkpoint_id, hour)] = {"arrivals": 1}
+    if status != "passed":
+        increments.setdefault((checkpoint_id, hour), {})["failures"] = 1
+
+    if previous_checkpoint and previous_arrived_at and previous_checkpoint != checkpoint_id:
+        dwell = max(0.0, (scanned_at - previous_arrived_at).total_seconds())
+        increments.setdefault((previous_checkpoint, hour), {}).update({
+            "departures": 1,
+            "dwell_seconds_total": dwell,
+            f"dwell_histogram.{dwell_bucket(dwell)}": 1
+        })
+    return increments
+
+
+def merge_increments(total: dict, increments: dict):
+    for key, counters in increments.items():
+        target = total.setdefault(key, {})
+        for field, value in counters.items():
+            target[field] = target.get(field, 0) + value
+
+
+async def apply_increments(db, increments: dict, collection: str = ROLLUP_COLLECTION):
+    if not increments:
+        return
+    await db[collection].bulk_write([
+        UpdateOne({"hub": hub, "hour": hour}, {"$inc": counters}, upsert=True)
+        for (hub, hour), counters in increments.items()
+    ], ordered=False)
+
+
+async def record_scan(db, previous_checkpoint, previous_arrived_at, checkpoint_id: str, status: str, scanned_at: datetime):
+    await apply_increments(db, scan_increments(previous_checkpoint, previous_arrived_at, checkpoint_id, status, scanned_at))
+
+
+async def hub_report(db, hub: str, since: datetime, until: datetime) -> dict:
+    """Hourly rows for one hub plus totals over the window."""
+    cursor = db[ROLLUP_COLLECTION].find(
+        {"hub": hub, "hour": {"$gte": hour_of(since), "$lte": until}},
+        {"_id": 0}
+    ).sort("hour", 1)
+
+    hours = []
+    totals = {"arrivals": 0, "departures": 0, "failures": 0, "dwell_seconds_total": 0.0}
+    histogram = dict.fromkeys(DWELL_BUCKETS, 0)
+    async for row in cursor:
+        hours.append(row)
+        for field in totals:
+            totals[field] += row.get(field, 0)
+        for bucket, count in row.get("dwell_histogram", {}).items():
+            histogram[bucket] = histogram.get(bucket, 0) + count
+
+    totals["avg_dwell_seconds"] = totals["dwell_seconds_total"] / totals["departures"] if totals["departures"] else None
+    return {
+        "hub": hub,
+        "since": since,
+        "until": until,
+        "totals": totals,
+        "dwell_histogram": histogram,
+        "dwell_bucket_bounds_seconds": DWELL_BOUNDS,
+        "hours": hours
+    }
+
+
+async def backfill(db, batch_size: int = 5000) -> int:
+    """
+    Rebuild every rollup from the event history. Events are streamed in
+    (package, time) order so only where the current package is, and since
+    when, is kept in memory; counters are flushed every `batch_size` events.
+
+    The new rollups are built in a staging collection and renamed over the
+    live one in a single step, so readers see the old rollups until then.
+    Scans recorded while this runs still update the old collection, which
+    the rename drops: pause scanning (and offline sync) for the duration.
+    """
+    staging = db[STAGING_COLLECTION]
+    await staging.drop()
+    await staging.create_indexes(INDEXES[ROLLUP_COLLECTION])
+
+    cursor = db[EVENTS_COLLECTION].find(
+        {},
+        {"meta.package_id": 1, "checkpoint_id": 1, "status": 1, "scanned_at": 1}
+    ).sort([("meta.package_id", 1), ("scanned_at", 1)]).batch_size(batch_size)
+
+    processed = 0
+    pending = {}
+    previous = (None, None, None)  # package_id, checkpoint_id, arrived_at
+    async for event in cursor:
+        package_id = event["meta"]["package_id"]
+        if package_id != previous[0]:
+            previous = (package_id, None, None)
+        merge_increments(pending, scan_increments(
+            previous[1], previous[2], event["checkpoint_id"], event.get("status"), event["scanned_at"]
+        ))
+        if event["checkpoint_id"] != previous[1]:
+            previous = (package_id, event["checkpoint_id"], event["scanned_at"])
+
+        processed += 1
+        if processed % batch_size == 0:
+            await apply_increments(db, pending, STAGING_COLLECTION)
+            pending = {}
+
+    await apply_increments(db, pending, STAGING_COLLECTION)
+    await staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    return processed
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Rebuild hub rollups from checkpoint_events")
+    parser.add_argument("--scans-paused", action="store_true", help="confirm no checkpoint scans are being recorded")
+    if not parser.parse_args().scans_paused:
+        parser.error("pause checkpoint scans first, then pass --scans-paused; scans recorded during the rebuild are lost")
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    db = client["veriseal_db"]
+
+    processed = await backfill(db)
+    print(f"✅ Rebuilt hub rollups from {processed} checkpoint events")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
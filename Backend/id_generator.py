@@ -0,0 +1,82 @@
+"""
+Package IDs, QR tokens and receiver PINs.
+
+Package IDs are snowflake-style 64-bit numbers: milliseconds since
+2024-01-01 (42 bits), a node id (10 bits) and a per-millisecond sequence
+(12 bits). They are rendered as "PKG" + 13 Crockford base32 characters,
+fixed width, so string order matches creation order. Each worker needs a
+distinct node id (NODE_ID); without one it is derived from the host name
+and process id.
+
+Tokens and PINs come from a single `secrets` call each.
+"""
+
+import hashlib
+import os
+import secrets
+import socket
+import threading
+import time
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_PREFIX = "PKG"
+
+
+def default_node_id() -> int:
+    configured = os.getenv("NODE_ID")
+    if configured is not None:
+        return int(configured) & MAX_NODE
+    seed = f"{socket.gethostname()}:{os.getpid()}".encode("utf-8")
+    return int.from_bytes(hashlib.sha256(seed).digest()[:2], "big") & MAX_NODE
+
+
+def encode_base32(value: int, width: int = 13) -> str:
+    chars = []
+    for _ in range(width):
+        chars.append(CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class PackageIdGenerator:
+    def __init__(self, node_id: int = None):
+        self.node_id = default_node_id() if node_id is None else node_id & MAX_NODE
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_int(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock went backwards: keep counting
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    # Sequence exhausted: borrow the next millisecond
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self) -> str:
+        return ID_PREFIX + encode_base32(self.next_int())
+
+    def next_ids(self, count: int) -> list:
+        return [self.next_id() for _ in range(count)]
+
+
+def new_package_token() -> str:
+    """32 URL-safe characters (192 random bits)."""
+    return secrets.token_urlsafe(24)
+
+
+def new_pin() -> str:
+    return f"{secrets.randbelow(1_000_000):06d}"
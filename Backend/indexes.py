@@ -0,0 +1,169 @@
+"""
+MongoDB indexes for every hot query path, created at startup.
+
+INDEXES is the single place that declares which indexes each collection
+should have. HOT_QUERIES lists the queries the API actually runs (with
+sample values) so `find_collscans` can ask the server to explain each one
+and report any that would fall back to a collection scan.
+"""
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+# Seconds a scan receipt is kept for client retries
+SCAN_RECEIPT_TTL = 24 * 3600
+
+INDEXES = {
+    "users": [
+        # Login / register lookups
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "packages": [
+        # Every checkpoint scan looks the package up by its QR token
+        IndexModel([("package_token", ASCENDING)], name="package_token_unique", unique=True),
+        # Anomaly alerts for a device's in-transit packages
+        IndexModel([("device_id", ASCENDING), ("current_status", ASCENDING)], name="device_status"),
+        # Sender journey view; package IDs are generated unique
+        IndexModel([("package_id", ASCENDING)], name="package_id_unique", unique=True),
+        # Sender dashboard pages, newest first, optionally by status or type
+        IndexModel([("sender_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="sender_created_id"),
+        IndexModel([("sender_id", ASCENDING), ("current_status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="sender_status_created_id"),
+        IndexModel([("sender_id", ASCENDING), ("package_type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="sender_type_created_id"),
+        # Delivery dashboard pages, filtered by checkpoint, status or type, or not at all
+        IndexModel([("current_checkpoint", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="checkpoint_updated_id"),
+        IndexModel([("current_status", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="status_updated_id"),
+        IndexModel([("package_type", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="package_type_updated_id"),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated_id"),
+    ],
+    "checkpoint_events": [
+        # Journey pages for one package
+        IndexModel([("meta.package_id", ASCENDING), ("scanned_at", ASCENDING)], name="package_scanned"),
+        # Sender analytics over a time window
+        IndexModel([("meta.sender_id", ASCENDING), ("scanned_at", ASCENDING)], name="sender_scanned"),
+    ],
+    "telemetry": [
+        # Readings for one device over a time range
+        IndexModel([("device_id", ASCENDING), ("recorded_at", ASCENDING)], name="device_recorded"),
+    ],
+    "hub_rollups": [
+        # One counter document per hub per hour
+        IndexModel([("hub", ASCENDING), ("hour", ASCENDING)], name="hub_hour_unique", unique=True),
+    ],
+    "checkpoints": [
+        IndexModel([("checkpoint_id", ASCENDING)], name="checkpoint_id_unique", unique=True),
+    ],
+    "notification_outbox": [
+        # Dispatcher claims: due pending messages, expired leases
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt"),
+        # Sent messages are kept a week
+        IndexModel([("sent_at", ASCENDING)], name="sent_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "scan_receipts": [
+        # Responses to idempotent checkpoint scans, kept a day for client retries
+        IndexModel([("created_at", ASCENDING)], name="created_ttl", expireAfterSeconds=SCAN_RECEIPT_TTL),
+    ],
+    "seals": [
+        # /log upserts
+        IndexModel([("seal_id", ASCENDING)], name="seal_id_unique", unique=True),
+        # Seal dashboard pages
+        IndexModel([("last_updated", DESCENDING), ("_id", DESCENDING)], name="last_updated_id"),
+        IndexModel([("status", ASCENDING), ("last_updated", DESCENDING), ("_id", DESCENDING)], name="status_last_updated_id"),
+    ],
+}
+
+# Indexes replaced by the ones above (old name -> replacement), dropped at
+# startup once their replacement exists
+OBSOLETE_INDEXES = {
+    "packages": {
+        "sender_created": "sender_created_id",
+        "checkpoint_updated": "checkpoint_updated_id",
+        "updated": "updated_id",
+        "package_id_sender": "package_id_unique",
+    },
+}
+
+# (description, collection, filter, sort) for each query the API runs
+HOT_QUERIES = [
+    ("login/register by email", "users", {"email": "someone@example.com"}, None),
+    ("scan by package_token", "packages", {"package_token": "token"}, None),
+    ("journey by package_id + sender_id", "packages", {"package_id": "PKG", "sender_id": "sender"}, None),
+    ("sender packages", "packages", {"sender_id": "sender"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("sender packages by status", "packages", {"sender_id": "sender", "current_status": "created"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("sender packages by type", "packages", {"sender_id": "sender", "package_type": "electronics"}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("delivery packages by checkpoint", "packages", {"current_checkpoint": "CP001"}, [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+    ("delivery packages by status", "packages", {"current_status": "at_checkpoint"}, [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+    ("delivery packages by type", "packages", {"package_type": "electronics"}, [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+    ("delivery packages", "packages", {}, [("updated_at", DESCENDING), ("_id", DESCENDING)]),
+    ("seal dashboard", "seals", {}, [("last_updated", DESCENDING), ("_id", DESCENDING)]),
+    ("seal upsert by seal_id", "seals", {"seal_id": "seal-001"}, None),
+    ("journey events by package", "checkpoint_events", {"meta.package_id": "PKG"}, [("scanned_at", ASCENDING)]),
+]
+
+
+async def ensure_timeseries_collection(db, name: str, time_field: str, meta_field: str, granularity: str):
+    """Create `name` as a time-series collection if it doesn't exist yet."""
+    if await db.list_collection_names(filter={"name": name}):
+        return
+    try:
+        await db.create_collection(
+            name,
+            timeseries={"timeField": time_field, "metaField": meta_field, "granularity": granularity}
+        )
+    except CollectionInvalid:
+        # Created by another worker in the meantime
+        pass
+    except OperationFailure as e:
+        # Servers without time-series support get a plain collection
+        print(f"⚠️ Time-series collections unavailable ({e}), {name} is a regular collection")
+        await db.create_collection(name)
+
+
+async def ensure_indexes(db):
+    """Create any missing indexes. Existing identical indexes are left alone."""
+    for collection, models in INDEXES.items():
+        # One at a time, so a single failure doesn't hold the others back
+        created = []
+        for model in models:
+            try:
+                created += await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate values already stored under a unique key
+                print(f"⚠️ Could not create index {model.document['name']} on {collection}: {e}")
+        print(f"Indexes ready on {collection}: {', '.join(created)}")
+
+    for collection, replaced in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name, replacement in replaced.items():
+            if name in existing and replacement in existing:
+                await db[collection].drop_index(name)
+                print(f"Dropped obsolete index {collection}.{name}")
+
+
+async def find_collscans(db):
+    """
+    Explain every hot query and return the descriptions of those whose
+    winning plan contains a COLLSCAN stage.
+    """
+    collscans = []
+    for description, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        winning_plan = plan.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collscans.append(description)
+    return collscans
+
+
+def _plan_stages(plan):
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= _plan_stages(item)
+    return stages
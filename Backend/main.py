@@ -1,17 +1,57 @@
-from fastapi import FastAPI, Request, HTTPException, Depends
+from fastapi import FastAPI, Request, Response, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
 from typing import Optional, List
+from functools import lru_cache
 import os
+import asyncio
+import json
+import csv
 import jwt
-import bcrypt
-import secrets
-import string
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from bson import ObjectId
+from bson.errors import InvalidId
+from password_hasher import PasswordHasher, HashingOverloaded
+from indexes import ensure_indexes, find_collscans
+from checkpoint_events import (
+    EVENTS_COLLECTION, ensure_events_collection, build_event, summary_update,
+    summarize, event_to_checkpoint
+)
+from pagination import DEFAULT_PAGE_SIZE, clamp_limit, decode_cursor, page_filter, page_sort, next_cursor
+from realtime import Broker
+from telemetry import (
+    CHUNK_SIZE as TELEMETRY_CHUNK_SIZE, IngestResult, ensure_telemetry_collection,
+    ingest_items, parse_lines
+)
+from body_streams import InvalidBody, aiter_lines, aiter_chunks, aiter_json_array
+from seal_buffer import SealWriteBuffer
+from anomaly import AnomalyDetector
+from analytics import AnalyticsCache, event_filter, temperature_report, transit_time_report
+from hub_rollups import (
+    record_scan as record_hub_scan, hub_report, apply_increments
+)
+from checkpoint_registry import CheckpointRegistry
+from token_cache import TokenVerifier, InvalidToken, Principal
+from profile_cache import UserProfileCache
+from id_generator import PackageIdGenerator, new_package_token, new_pin
+from package_import import (
+    CHUNK_SIZE as PACKAGE_IMPORT_CHUNK_SIZE, ImportResult, import_items,
+    parse_json_lines, parse_csv_header, parse_csv_lines
+)
+from notifications import (
+    NotificationOutbox, NotificationDispatcher, ConsoleSmsProvider, FakeProvider, pin_notification
+)
+from receiver_access import ReceiverCache, pin_hash, check_pin, seal_data, seal_status
+from device_auth import DEVICE_KEY_HEADER, issue_device_key, check_device_key
+from rate_limiter import RateLimiter, Limit
+from state_machine import INITIAL_STATUS
+from scan_sync import SYNC_FIELDS, MAX_SCAN_KEYS, MAX_SCAN_JOURNAL, arrived_at, plan_sync, plan_events, plan_increments
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 # Load environment variables from .env file
 load_dotenv()
@@ -23,6 +63,93 @@ security = HTTPBearer()
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+token_verifier = TokenVerifier(JWT_SECRET, JWT_ALGORITHM, maxsize=JWT_CACHE_SIZE)
+
+# Read-through cache of user profiles for /auth/me and friends
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+profile_cache = UserProfileCache(maxsize=PROFILE_CACHE_SIZE)
+
+# Password hashing pool configuration
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "4"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+# Set to "true" to feed realtime updates from MongoDB change streams (needs a replica set)
+REALTIME_CHANGE_STREAMS = os.getenv("REALTIME_CHANGE_STREAMS", "false").lower() == "true"
+REALTIME_MAX_PENDING = int(os.getenv("REALTIME_MAX_PENDING", "256"))
+
+broker = Broker(max_pending=REALTIME_MAX_PENDING)
+
+# Seal status write-behind: "durable" acks /log after the write, "fast" on enqueue
+SEAL_WRITE_MODE = os.getenv("SEAL_WRITE_MODE", "durable").lower()
+SEAL_FLUSH_INTERVAL_MS = int(os.getenv("SEAL_FLUSH_INTERVAL_MS", "50"))
+SEAL_FLUSH_MAX_ITEMS = int(os.getenv("SEAL_FLUSH_MAX_ITEMS", "500"))
+
+seal_buffer = SealWriteBuffer(
+    flush_interval=SEAL_FLUSH_INTERVAL_MS / 1000,
+    max_items=SEAL_FLUSH_MAX_ITEMS,
+    durable=SEAL_WRITE_MODE != "fast"
+)
+
+# Server-side anomaly detection over sensor readings
+ANOMALY_MAX_DEVICES = int(os.getenv("ANOMALY_MAX_DEVICES", "100000"))
+MAX_ALERTS_PER_PACKAGE = 50
+
+anomaly_detector = AnomalyDetector(max_devices=ANOMALY_MAX_DEVICES)
+
+# Cached analytics reports, dropped when the sender's packages get new scans
+analytics_cache = AnalyticsCache()
+
+# Hub registry, cached in memory; refreshed on change or every CHECKPOINT_REFRESH_SECONDS
+CHECKPOINT_REFRESH_SECONDS = float(os.getenv("CHECKPOINT_REFRESH_SECONDS", "60"))
+
+checkpoint_registry = CheckpointRegistry(ttl=CHECKPOINT_REFRESH_SECONDS)
+
+# Sortable, collision-free package IDs (set NODE_ID per worker in multi-worker deployments)
+package_ids = PackageIdGenerator()
+
+# Receiver notifications go through an outbox and are sent in the background.
+# NOTIFICATION_PROVIDER: "console" prints messages, "fake" records them (local testing)
+NOTIFICATION_PROVIDER = os.getenv("NOTIFICATION_PROVIDER", "console").lower()
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "6"))
+SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", "10"))
+
+if NOTIFICATION_PROVIDER == "fake":
+    sms_provider = FakeProvider(rate=SMS_RATE_PER_SECOND)
+else:
+    sms_provider = ConsoleSmsProvider(rate=SMS_RATE_PER_SECOND)
+
+notification_dispatcher = NotificationDispatcher(
+    [sms_provider],
+    concurrency=NOTIFY_CONCURRENCY,
+    max_attempts=NOTIFY_MAX_ATTEMPTS
+)
+
+# Receiver QR scans: cached token summaries, PINs stored as HMACs under PIN_HASH_SECRET
+PIN_HASH_KEY = (os.getenv("PIN_HASH_SECRET") or JWT_SECRET or "").encode("utf-8")
+RECEIVER_CACHE_SIZE = int(os.getenv("RECEIVER_CACHE_SIZE", "10000"))
+RECEIVER_CACHE_TTL = float(os.getenv("RECEIVER_CACHE_TTL", "30"))
+
+receiver_cache = ReceiverCache(maxsize=RECEIVER_CACHE_SIZE, ttl=RECEIVER_CACHE_TTL)
+
+# PIN guessing: attempts per package token and per client IP, with escalating lockouts
+PIN_ATTEMPTS_PER_TOKEN = int(os.getenv("PIN_ATTEMPTS_PER_TOKEN", "5"))
+PIN_ATTEMPTS_PER_IP = int(os.getenv("PIN_ATTEMPTS_PER_IP", "30"))
+
+pin_limiter = RateLimiter({
+    # 5 tries per 15 minutes, then locked 15 min, 30 min, ... up to a day
+    "token": Limit(attempts=PIN_ATTEMPTS_PER_TOKEN, window=900, lockout=900, max_lockout=86400),
+    # 30 tries per minute, then locked 1 min, 2 min, ... up to an hour
+    "ip": Limit(attempts=PIN_ATTEMPTS_PER_IP, window=60, lockout=60, max_lockout=3600),
+})
+
+# Set to "true" to explain every hot query at startup and warn about collection scans
+VERIFY_INDEXES = os.getenv("VERIFY_INDEXES", "false").lower() == "true"
+
+password_hasher = PasswordHasher(workers=HASH_WORKERS, max_queue=HASH_QUEUE_LIMIT, rounds=BCRYPT_ROUNDS)
 
 # --- Pre-configured CORS ---
 # This allows your React app (running on localhost:5173)
@@ -40,11 +167,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- MongoDB Connection ---
 @app.on_event("startup")
 async def startup_db_client():
+    if not PIN_HASH_KEY:
+        raise ValueError("PIN_HASH_SECRET (or JWT_SECRET) not found in .env file")
+    
     # Get the connection string from the .env file
     mongo_uri = os.getenv("MONGO_URI")
     if not mongo_uri:
@@ -54,9 +185,35 @@ async def startup_db_client():
     # Use "veriseal_db" as your database name
     app.mongodb = app.mongodb_client["veriseal_db"] 
     print("Connected to MongoDB!")
+    app.notification_outbox = NotificationOutbox(app.mongodb, notification_dispatcher)
+
+    # Must exist as a time-series collection before its indexes are created
+    await ensure_events_collection(app.mongodb)
+    await ensure_telemetry_collection(app.mongodb)
+    await ensure_indexes(app.mongodb)
+    if VERIFY_INDEXES:
+        for query in await find_collscans(app.mongodb):
+            print(f"⚠️ Query falls back to COLLSCAN: {query}")
+
+    await checkpoint_registry.load(app.mongodb)
+    checkpoint_registry.start(app.mongodb)
+
+    password_hasher.start()
+    seal_buffer.start(app.mongodb.seals)
+    notification_dispatcher.start(app.mongodb)
+    pin_limiter.start()
+
+    if REALTIME_CHANGE_STREAMS:
+        broker.start_change_stream(app.mongodb)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await broker.stop()
+    await checkpoint_registry.stop()
+    await seal_buffer.stop()
+    await notification_dispatcher.stop()
+    await pin_limiter.stop()
+    password_hasher.shutdown()
     app.mongodb_client.close()
     print("Disconnected from MongoDB.")
 
@@ -91,6 +248,11 @@ class UserResponse(BaseModel):
     phone: Optional[str] = None
     company_name: Optional[str] = None
 
+class ProfileUpdate(BaseModel):
+    username: Optional[str] = None
+    phone: Optional[str] = None
+    company_name: Optional[str] = None
+
 # --- Package & Checkpoint Models ---
 class ESP32Data(BaseModel):
     temperature: float
@@ -117,12 +279,24 @@ class PackageCreation(BaseModel):
     sender_id: str
     notes: Optional[str] = None
 
+class PinVerification(BaseModel):
+    token: str
+    pin: str
+
 class CheckpointScan(BaseModel):
     package_token: str
     checkpoint_id: str
     esp32_data: ESP32Data
     status: str
     notes: Optional[str] = None
+    idempotency_key: Optional[str] = None  # makes retries of the same scan safe
+
+class OfflineScan(CheckpointScan):
+    scanned_at: datetime  # when the scanner recorded it
+    idempotency_key: str
+
+class ScanSyncBatch(BaseModel):
+    scans: List[OfflineScan]
 
 # --- JWT Helper Functions ---
 def create_access_token(data: dict):
@@ -132,21 +306,35 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str) -> dict:
+    try:
+        return token_verifier.verify(token).claims
+    except InvalidToken:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def get_principal(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    # FastAPI resolves this once per request and shares it with every dependency
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return payload
-    except jwt.PyJWTError:
+        principal = token_verifier.verify(credentials.credentials)
+    except InvalidToken:
         raise HTTPException(status_code=401, detail="Invalid token")
+    request.state.principal = principal
+    return principal
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def verify_token(principal: Principal = Depends(get_principal)):
+    return principal.claims
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HashingOverloaded as e:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": str(e.retry_after)})
+
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_hasher.verify(password, hashed)
+    except HashingOverloaded as e:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": str(e.retry_after)})
 
 # --- Authentication Endpoints ---
 
@@ -162,7 +350,7 @@ async def register_user(user_data: UserRegistration):
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password(user_data.password)
         
         # Create user document
         user_doc = {
@@ -218,13 +406,25 @@ async def login_user(login_data: UserLogin):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Verify password
-        if not verify_password(login_data.password, user["password"]):
+        if not await verify_password(login_data.password, user["password"]):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Check if user is active
         if not user.get("is_active", True):
             raise HTTPException(status_code=401, detail="Account is deactivated")
         
+        # Upgrade the stored hash if it was made with an older cost factor
+        if password_hasher.needs_rehash(user["password"]):
+            try:
+                new_hash = await password_hasher.rehash(login_data.password)
+                await app.mongodb.users.update_one(
+                    {"_id": user["_id"], "password": user["password"]},
+                    {"$set": {"password": new_hash}}
+                )
+            except HashingOverloaded:
+                # Not worth failing a valid login over; try again next time
+                pass
+        
         # Create JWT token
         token_data = {
             "sub": str(user["_id"]),
@@ -251,38 +451,107 @@ async def login_user(login_data: UserLogin):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def get_current_profile(principal: Principal = Depends(get_principal)) -> dict:
+    """Profile of the authenticated user, served from the profile cache."""
+    try:
+        user_id = ObjectId(principal.user_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    profile = await profile_cache.get(app.mongodb.users, user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User not found")
+    return profile
+
 @app.get("/auth/me")
-async def get_current_user(token_data: dict = Depends(verify_token)):
+async def get_current_user(profile: dict = Depends(get_current_profile)):
     """
     Get current user information from JWT token
     """
+    return profile
+
+@app.put("/auth/me")
+async def update_current_user(update: ProfileUpdate, profile: dict = Depends(get_current_profile)):
+    """
+    Update the current user's username, phone or company name
+    """
     try:
-        user_id = token_data["sub"]
-        user = await app.mongodb.users.find_one({"_id": user_id})
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        changes = update.dict(exclude_unset=True)
+        if changes:
+            user_id = ObjectId(profile["id"])
+            await app.mongodb.users.update_one({"_id": user_id}, {"$set": changes})
+            profile_cache.invalidate(user_id)
+        return {**profile, **changes}
         
-        return {
-            "id": str(user["_id"]),
-            "username": user["username"],
-            "email": user["email"],
-            "role": user["role"],
-            "phone": user.get("phone"),
-            "company_name": user.get("company_name")
-        }
-        
-    except HTTPException:
-        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics/hashing")
+async def get_hashing_metrics():
+    """
+    Password hashing pool stats: queue wait, hash time and rejections
+    """
+    return password_hasher.stats()
+
+@app.get("/metrics/anomaly")
+async def get_anomaly_metrics():
+    """
+    Anomaly detector stats: devices tracked, readings seen, alerts raised
+    """
+    return anomaly_detector.stats()
+
+@app.get("/metrics/auth")
+async def get_auth_metrics():
+    """
+    Token cache stats: hits, misses and revoked tokens
+    """
+    return token_verifier.stats()
+
+@app.get("/metrics/profiles")
+async def get_profile_cache_metrics():
+    """
+    Profile cache stats: hits, misses and coalesced lookups
+    """
+    return profile_cache.stats()
+
+@app.get("/metrics/notifications")
+async def get_notification_metrics():
+    """Notification dispatcher counters"""
+    return notification_dispatcher.stats()
+
+@app.get("/metrics/receiver")
+async def get_receiver_cache_metrics():
+    """Receiver token cache hit/miss counters"""
+    return receiver_cache.stats()
+
+@app.get("/metrics/rate-limits")
+async def get_rate_limit_metrics():
+    """PIN attempt throttling counters per scope"""
+    return pin_limiter.stats()
+
+@app.get("/metrics/seals")
+async def get_seal_write_metrics():
+    """
+    Seal write-behind stats: coalescing ratio and flush latency
+    """
+    return seal_buffer.stats()
+
+@app.post("/auth/logout")
+async def logout_user(principal: Principal = Depends(get_principal)):
+    """
+    Revoke the current token
+    """
+    token_verifier.revoke(principal)
+    return {"message": "Logged out"}
+
 # --- Role-based Access Control ---
+@lru_cache(maxsize=None)
 def require_role(required_role: str):
-    def role_checker(token_data: dict = Depends(verify_token)):
-        if token_data["role"] != required_role:
+    # One checker per role, so FastAPI can share it between routes and requests
+    def role_checker(principal: Principal = Depends(get_principal)):
+        if principal.role != required_role:
             raise HTTPException(status_code=403, detail=f"Access denied. Required role: {required_role}")
-        return token_data
+        return principal.claims
     return role_checker
 
 # --- TODO DURING HACKATHON ---
@@ -296,78 +565,254 @@ async def log_seal_status(request: Request):
     data = await request.json() 
     # Example: {'seal_id': 'seal-001', 'status': 'TAMPERED'}
     
-    # Use Motor to update/insert the document in the 'seals' collection
-    await app.mongodb.seals.update_one(
-        {"seal_id": data["seal_id"]},
-        {"$set": {"status": data["status"], "last_updated": datetime.now()}},
-        upsert=True
-    )
+    # Queue the upsert; repeated reports for the same seal are merged into one write
+    last_updated = datetime.now()
+    await seal_buffer.put(data["seal_id"], data["status"], last_updated)
+    broker.publish_seal({"seal_id": data["seal_id"], "status": data["status"], "last_updated": last_updated})
     return {"status": "success", "received_data": data}
 
+async def record_device_alerts(device_id: str, alerts: list):
+    """Attach anomaly alerts to the device's packages that are still in transit."""
+    if not alerts:
+        return
+    await app.mongodb.packages.update_many(
+        {"device_id": device_id, "current_status": {"$ne": "delivered"}},
+        {
+            "$push": {"alerts": {"$each": alerts, "$slice": -MAX_ALERTS_PER_PACKAGE}},
+            "$set": {"latest_alert": alerts[-1]}
+        }
+    )
+    receiver_cache.invalidate_device(device_id)
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+@app.post("/devices/{device_id}/key")
+async def create_device_key(device_id: str, token_data: dict = Depends(require_role("sender"))):
+    """
+    Issue the key a device sends with its telemetry uploads, replacing any
+    earlier one. The first sender to ask for a key owns the device.
+    The key is only returned here; store it on the device.
+    """
+    try:
+        device_key = await issue_device_key(app.mongodb, PIN_HASH_KEY, device_id, token_data["sub"])
+    except DuplicateKeyError:
+        raise HTTPException(status_code=403, detail="Device belongs to another sender")
+    return {"device_id": device_id, "device_key": device_key}
+
+async def require_device(device_id: str, request: Request):
+    if not await check_device_key(app.mongodb, PIN_HASH_KEY, device_id, request.headers.get(DEVICE_KEY_HEADER)):
+        raise HTTPException(status_code=401, detail="Invalid device key")
+
+@app.post("/devices/{device_id}/telemetry", dependencies=[Depends(require_device)])
+async def ingest_telemetry(device_id: str, request: Request):
+    """
+    Bulk ingestion of ESP32 sensor readings for one device.
+    The device authenticates with its key in the X-Device-Key header.
+    Body is either a JSON array of readings, or NDJSON (one reading per line,
+    Content-Type: application/x-ndjson), which is processed as it streams in.
+    Each reading: {"recorded_at", "temperature", "battery_level", and optionally
+    "humidity", "shock_detected", "tamper_status", "gps_location"}.
+    Returns counts plus the index and reason for every rejected reading.
+    """
+    result = IngestResult(device_id)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    
+    if content_type in NDJSON_CONTENT_TYPES:
+        offset = 0
+        async for lines in aiter_chunks(aiter_lines(request), TELEMETRY_CHUNK_SIZE):
+            result.received += len(lines)
+            items, positions = parse_lines(lines, offset, result)
+            readings = await ingest_items(app.mongodb, device_id, items, positions, result)
+            await record_device_alerts(device_id, detect_anomalies(device_id, readings))
+            offset += len(lines)
+        return result.to_dict()
+    
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    
+    result.received = len(items)
+    for start in range(0, len(items), TELEMETRY_CHUNK_SIZE):
+        chunk = items[start:start + TELEMETRY_CHUNK_SIZE]
+        readings = await ingest_items(app.mongodb, device_id, chunk, list(range(start, start + len(chunk))), result)
+        await record_device_alerts(device_id, detect_anomalies(device_id, readings))
+    return result.to_dict()
+
+def detect_anomalies(device_id: str, readings: list) -> list:
+    alerts = []
+    for reading in readings:
+        alerts.extend(anomaly_detector.observe(device_id, reading, reading["recorded_at"]))
+    return alerts
+
 @app.get("/dashboard-data")
-async def get_dashboard_data():
+async def get_dashboard_data(
+    response: Response,
+    status: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE
+):
     """
     Endpoint for the Dashboard to poll.
-    This will query MongoDB for all seal statuses.
+    Returns one page of seal statuses, most recently updated first.
+    The cursor for the next page is sent in the X-Next-Cursor header.
     """
-    seals = []
-    cursor = app.mongodb.seals.find({})
-    async for seal in cursor:
+    limit = clamp_limit(limit)
+    query = page_filter("last_updated", cursor, since, until)
+    if status:
+        query["status"] = status
+    
+    seals = await app.mongodb.seals.find(query).sort(page_sort("last_updated")).limit(limit + 1).to_list(length=None)
+    response.headers["X-Next-Cursor"] = next_cursor(seals, limit, "last_updated") or ""
+    for seal in seals:
         seal["_id"] = str(seal["_id"]) # Convert ObjectId to string for JSON
-        seals.append(seal)
     return seals
 
+# --- Realtime Updates ---
+
+@app.websocket("/ws/updates")
+async def updates_socket(
+    websocket: WebSocket,
+    token: str = None,
+    sender: str = None,
+    checkpoint: str = None,
+    package: str = None,
+    seals: bool = False
+):
+    """
+    Push channel for dashboards. Subscribe with query parameters:
+    ?token=<jwt>&sender=<own user id> / &checkpoint=CP003 (delivery) /
+    &package=<package_id> / &seals=true. Sends {"updates": [...]} batches;
+    "dropped" is included if updates were discarded because the client
+    fell behind, in which case it should refetch.
+    """
+    token_data = None
+    if token:
+        try:
+            token_data = decode_token(token)
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+    
+    topics = []
+    allowed = True
+    if sender:
+        allowed = allowed and token_data is not None and token_data["sub"] == sender
+        topics.append(f"sender:{sender}")
+    if checkpoint:
+        allowed = allowed and token_data is not None and token_data["role"] == "delivery"
+        topics.append(f"checkpoint:{checkpoint}")
+    if package:
+        if token_data is None:
+            allowed = False
+        elif token_data["role"] != "delivery":
+            owned = await app.mongodb.packages.find_one(
+                {"package_id": package, "sender_id": token_data["sub"]}, {"_id": 1}
+            )
+            allowed = allowed and owned is not None
+        topics.append(f"package:{package}")
+    if seals:
+        topics.append("seals")
+    
+    if not topics or not allowed:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    subscriber = broker.subscribe(topics)
+    
+    async def send_updates():
+        while True:
+            message = {"updates": await subscriber.next_batch()}
+            if subscriber.dropped:
+                message["dropped"] = subscriber.dropped
+                subscriber.dropped = 0
+            await websocket.send_json(message)
+    
+    async def wait_for_disconnect():
+        while True:
+            await websocket.receive_text()
+    
+    tasks = [asyncio.create_task(send_updates()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # Disconnects end up here; anything else is worth logging
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                print(f"Realtime connection error: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(subscriber)
+
 # --- Package Management Endpoints ---
 
+def build_package_doc(package_data: dict, pin: str) -> dict:
+    """New package document with fresh ID and QR token; only the PIN's hash is stored"""
+    now = datetime.now()
+    package_token = new_package_token()
+    return {
+        "package_id": package_ids.next_id(),
+        "package_token": package_token,
+        "order_id": package_data["order_id"],
+        "package_type": package_data["package_type"],
+        "device_id": package_data["device_id"],
+        "sender_id": package_data["sender_id"],
+        "receiver_phone": package_data["receiver_phone"],
+        "pin_hash": pin_hash(PIN_HASH_KEY, package_token, pin),
+        "authenticated": False,
+        
+        # Current status
+        "current_status": INITIAL_STATUS,
+        "current_checkpoint": None,
+        "current_location": "Warehouse",
+        
+        # Checkpoint journey summary (events live in checkpoint_events)
+        "checkpoints_count": 0,
+        "latest_esp32_data": None,
+        "last_checkpoint_status": None,
+        "last_scanned_at": None,
+        "hub_arrived_at": None,
+        
+        # Timestamps
+        "created_at": now,
+        "updated_at": now,
+        
+        # Additional info
+        "notes": package_data.get("notes")
+    }
+
+
 @app.post("/packages/create")
 async def create_package(package_data: PackageCreation, token_data: dict = Depends(verify_token)):
     """
     Create a new package with tracking capabilities
     """
     try:
-        # Generate unique package token
-        package_token = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32))
-        package_id = f"PKG{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Generate PIN for customer
-        pin = ''.join(secrets.choice(string.digits) for _ in range(6))
-        
-        # Create package document
-        package_doc = {
-            "package_id": package_id,
-            "package_token": package_token,
-            "order_id": package_data.order_id,
-            "package_type": package_data.package_type,
-            "device_id": package_data.device_id,
-            "sender_id": package_data.sender_id,
-            "receiver_phone": package_data.receiver_phone,
-            "pin": pin,
-            "authenticated": False,
-            
-            # Current status
-            "current_status": "created",
-            "current_checkpoint": None,
-            "current_location": "Warehouse",
-            
-            # Checkpoint journey
-            "checkpoints": [],
-            
-            # Timestamps
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-            
-            # Additional info
-            "notes": package_data.notes
-        }
-        
-        # Insert package
-        result = await app.mongodb.packages.insert_one(package_doc)
+        # IDs and tokens are unique-indexed; a clash just means drawing new ones
+        for attempt in range(3):
+            pin = new_pin()
+            package_doc = build_package_doc(package_data.dict(), pin)
+            try:
+                # The receiver's PIN SMS is queued in the same transaction
+                await app.notification_outbox.insert_with(
+                    app.mongodb.packages, package_doc, [pin_notification(package_doc, pin)]
+                )
+                break
+            except DuplicateKeyError:
+                if attempt == 2:
+                    raise
+        broker.publish_package(package_doc)
         
-        # Mock SMS sending
-        print(f"📱 SMS to {package_data.receiver_phone}: Your VeriSeal PIN is {pin}")
+        package_token = package_doc["package_token"]
         
         return {
-            "package_id": package_id,
+            "package_id": package_doc["package_id"],
             "package_token": package_token,
             "pin": pin,  # For demo purposes
             "qr_url": f"https://veriseal.app/scan?token={package_token}",
@@ -377,22 +822,293 @@ async def create_package(package_data: PackageCreation, token_data: dict = Depen
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+@app.post("/packages/bulk-create")
+async def bulk_create_packages(request: Request, token_data: dict = Depends(verify_token)):
+    """
+    Create many packages in one request, e.g. a merchant's order import.
+    Body is a JSON array of packages, NDJSON (Content-Type: application/x-ndjson)
+    or CSV with a header row (Content-Type: text/csv), processed as it streams
+    in. Each package has the PackageCreation fields; sender_id defaults to
+    the caller.
+    Responds with NDJSON, streamed as each chunk of rows is written: one line
+    per row ({"row", "status": "created", "package_id", "package_token", "pin",
+    ...} or {"row", "status": "rejected", "error"}), then a final
+    {"summary": {...}} line. A response without the summary line was cut short.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    result = ImportResult()
+    
+    def build_doc(row: dict):
+        row.setdefault("sender_id", token_data["sub"])
+        pin = new_pin()
+        return build_package_doc(row, pin), pin
+    
+    async def insert(docs: list, pins: list):
+        # Each chunk's packages and their PIN SMS are written in one transaction
+        await app.notification_outbox.insert_many_with(
+            app.mongodb.packages, docs, [pin_notification(doc, pin) for doc, pin in zip(docs, pins)]
+        )
+    
+    # Anything wrong with the start of the body is a 400, before streaming starts
+    broken = []
+    if content_type in NDJSON_CONTENT_TYPES or content_type in CSV_CONTENT_TYPES:
+        lines = aiter_lines(request)
+        header = None
+        if content_type in CSV_CONTENT_TYPES:
+            try:
+                header = parse_csv_header(await lines.__anext__())
+            except StopAsyncIteration:
+                raise HTTPException(status_code=400, detail="CSV body has no header row")
+            except (ValueError, csv.Error) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        chunks = aiter_chunks(lines, PACKAGE_IMPORT_CHUNK_SIZE)
+        
+        def parse(chunk: list, offset: int):
+            if header is None:
+                return parse_json_lines(chunk, offset, result)
+            return parse_csv_lines(chunk, header, offset, result)
+    else:
+        items = aiter_json_array(request.stream())
+        try:
+            first = [await items.__anext__()]
+        except StopAsyncIteration:
+            first = []
+        except InvalidBody:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array, NDJSON or CSV")
+        
+        async def elements():
+            # A body that breaks off partway ends the import there; the rows before it stand
+            for item in first:
+                yield item
+            try:
+                async for item in items:
+                    yield item
+            except InvalidBody as e:
+                broken.append(str(e))
+        chunks = aiter_chunks(elements(), PACKAGE_IMPORT_CHUNK_SIZE)
+        
+        def parse(chunk: list, offset: int):
+            return chunk, list(range(offset, offset + len(chunk)))
+    
+    async def results():
+        async for chunk in chunks:
+            offset = result.received
+            result.received += len(chunk)
+            items, positions = parse(chunk, offset)
+            for package_doc, _ in await import_items(insert, items, positions, build_doc, result):
+                broker.publish_package(package_doc)
+            yield result.take()
+        if broken:
+            result.received += 1
+            result.reject(result.received - 1, broken[0])
+            yield result.take()
+        yield json.dumps({"summary": result.summary()}).encode("utf-8") + b"\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+SCAN_RECEIPTS_COLLECTION = "scan_receipts"
+
+# How long a request may spend recording a keyed scan before a retry takes over
+SCAN_RECORDING_LEASE = timedelta(seconds=30)
+
+# Package fields a scan needs from the document as it was before the scan
+SCAN_FIELDS = {
+    "package_id": 1,
+    "package_token": 1,
+    "sender_id": 1,
+    "package_type": 1,
+    "device_id": 1,
+    "current_checkpoint": 1,
+    "current_status": 1,
+    "last_scanned_at": 1,
+    "hub_arrived_at": 1,
+    "checkpoints_count": 1
+}
+
+async def take_over_receipt(receipt_id: str, now: datetime, entry: dict = None) -> Optional[dict]:
+    """
+    Claim an unfinished scan receipt whose owner's lease has run out.
+    Returns the receipt as it was, or None if it is finished or still
+    leased. `entry`, if given, replaces the scan it records.
+    """
+    claim = {"claimed_at": now}
+    if entry is not None:
+        claim["entry"] = entry
+    return await app.mongodb[SCAN_RECEIPTS_COLLECTION].find_one_and_update(
+        {"_id": receipt_id, "response": {"$exists": False}, "claimed_at": {"$lte": now - SCAN_RECORDING_LEASE}},
+        {"$set": claim}
+    )
+
+async def claim_scan_receipt(receipt_id: str, entry: dict) -> tuple:
+    """
+    Take on recording a keyed scan, before its package is touched; the
+    receipt holds the scan until its response is written. Returns
+    (True, None) for a new claim, (True, receipt) when taking over from a
+    request whose lease ran out, or (False, receipt) with the receipt in
+    the way: a finished one (with its response) or one still being recorded.
+    """
+    receipts = app.mongodb[SCAN_RECEIPTS_COLLECTION]
+    now = datetime.now()
+    try:
+        await receipts.insert_one({"_id": receipt_id, "entry": entry, "claimed_at": now, "created_at": now})
+        return True, None
+    except DuplicateKeyError:
+        pass
+    taken_over = await take_over_receipt(receipt_id, now)
+    if taken_over is not None:
+        return True, taken_over
+    # (A receipt that expired in between counts as in progress)
+    return False, await receipts.find_one({"_id": receipt_id}) or {"_id": receipt_id}
+
+async def release_scan_receipt(receipt_id: str):
+    """Drop the claim on a keyed scan that didn't apply, so it can be sent again."""
+    await app.mongodb[SCAN_RECEIPTS_COLLECTION].delete_one({"_id": receipt_id, "response": {"$exists": False}})
+
+async def claim_scan_receipts(entries: dict) -> set:
+    """
+    claim_scan_receipt for a batch of scans the packages haven't taken yet
+    (receipt id -> entry); a receipt left by a request that died is taken
+    over with the new entry. Returns the ids this request couldn't claim.
+    """
+    receipts = app.mongodb[SCAN_RECEIPTS_COLLECTION]
+    now = datetime.now()
+    docs = [
+        {"_id": receipt_id, "entry": entry, "claimed_at": now, "created_at": now}
+        for receipt_id, entry in entries.items()
+    ]
+    try:
+        await receipts.insert_many(docs, ordered=False)
+        return set()
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        if any(error["code"] != 11000 for error in errors):
+            raise
+    
+    unclaimed = set()
+    for error in errors:
+        receipt_id = docs[error["index"]]["_id"]
+        if await take_over_receipt(receipt_id, now, entries[receipt_id]) is None:
+            unclaimed.add(receipt_id)
+    return unclaimed
+
+def scan_response(entry: dict, alerts: list) -> dict:
+    return {
+        "message": "Checkpoint scan recorded successfully",
+        "checkpoint_id": entry["checkpoint_id"],
+        "status": entry["status"],
+        "alerts": [alert["message"] for alert in alerts],
+        "timestamp": datetime.now().isoformat()
+    }
+
+async def record_scan_event(package: dict, entry: dict, key: Optional[str], replay: bool):
+    event = build_event(package, entry)
+    if key is not None:
+        event["scan_key"] = key
+    events = app.mongodb[EVENTS_COLLECTION]
+    if replay and await events.find_one(
+        {"meta.package_id": package["package_id"], "scanned_at": entry["scanned_at"], "scan_key": key}, {"_id": 1}
+    ):
+        return
+    await events.insert_one(event)
+
+async def record_scan_writes(package: dict, entry: dict, key: Optional[str], previous_checkpoint, previous_arrived_at, replay: bool = False) -> dict:
+    """
+    Everything a scan writes after its package update: the checkpoint event,
+    anomaly alerts and the hub rollup (sent together), then, for a keyed
+    scan, its receipt. Returns the scan response. `replay` is for finishing
+    a scan whose original request died midway; its event is only written
+    if missing.
+    """
+    alerts = anomaly_detector.observe(package["device_id"], entry["esp32_data"], entry["scanned_at"])
+    writes = [
+        record_scan_event(package, entry, key, replay),
+        record_hub_scan(
+            app.mongodb, previous_checkpoint, previous_arrived_at, entry["checkpoint_id"], entry["status"], entry["scanned_at"]
+        )
+    ]
+    if alerts:
+        writes.append(app.mongodb.packages.update_one(
+            {"_id": package["_id"]},
+            {
+                "$push": {"alerts": {"$each": alerts, "$slice": -MAX_ALERTS_PER_PACKAGE}},
+                "$set": {"latest_alert": alerts[-1]}
+            }
+        ))
+    await asyncio.gather(*writes)
+    analytics_cache.invalidate(package["sender_id"])
+    receiver_cache.invalidate(package["package_token"])
+    
+    response = scan_response(entry, alerts)
+    if key is not None:
+        await app.mongodb[SCAN_RECEIPTS_COLLECTION].update_one(
+            {"_id": f"{package['package_token']}:{key}"},
+            {"$set": {"response": response}, "$unset": {"claimed_at": "", "entry": ""}}
+        )
+    return response
+
+async def finish_recorded_scan(package: dict, key: str, entry: dict, resumed: bool) -> dict:
+    """
+    A keyed scan the package already took, whose receipt has no response.
+    If `resumed` (this request took over the receipt, and `entry` is the
+    scan as first sent) the request that moved the package died midway:
+    writes the rest, using the package's scan journal. Otherwise the old
+    receipt simply expired. Returns the response either way.
+    """
+    journaled = next((scan for scan in package.get("scan_journal") or [] if scan["key"] == key), None)
+    if resumed and journaled is not None:
+        return await record_scan_writes(
+            package, entry, key, journaled.get("previous_checkpoint"), journaled.get("previous_arrived_at"), replay=True
+        )
+    response = {"message": "Checkpoint scan already recorded", "checkpoint_id": entry["checkpoint_id"], "duplicate": True}
+    await app.mongodb[SCAN_RECEIPTS_COLLECTION].update_one(
+        {"_id": f"{package['package_token']}:{key}"},
+        {"$set": {"response": response}, "$unset": {"claimed_at": "", "entry": ""}}
+    )
+    return response
+
+async def diagnose_failed_scan(package_token: str, key: Optional[str], entry: dict, resumed: bool) -> dict:
+    """
+    The conditional scan update matched nothing: work out why. Returns the
+    response for a keyed scan the package already took; otherwise releases
+    the scan's claim and raises 404/409.
+    """
+    package = await app.mongodb.packages.find_one(
+        {"package_token": package_token},
+        {**SCAN_FIELDS, "scan_keys": 1, "scan_journal": 1}
+    )
+    if package and key is not None and key in (package.get("scan_keys") or []):
+        return await finish_recorded_scan(package, key, entry, resumed)
+    
+    if key is not None:
+        await release_scan_receipt(f"{package_token}:{key}")
+    if not package:
+        raise HTTPException(status_code=404, detail="Package not found")
+    current_checkpoint = package.get("current_checkpoint")
+    raise HTTPException(
+        status_code=409,
+        detail=f"Package cannot move from {current_checkpoint or 'creation'} ({package.get('current_status')}) to {entry['checkpoint_id']}"
+    )
+
 @app.post("/delivery/scan-checkpoint")
 async def scan_checkpoint(checkpoint_data: CheckpointScan, token_data: dict = Depends(require_role("delivery"))):
     """
-    Scan package at checkpoint and update journey
+    Scan package at checkpoint and update journey.
+    Pass an idempotency_key to make client retries safe: a repeated key gets
+    the original response back instead of recording the scan twice, and
+    finishes recording it if the original request failed partway.
     """
     try:
-        package = await app.mongodb.packages.find_one({"package_token": checkpoint_data.package_token})
-        
-        if not package:
-            raise HTTPException(status_code=404, detail="Package not found")
+        checkpoint = checkpoint_registry.get(checkpoint_data.checkpoint_id)
+        if not checkpoint:
+            raise HTTPException(status_code=400, detail=f"Unknown checkpoint {checkpoint_data.checkpoint_id}")
         
         # Create checkpoint entry
         checkpoint_entry = {
-            "checkpoint_id": checkpoint_data.checkpoint_id,
-            "name": get_checkpoint_name(checkpoint_data.checkpoint_id),
-            "location": get_checkpoint_location(checkpoint_data.checkpoint_id),
+            "checkpoint_id": checkpoint.checkpoint_id,
+            "name": checkpoint.name,
+            "location": checkpoint.location,
             "scanned_by": token_data["sub"],  # delivery user ID
             "scanned_at": datetime.now(),
             "esp32_data": checkpoint_data.esp32_data.dict(),
@@ -400,27 +1116,334 @@ async def scan_checkpoint(checkpoint_data: CheckpointScan, token_data: dict = De
             "notes": checkpoint_data.notes
         }
         
-        # Update package with new checkpoint
-        update_data = {
-            "$push": {"checkpoints": checkpoint_entry},
-            "$set": {
-                "current_checkpoint": checkpoint_data.checkpoint_id,
-                "current_location": get_checkpoint_location(checkpoint_data.checkpoint_id),
-                "current_status": "at_checkpoint" if checkpoint_data.status == "passed" else "checkpoint_failed",
-                "updated_at": datetime.now()
-            }
+        key = checkpoint_data.idempotency_key
+        resumed = False
+        if key is not None:
+            # Claimed before the package moves, so if this request dies midway
+            # a retry finds the scan in the receipt and finishes recording it
+            owned, receipt = await claim_scan_receipt(f"{checkpoint_data.package_token}:{key}", checkpoint_entry)
+            if not owned:
+                if "response" in receipt:
+                    return receipt["response"]
+                raise HTTPException(status_code=409, detail="Scan is still being recorded, retry shortly", headers={"Retry-After": "1"})
+            if receipt is not None:
+                # Taking over from a request that died: record the scan it was sent
+                resumed = True
+                checkpoint_entry = receipt.get("entry", checkpoint_entry)
+        checkpoint_id = checkpoint_entry["checkpoint_id"]
+        
+        # Update package summary with the new checkpoint, in one conditional round
+        # trip: only from a state the journey state machine allows, and only once per key.
+        # It's a pipeline update so the hub arrival time only moves when the hub changes
+        transitions = checkpoint_registry.transitions
+        scan_filter = {
+            "package_token": checkpoint_data.package_token,
+            **transitions.scan_filter(checkpoint_id, checkpoint_entry["status"])
         }
+        summary = {
+            "current_checkpoint": checkpoint_id,
+            "current_location": checkpoint_entry["location"],
+            "current_status": transitions.status_after(checkpoint_id, checkpoint_entry["status"]),
+            "updated_at": datetime.now(),
+            **summary_update(checkpoint_entry)
+        }
+        scan_set = {field: {"$literal": value} for field, value in summary.items()}
+        scan_set["checkpoints_count"] = {"$add": [{"$ifNull": ["$checkpoints_count", 0]}, 1]}
+        scan_set["hub_arrived_at"] = {"$cond": [
+            {"$eq": ["$current_checkpoint", checkpoint_id]},
+            {"$ifNull": ["$hub_arrived_at", "$last_scanned_at"]},
+            {"$literal": checkpoint_entry["scanned_at"]}
+        ]}
+        if key is not None:
+            scan_filter["scan_keys"] = {"$ne": key}
+            scan_set["scan_keys"] = {"$slice": [
+                {"$concatArrays": [{"$ifNull": ["$scan_keys", []]}, {"$literal": [key]}]},
+                -MAX_SCAN_KEYS
+            ]}
+            # Where the package came from, which a retry finishing this scan
+            # needs for the hub rollup (the scan itself is in the receipt)
+            journal_entry = {
+                "key": {"$literal": key},
+                "previous_checkpoint": "$current_checkpoint",
+                "previous_arrived_at": {"$ifNull": ["$hub_arrived_at", "$last_scanned_at"]}
+            }
+            scan_set["scan_journal"] = {"$slice": [
+                {"$concatArrays": [{"$ifNull": ["$scan_journal", []]}, [journal_entry]]},
+                -MAX_SCAN_JOURNAL
+            ]}
         
-        await app.mongodb.packages.update_one(
-            {"package_token": checkpoint_data.package_token},
-            update_data
+        package = await app.mongodb.packages.find_one_and_update(
+            scan_filter,
+            [{"$set": scan_set}],
+            projection=SCAN_FIELDS,
+            return_document=ReturnDocument.BEFORE
         )
+        if package is None:
+            return await diagnose_failed_scan(checkpoint_data.package_token, key, checkpoint_entry, resumed)
+        
+        previous_arrived_at = arrived_at(package)
+        response = await record_scan_writes(
+            package, checkpoint_entry, key, package.get("current_checkpoint"), previous_arrived_at
+        )
+        same_hub = package.get("current_checkpoint") == checkpoint_id
+        broker.publish_package({
+            **package,
+            **summary,
+            "hub_arrived_at": previous_arrived_at if same_hub else checkpoint_entry["scanned_at"],
+            "checkpoints_count": package.get("checkpoints_count", 0) + 1
+        }, package.get("current_checkpoint"))
+        return response
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Receiver Endpoints ---
+# The QR token itself is the credential here: receivers aren't necessarily logged in.
+
+async def get_receiver_summary(token: str) -> dict:
+    summary = await receiver_cache.get(app.mongodb.packages, token)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Invalid package token")
+    return summary
+
+@app.get("/verify-token/{token}")
+async def verify_package_token(token: str):
+    """
+    Check a scanned QR token. `authenticated` tells the receiver page whether
+    the PIN still has to be entered.
+    """
+    return seal_data(await get_receiver_summary(token))
+
+@app.post("/verify-pin")
+async def verify_package_pin(verification: PinVerification, request: Request):
+    """
+    Check the receiver's PIN for a package token and mark the package authenticated.
+    Attempts are throttled per token and per client IP (429 with Retry-After).
+    """
+    # Counted before the lookup, so guessing at unknown tokens costs no queries
+    client_ip = request.client.host if request.client else "unknown"
+    for scope, key in (("ip", client_ip), ("token", verification.token)):
+        decision = await pin_limiter.hit(scope, key)
+        if not decision.allowed:
+            retry_after = max(1, int(decision.retry_after + 0.5))
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many PIN attempts, try again in {retry_after} seconds",
+                headers={"Retry-After": str(retry_after)}
+            )
+    
+    summary = await get_receiver_summary(verification.token)
+    if not check_pin(PIN_HASH_KEY, verification.token, verification.pin, summary):
+        raise HTTPException(status_code=401, detail="Incorrect PIN")
+    await pin_limiter.reset("token", verification.token)
+    
+    if not summary.get("authenticated") or "pin" in summary:
+        update = {"$set": {"authenticated": True}}
+        if not summary.get("authenticated"):
+            update["$set"]["authenticated_at"] = datetime.now()
+        if "pin" in summary:
+            # Legacy package: replace the plaintext PIN with its hash
+            update["$set"]["pin_hash"] = pin_hash(PIN_HASH_KEY, verification.token, verification.pin)
+            update["$unset"] = {"pin": ""}
+        await app.mongodb.packages.update_one({"package_token": verification.token}, update)
+        receiver_cache.invalidate(verification.token)
+        summary = {**summary, "authenticated": True}
+    
+    return {"message": "PIN verified", "seal_data": seal_data(summary)}
+
+@app.get("/seal-status/{token}")
+async def get_seal_status(token: str):
+    """
+    Latest seal readings and violation status for a PIN-verified package
+    """
+    summary = await get_receiver_summary(token)
+    if not summary.get("authenticated"):
+        raise HTTPException(status_code=403, detail="PIN verification required")
+    return seal_status(summary)
+
+MAX_SYNC_BATCH = 1000
+
+def local_time(at: datetime) -> datetime:
+    """Client timestamps may carry a zone; stored times are naive local time"""
+    return at.astimezone().replace(tzinfo=None) if at.tzinfo else at
+
+async def finish_synced_duplicates(scans: list, results: list, packages: dict):
+    """
+    Queued scans reported as duplicates because their package already has
+    the key. If the request that applied one died before recording it (its
+    receipt has no response yet) the rest is written now; while that
+    request may still be running, the scan is reported as a conflict.
+    """
+    pending = {}
+    for i, scan in enumerate(scans):
+        package = packages.get(scan["package_token"])
+        if results[i]["status"] == "duplicate" and scan["idempotency_key"] in (package.get("scan_keys") or ()):
+            pending.setdefault(f"{scan['package_token']}:{scan['idempotency_key']}", i)
+    if not pending:
+        return
+    
+    now = datetime.now()
+    unfinished = await app.mongodb[SCAN_RECEIPTS_COLLECTION].find(
+        {"_id": {"$in": list(pending)}, "response": {"$exists": False}}, {"_id": 1}
+    ).to_list(length=None)
+    for receipt in unfinished:
+        i = pending[receipt["_id"]]
+        scan = scans[i]
+        taken_over = await take_over_receipt(receipt["_id"], now)
+        if taken_over is None:
+            results[i] = {"status": "conflict", "detail": "Scan is still being recorded, re-send it shortly"}
+            continue
+        await finish_recorded_scan(
+            packages[scan["package_token"]],
+            scan["idempotency_key"],
+            taken_over.get("entry") or {"checkpoint_id": scan["checkpoint_id"]},
+            "entry" in taken_over
+        )
+
+async def record_synced_scans(applied: list):
+    """
+    Everything applied offline scans write after their package updates:
+    checkpoint events, anomaly alerts and hub rollups (sent together), then
+    their receipts. `applied` holds (plan, receipt ids) pairs.
+    """
+    events = [event for plan, _ in applied for event in plan_events(plan)]
+    increments = {}
+    alert_updates = []
+    receipt_updates = []
+    for plan, receipt_ids in applied:
+        plan_increments(plan, increments)
+        package_alerts = []
+        for entry, receipt_id in zip(plan.entries, receipt_ids):
+            alerts = anomaly_detector.observe(plan.package["device_id"], entry["esp32_data"], entry["scanned_at"])
+            package_alerts.extend(alerts)
+            receipt_updates.append(UpdateOne(
+                {"_id": receipt_id},
+                {"$set": {"response": scan_response(entry, alerts)}, "$unset": {"claimed_at": "", "entry": ""}}
+            ))
+        if package_alerts:
+            alert_updates.append(UpdateOne(
+                {"_id": plan.package["_id"]},
+                {
+                    "$push": {"alerts": {"$each": package_alerts, "$slice": -MAX_ALERTS_PER_PACKAGE}},
+                    "$set": {"latest_alert": package_alerts[-1]}
+                }
+            ))
+    
+    writes = [
+        app.mongodb[EVENTS_COLLECTION].insert_many(events, ordered=False),
+        apply_increments(app.mongodb, increments)
+    ]
+    if alert_updates:
+        writes.append(app.mongodb.packages.bulk_write(alert_updates, ordered=False))
+    await asyncio.gather(*writes)
+    await app.mongodb[SCAN_RECEIPTS_COLLECTION].bulk_write(receipt_updates, ordered=False)
+
+@app.post("/delivery/sync-scans")
+async def sync_offline_scans(batch: ScanSyncBatch, token_data: dict = Depends(require_role("delivery"))):
+    """
+    Apply scans queued by a scanner while it was offline.
+    Each scan carries the time it was taken and an idempotency key, so the
+    queue can be re-sent safely, including after a sync that failed partway.
+    Scans are applied per package in time order; each gets a result:
+    applied, duplicate, out_of_order, rejected, not_found or conflict (the
+    package was scanned concurrently; re-send it).
+    """
+    if len(batch.scans) > MAX_SYNC_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SYNC_BATCH} scans per sync")
+    
+    try:
+        scans = []
+        for scan in batch.scans:
+            scan = scan.dict()
+            scan["scanned_at"] = local_time(scan["scanned_at"])
+            scans.append(scan)
+        
+        # One read for every package in the batch
+        tokens = list({scan["package_token"] for scan in scans})
+        packages = {
+            package["package_token"]: package
+            async for package in app.mongodb.packages.find({"package_token": {"$in": tokens}}, SYNC_FIELDS)
+        }
+        results, plans = plan_sync(scans, packages, checkpoint_registry, token_data["sub"])
+        await finish_synced_duplicates(scans, results, packages)
+        
+        if plans:
+            # Claimed before any package moves, so if this request dies midway
+            # a re-send of the queue finds the scans and finishes recording them
+            receipt_ids = [[f"{plan.package['package_token']}:{key}" for key in plan.keys] for plan in plans]
+            unclaimed = await claim_scan_receipts({
+                receipt_id: entry
+                for plan, ids in zip(plans, receipt_ids)
+                for receipt_id, entry in zip(ids, plan.entries)
+            })
+            
+            released = []
+            def conflict(plan, ids):
+                for i in plan.positions:
+                    results[i] = {"status": "conflict", "detail": "Package was scanned concurrently, re-send this scan"}
+                released.extend(receipt_id for receipt_id in ids if receipt_id not in unclaimed)
+            
+            claimed = []
+            for plan, ids in zip(plans, receipt_ids):
+                if unclaimed.isdisjoint(ids):
+                    claimed.append((plan, ids))
+                else:
+                    # Another request is sending some of these scans right now
+                    conflict(plan, ids)
+            
+            applied = []
+            if claimed:
+                now = datetime.now()
+                updates = [plan.update(checkpoint_registry, now) for plan, _ in claimed]
+                write = await app.mongodb.packages.bulk_write(
+                    [UpdateOne(plan.filter(), update) for (plan, _), update in zip(claimed, updates)]
+                )
+                if write.matched_count < len(claimed):
+                    # Some package was scanned since we read it: find out which
+                    current = {
+                        package["_id"]: package.get("scan_keys") or []
+                        async for package in app.mongodb.packages.find(
+                            {"_id": {"$in": [plan.package["_id"] for plan, _ in claimed]}}, {"scan_keys": 1}
+                        )
+                    }
+                    for plan, ids in claimed:
+                        if plan.keys[-1] in current.get(plan.package["_id"], []):
+                            applied.append((plan, ids))
+                        else:
+                            conflict(plan, ids)
+                else:
+                    applied = claimed
+            
+            if released:
+                await app.mongodb[SCAN_RECEIPTS_COLLECTION].delete_many(
+                    {"_id": {"$in": released}, "response": {"$exists": False}}
+                )
+            if applied:
+                await record_synced_scans(applied)
+            
+            for plan, _ in applied:
+                analytics_cache.invalidate(plan.package["sender_id"])
+                receiver_cache.invalidate(plan.package["package_token"])
+                last = plan.entries[-1]
+                broker.publish_package({
+                    **plan.package,
+                    **summary_update(last),
+                    "current_checkpoint": last["checkpoint_id"],
+                    "current_location": last["location"],
+                    "current_status": plan.status,
+                    "hub_arrived_at": plan.arrived_at,
+                    "updated_at": now,
+                    "checkpoints_count": plan.package.get("checkpoints_count", 0) + len(plan.entries)
+                }, plan.package.get("current_checkpoint"))
         
         return {
-            "message": "Checkpoint scan recorded successfully",
-            "checkpoint_id": checkpoint_data.checkpoint_id,
-            "status": checkpoint_data.status,
-            "timestamp": datetime.now().isoformat()
+            "applied": sum(1 for result in results if result["status"] == "applied"),
+            "results": [
+                {"idempotency_key": scan["idempotency_key"], **result}
+                for scan, result in zip(scans, results)
+            ]
         }
         
     except HTTPException:
@@ -428,31 +1451,44 @@ async def scan_checkpoint(checkpoint_data: CheckpointScan, token_data: dict = De
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/hubs/{checkpoint_id}/rollup")
+async def get_hub_rollup(
+    checkpoint_id: str,
+    since: datetime = None,
+    until: datetime = None,
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Hourly arrivals, departures, failures and dwell-time histogram for one hub
+    (defaults to the last 24 hours)
+    """
+    try:
+        until = until or datetime.now()
+        since = since or until - timedelta(hours=24)
+        report = await hub_report(app.mongodb, checkpoint_id, since, until)
+        report["name"] = get_checkpoint_name(checkpoint_id)
+        report["location"] = get_checkpoint_location(checkpoint_id)
+        return report
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- Helper Functions ---
 
 def get_checkpoint_name(checkpoint_id: str) -> str:
     """Get checkpoint name from ID"""
-    checkpoint_names = {
-        "CP001": "Warehouse Dispatch",
-        "CP002": "Local Hub",
-        "CP003": "Transit Hub", 
-        "CP004": "Destination Hub",
-        "CP005": "Out for Delivery",
-        "CP006": "Delivered"
-    }
-    return checkpoint_names.get(checkpoint_id, f"Checkpoint {checkpoint_id}")
+    return checkpoint_registry.name(checkpoint_id)
 
 def get_checkpoint_location(checkpoint_id: str) -> str:
     """Get checkpoint location from ID"""
-    checkpoint_locations = {
-        "CP001": "Mumbai Warehouse",
-        "CP002": "Mumbai Central Hub",
-        "CP003": "Delhi Transit Hub",
-        "CP004": "Bangalore Hub", 
-        "CP005": "Local Delivery Center",
-        "CP006": "Customer Location"
-    }
-    return checkpoint_locations.get(checkpoint_id, f"Location {checkpoint_id}")
+    return checkpoint_registry.location(checkpoint_id)
+
+@app.get("/checkpoints")
+async def list_checkpoints():
+    """
+    All hubs with their locations and allowed next hops
+    """
+    return [checkpoint.to_dict() for checkpoint in checkpoint_registry.all()]
 
 # --- Mock Data for Demo ---
 
@@ -464,6 +1500,7 @@ async def create_mock_data():
     try:
         # Clear existing packages for demo
         await app.mongodb.packages.delete_many({})
+        await app.mongodb[EVENTS_COLLECTION].delete_many({"meta.package_id": {"$exists": True}})
         
         mock_packages = [
             {
@@ -783,8 +1820,16 @@ async def create_mock_data():
             }
         ]
         
+        # Split the journeys out into checkpoint events
+        mock_events = []
+        for package in mock_packages:
+            checkpoints = package.pop("checkpoints")
+            mock_events.extend(build_event(package, entry) for entry in checkpoints)
+            package.update(summarize(checkpoints))
+        
         # Insert mock packages
         await app.mongodb.packages.insert_many(mock_packages)
+        await app.mongodb[EVENTS_COLLECTION].insert_many(mock_events)
         
         return {
             "message": "Mock data created successfully",
@@ -808,93 +1853,259 @@ async def create_mock_data():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Listing projections ---
+# Shaping for the dashboard listings happens in MongoDB so only these fields
+# cross the network. Packages not yet migrated to checkpoint_events still
+# embed their checkpoints, so the summary fields fall back to the array.
+
+CHECKPOINTS_COUNT = {"$ifNull": ["$checkpoints_count", {"$size": {"$ifNull": ["$checkpoints", []]}}]}
+LATEST_ESP32_DATA = {"$ifNull": ["$latest_esp32_data", {"$arrayElemAt": ["$checkpoints.esp32_data", -1]}, None]}
+
+DELIVERY_LISTING_FIELDS = {
+    "_id": {"$toString": "$_id"},
+    "package_id": 1,
+    "order_id": 1,
+    "package_type": 1,
+    "current_status": 1,
+    "current_location": 1,
+    "current_checkpoint": {"$ifNull": ["$current_checkpoint", None]},
+    "updated_at": 1,
+    "checkpoints_count": CHECKPOINTS_COUNT
+}
+
+SENDER_LISTING_FIELDS = {
+    "_id": {"$toString": "$_id"},
+    "package_id": 1,
+    "order_id": 1,
+    "package_type": 1,
+    "device_id": 1,
+    "current_status": 1,
+    "current_location": 1,
+    "current_checkpoint": {"$ifNull": ["$current_checkpoint", None]},
+    "checkpoints_count": CHECKPOINTS_COUNT,
+    "latest_esp32_data": LATEST_ESP32_DATA,
+    "created_at": 1,
+    "updated_at": 1
+}
+
 @app.get("/delivery/packages")
-async def get_delivery_packages(checkpoint_id: str = None, token_data: dict = Depends(require_role("delivery"))):
+async def get_delivery_packages(
+    response: Response,
+    checkpoint_id: str = None,
+    status: str = None,
+    package_type: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    token_data: dict = Depends(require_role("delivery"))
+):
     """
-    Get packages for delivery dashboard
+    Get packages for delivery dashboard, most recently updated first.
+    The cursor for the next page is sent in the X-Next-Cursor header.
     """
     try:
-        query = {}
+        limit = clamp_limit(limit)
+        query = page_filter("updated_at", cursor, since, until)
         if checkpoint_id:
             query["current_checkpoint"] = checkpoint_id
+        if status:
+            query["current_status"] = status
+        if package_type:
+            query["package_type"] = package_type
         
-        packages = []
-        cursor = app.mongodb.packages.find(query).sort("updated_at", -1)
-        
-        async for package in cursor:
-            package["_id"] = str(package["_id"])
-            packages.append({
-                "package_id": package["package_id"],
-                "order_id": package["order_id"],
-                "package_type": package["package_type"],
-                "current_status": package["current_status"],
-                "current_location": package["current_location"],
-                "current_checkpoint": package.get("current_checkpoint"),
-                "updated_at": package["updated_at"].isoformat(),
-                "checkpoints_count": len(package.get("checkpoints", []))
-            })
+        packages = await app.mongodb.packages.aggregate([
+            {"$match": query},
+            {"$sort": page_sort("updated_at")},
+            {"$limit": limit + 1},
+            {"$project": DELIVERY_LISTING_FIELDS}
+        ]).to_list(length=None)
         
+        response.headers["X-Next-Cursor"] = next_cursor(packages, limit, "updated_at") or ""
         return packages
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+DELIVERY_PACKAGE_FIELDS = {
+    **DELIVERY_LISTING_FIELDS,
+    "device_id": 1,
+    "latest_esp32_data": LATEST_ESP32_DATA,
+    "last_checkpoint_status": 1,
+    "last_scanned_at": 1,
+    "latest_alert": 1
+}
+
+@app.get("/delivery/package/{package_token}")
+async def get_delivery_package(package_token: str, token_data: dict = Depends(require_role("delivery"))):
+    """
+    Latest summary of one package, looked up by its QR token before a checkpoint scan
+    """
+    packages = await app.mongodb.packages.aggregate([
+        {"$match": {"package_token": package_token}},
+        {"$limit": 1},
+        {"$project": DELIVERY_PACKAGE_FIELDS}
+    ]).to_list(length=1)
+    if not packages:
+        raise HTTPException(status_code=404, detail="Package not found")
+    return packages[0]
+
 @app.get("/sender/packages")
-async def get_sender_packages(token_data: dict = Depends(require_role("sender"))):
+async def get_sender_packages(
+    response: Response,
+    status: str = None,
+    package_type: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    token_data: dict = Depends(require_role("sender"))
+):
     """
-    Get all packages for sender dashboard
+    Get packages for sender dashboard, newest first.
+    The cursor for the next page is sent in the X-Next-Cursor header.
     """
     try:
-        sender_id = token_data["sub"]
+        limit = clamp_limit(limit)
+        query = page_filter("created_at", cursor, since, until)
+        query["sender_id"] = token_data["sub"]
+        if status:
+            query["current_status"] = status
+        if package_type:
+            query["package_type"] = package_type
         
-        packages = []
-        cursor = app.mongodb.packages.find({"sender_id": sender_id}).sort("created_at", -1)
-        
-        async for package in cursor:
-            package["_id"] = str(package["_id"])
-            
-            # Get latest ESP32 data
-            latest_esp32_data = None
-            if package.get("checkpoints"):
-                latest_checkpoint = package["checkpoints"][-1]
-                latest_esp32_data = latest_checkpoint.get("esp32_data")
-            
-            packages.append({
-                "package_id": package["package_id"],
-                "order_id": package["order_id"],
-                "package_type": package["package_type"],
-                "device_id": package["device_id"],
-                "current_status": package["current_status"],
-                "current_location": package["current_location"],
-                "current_checkpoint": package.get("current_checkpoint"),
-                "checkpoints_count": len(package.get("checkpoints", [])),
-                "latest_esp32_data": latest_esp32_data,
-                "created_at": package["created_at"].isoformat(),
-                "updated_at": package["updated_at"].isoformat()
-            })
+        packages = await app.mongodb.packages.aggregate([
+            {"$match": query},
+            {"$sort": page_sort("created_at")},
+            {"$limit": limit + 1},
+            {"$project": SENDER_LISTING_FIELDS}
+        ]).to_list(length=None)
         
+        response.headers["X-Next-Cursor"] = next_cursor(packages, limit, "created_at") or ""
         return packages
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- Sender Analytics ---
+
+@app.get("/sender/analytics/temperature")
+async def get_temperature_analytics(
+    threshold: float = 30.0,
+    package_type: str = None,
+    from_checkpoint: str = None,
+    to_checkpoint: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    columnar: bool = False,
+    token_data: dict = Depends(require_role("sender"))
+):
+    """
+    Temperature readings across the sender's packages, e.g. how many
+    electronics packages went over 30°C between CP002 and CP004 last week.
+    Set columnar=true for percentiles and a fine-grained histogram.
+    """
+    for checkpoint_id in (from_checkpoint, to_checkpoint):
+        if checkpoint_id and checkpoint_registry.get(checkpoint_id) is None:
+            raise HTTPException(status_code=400, detail=f"Unknown checkpoint {checkpoint_id}")
+    try:
+        sender_id = token_data["sub"]
+        key = ("temperature", threshold, package_type, from_checkpoint, to_checkpoint, since, until, columnar)
+        report = analytics_cache.get(sender_id, key)
+        if report is None:
+            generation = analytics_cache.generation(sender_id)
+            checkpoints = checkpoint_registry.between(from_checkpoint, to_checkpoint) if from_checkpoint or to_checkpoint else None
+            query = event_filter(sender_id, package_type, checkpoints, since, until)
+            report = await temperature_report(app.mongodb, query, threshold, columnar)
+            analytics_cache.put(sender_id, key, report, generation)
+        return report
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/sender/analytics/transit-times")
+async def get_transit_time_analytics(
+    package_type: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    columnar: bool = False,
+    token_data: dict = Depends(require_role("sender"))
+):
+    """
+    Average time the sender's packages take from each hub to their next scan.
+    Set columnar=true for percentiles per hub.
+    """
+    try:
+        sender_id = token_data["sub"]
+        key = ("transit-times", package_type, since, until, columnar)
+        report = analytics_cache.get(sender_id, key)
+        if report is None:
+            generation = analytics_cache.generation(sender_id)
+            query = event_filter(sender_id, package_type, since=since, until=until)
+            report = await transit_time_report(app.mongodb, query, columnar)
+            analytics_cache.put(sender_id, key, report, generation)
+        return report
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def embedded_journey(checkpoints: list, cursor: str = None) -> list:
+    """
+    An unmigrated package's embedded checkpoints after `cursor`, in journey
+    order. Each position in the array stands in for an event ID.
+    """
+    entries = sorted(
+        ({**checkpoint, "_id": ObjectId(f"{i:024x}")} for i, checkpoint in enumerate(checkpoints)),
+        key=lambda entry: (entry["scanned_at"], entry["_id"])
+    )
+    if cursor:
+        after = decode_cursor(cursor)
+        entries = [entry for entry in entries if (entry["scanned_at"], entry["_id"]) > after]
+    return entries
+
 @app.get("/sender/package/{package_id}/journey")
-async def get_package_journey(package_id: str, token_data: dict = Depends(require_role("sender"))):
+async def get_package_journey(
+    package_id: str,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    token_data: dict = Depends(require_role("sender"))
+):
     """
-    Get detailed checkpoint journey for a package
+    Get detailed checkpoint journey for a package, oldest scan first.
+    Pass the returned next_cursor as `cursor` to get the next page.
     """
     try:
-        package = await app.mongodb.packages.find_one({"package_id": package_id, "sender_id": token_data["sub"]})
+        package = await app.mongodb.packages.find_one(
+            {"package_id": package_id, "sender_id": token_data["sub"]},
+            {"package_id": 1, "order_id": 1, "current_status": 1, "current_location": 1,
+             "created_at": 1, "updated_at": 1, "checkpoints": 1}
+        )
         
         if not package:
             raise HTTPException(status_code=404, detail="Package not found")
         
+        limit = clamp_limit(limit)
+        events = app.mongodb[EVENTS_COLLECTION]
+        query = {"meta.package_id": package_id, **page_filter("scanned_at", cursor, ascending=True)}
+        page = await events.find(query).sort(page_sort("scanned_at", ascending=True)).limit(limit + 1).to_list(length=None)
+        
+        # Packages not yet migrated still embed their journey
+        if not page and package.get("checkpoints") and not await events.find_one({"meta.package_id": package_id}, {"_id": 1}):
+            page = embedded_journey(package["checkpoints"], cursor)[:limit + 1]
+        
+        page_cursor = next_cursor(page, limit, "scanned_at")
+        
         return {
             "package_id": package["package_id"],
             "order_id": package["order_id"],
             "current_status": package["current_status"],
             "current_location": package["current_location"],
-            "checkpoints": package.get("checkpoints", []),
+            "checkpoints": [event_to_checkpoint(event) for event in page],
+            "next_cursor": page_cursor,
             "created_at": package["created_at"].isoformat(),
             "updated_at": package["updated_at"].isoformat()
         }
@@ -902,4 +2113,4 @@ async def get_package_journey(package_id: str, token_data: dict = Depends(requir
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,359 @@
+"""
+Outbox-based notification delivery (receiver PIN SMS and the like).
+
+Request handlers never talk to a provider. They write a message to the
+`notification_outbox` collection, in the same transaction as the package
+where the server supports transactions (replica set / mongos) and right
+after it otherwise. The NotificationDispatcher then sends the messages in
+the background:
+
+- a message is claimed atomically (status "sending" plus a lease), so
+  several workers can dispatch from one outbox, and a message whose
+  worker died is picked up again once its lease runs out
+- at most `concurrency` sends are in flight, and each provider has its own
+  token bucket rate limit
+- failures are retried with exponential backoff and jitter; after
+  `max_attempts`, or on a PermanentFailure, the message moves to
+  `notification_dead_letters`
+- sent messages keep status "sent" and expire after a week (TTL index)
+
+Message text can carry a secret (the receiver's PIN), so it is dropped as
+soon as a message is sent and never copied into a dead letter.
+
+Delivery is at least once. Providers implement `NotificationProvider`;
+ConsoleSmsProvider prints the message and FakeProvider records it (and can
+be told to fail) for local testing.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+
+OUTBOX_COLLECTION = "notification_outbox"
+DEAD_LETTER_COLLECTION = "notification_dead_letters"
+
+# Server error for transactions on a standalone mongod
+ILLEGAL_OPERATION = 20
+
+
+class PermanentFailure(Exception):
+    """Raised by a provider when retrying cannot help (e.g. invalid number)."""
+
+
+class NotificationProvider:
+    name = "base"
+
+    def __init__(self, rate: float = 10.0, burst: int = None):
+        # Sends per second and burst size for this provider's token bucket
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+
+    async def send(self, to: str, message: str):
+        raise NotImplementedError
+
+
+class ConsoleSmsProvider(NotificationProvider):
+    name = "sms"
+
+    async def send(self, to: str, message: str):
+        print(f"📱 SMS to {to}: {message}")
+
+
+class FakeProvider(NotificationProvider):
+    """Records messages instead of sending them; fails the first `fail_times` sends."""
+
+    def __init__(self, name: str = "sms", fail_times: int = 0, rate: float = 1000.0):
+        super().__init__(rate)
+        self.name = name
+        self.fail_times = fail_times
+        self.sent = []
+
+    async def send(self, to: str, message: str):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError("fake provider failure")
+        self.sent.append((to, message))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def pin_notification(package_doc: dict, pin: str) -> dict:
+    """Outbox message telling the receiver their PIN."""
+    now = datetime.now()
+    return {
+        "provider": "sms",
+        "to": package_doc["receiver_phone"],
+        "message": f"Your VeriSeal PIN is {pin}",
+        "package_id": package_doc["package_id"],
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+
+
+class NotificationOutbox:
+    def __init__(self, db, dispatcher=None):
+        self.db = db
+        self.dispatcher = dispatcher
+        # Unknown until the first write; False on standalone servers
+        self.transactions = None
+
+    async def insert_with(self, collection, doc: dict, notifications: list):
+        """Insert `doc` into `collection` together with its notifications."""
+        if self.transactions is not False:
+            try:
+                async with await self.db.client.start_session() as session:
+                    async with session.start_transaction():
+                        await collection.insert_one(doc, session=session)
+                        await self.db[OUTBOX_COLLECTION].insert_many(notifications, session=session)
+                self.transactions = True
+                self._wake()
+                return
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                print("Transactions unsupported, writing outbox messages after their documents")
+                self.transactions = False
+                # insert_one set _id before the server refused the transaction
+                doc.pop("_id", None)
+
+        await collection.insert_one(doc)
+        await self.enqueue(notifications)
+
+    async def insert_many_with(self, collection, docs: list, notifications: list):
+        """
+        Insert `docs` into `collection` unordered, each together with its
+        notification (`notifications[i]` goes with `docs[i]`). Like
+        insert_many(ordered=False), raises BulkWriteError for the documents
+        that failed; every other document is inserted, with its notification.
+        In a transaction a failed insert rolls everything back, so the
+        documents that didn't fail are written again in a new one.
+        """
+        if self.transactions is not False:
+            pending = list(range(len(docs)))
+            errors = []
+            try:
+                while pending:
+                    try:
+                        async with await self.db.client.start_session() as session:
+                            async with session.start_transaction():
+                                await collection.insert_many([docs[i] for i in pending], ordered=False, session=session)
+                                await self.db[OUTBOX_COLLECTION].insert_many(
+                                    [notifications[i] for i in pending], session=session
+                                )
+                        break
+                    except BulkWriteError as e:
+                        failed = set()
+                        for error in e.details.get("writeErrors", []):
+                            failed.add(pending[error["index"]])
+                            errors.append({**error, "index": pending[error["index"]]})
+                        if not failed:
+                            raise
+                        for i in pending:
+                            docs[i].pop("_id", None)
+                            notifications[i].pop("_id", None)
+                        pending = [i for i in pending if i not in failed]
+                self.transactions = True
+                self._wake()
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                print("Transactions unsupported, writing outbox messages after their documents")
+                self.transactions = False
+                for doc in docs:
+                    doc.pop("_id", None)
+            else:
+                if errors:
+                    raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+                return
+
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            await self.enqueue([notification for i, notification in enumerate(notifications) if i not in failed])
+            raise
+        await self.enqueue(notifications)
+
+    async def enqueue(self, notifications: list):
+        if notifications:
+            await self.db[OUTBOX_COLLECTION].insert_many(notifications, ordered=False)
+            self._wake()
+
+    def _wake(self):
+        if self.dispatcher is not None:
+            self.dispatcher.wake()
+
+
+class NotificationDispatcher:
+    def __init__(
+        self,
+        providers: list,
+        concurrency: int = 8,
+        max_attempts: int = 6,
+        base_backoff: float = 2.0,
+        max_backoff: float = 600.0,
+        lease: float = 60.0,
+        poll_interval: float = 1.0,
+        send_timeout: float = 10.0
+    ):
+        self.providers = {provider.name: provider for provider in providers}
+        self.limits = {provider.name: TokenBucket(provider.rate, provider.burst) for provider in providers}
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.send_timeout = send_timeout
+        self._db = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wake_event = asyncio.Event()
+        self._task = None
+        self._in_flight = set()
+        self.metrics = {"sent": 0, "retried": 0, "dead_lettered": 0, "claim_errors": 0}
+
+    def start(self, db):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, grace: float = 5.0):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._in_flight:
+            # Anything still sending after the grace period is retried after its lease
+            _, pending = await asyncio.wait(self._in_flight, timeout=grace)
+            for task in pending:
+                task.cancel()
+
+    def wake(self):
+        self._wake_event.set()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                message = await self._claim()
+            except PyMongoError as e:
+                print(f"Error claiming notifications: {e}")
+                self.metrics["claim_errors"] += 1
+                message = None
+            if message is None:
+                self._slots.release()
+                try:
+                    await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake_event.clear()
+                continue
+
+            task = asyncio.create_task(self._deliver(message))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _claim(self):
+        now = datetime.now()
+        return await self._db[OUTBOX_COLLECTION].find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_until": {"$lte": now}},
+            ]},
+            {"$set": {"status": "sending", "locked_until": now + timedelta(seconds=self.lease)}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _deliver(self, message: dict):
+        outbox = self._db[OUTBOX_COLLECTION]
+        try:
+            provider = self.providers.get(message["provider"])
+            if provider is None:
+                await self._dead_letter(message, f"Unknown provider {message['provider']!r}")
+                return
+            await self.limits[provider.name].acquire()
+            try:
+                await asyncio.wait_for(provider.send(message["to"], message["message"]), timeout=self.send_timeout)
+            except PermanentFailure as e:
+                await self._dead_letter(message, str(e))
+                return
+            except Exception as e:
+                await self._retry(message, f"{type(e).__name__}: {e}")
+                return
+
+            await outbox.update_one(
+                {"_id": message["_id"]},
+                {"$set": {"status": "sent", "sent_at": datetime.now()},
+                 "$inc": {"attempts": 1},
+                 "$unset": {"locked_until": "", "message": ""}}
+            )
+            self.metrics["sent"] += 1
+        except PyMongoError as e:
+            # The lease runs out and the message is claimed again
+            print(f"Error recording notification {message['_id']}: {e}")
+        finally:
+            self._slots.release()
+
+    async def _retry(self, message: dict, error: str):
+        attempts = message.get("attempts", 0) + 1
+        if attempts >= self.max_attempts:
+            await self._dead_letter(message, error)
+            return
+        self.metrics["retried"] += 1
+        await self._db[OUTBOX_COLLECTION].update_one(
+            {"_id": message["_id"]},
+            {"$set": {
+                "status": "pending",
+                "attempts": attempts,
+                "last_error": error,
+                "next_attempt_at": datetime.now() + timedelta(seconds=self.backoff(attempts)),
+            },
+             "$unset": {"locked_until": ""}}
+        )
+
+    async def _dead_letter(self, message: dict, error: str):
+        message = dict(message, status="dead", last_error=error, failed_at=datetime.now())
+        message.pop("locked_until", None)
+        message.pop("message", None)
+        await self._db[DEAD_LETTER_COLLECTION].replace_one({"_id": message["_id"]}, message, upsert=True)
+        await self._db[OUTBOX_COLLECTION].delete_one({"_id": message["_id"]})
+        self.metrics["dead_lettered"] += 1
+        print(f"Notification {message['_id']} dead-lettered: {error}")
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["in_flight"] = len(self._in_flight)
+        stats["providers"] = sorted(self.providers)
+        return stats
@@ -0,0 +1,202 @@
+"""
+Bulk package creation for merchant order imports.
+
+An upload is a JSON array, NDJSON (one package per line) or CSV with a
+header row. NDJSON and CSV are processed as they stream in. Rows are
+validated a chunk at a time through a TypeAdapter, as telemetry readings
+are, turned into package documents and written unordered by the caller's
+`insert(docs, pins)` (which queues the PIN notifications with them). A row
+whose generated ID or token clashes with an existing package is retried
+with fresh ones.
+
+`build_doc(row)` returns a new package document and its plaintext PIN
+(only the PIN's hash is stored). Every row gets one result line (NDJSON),
+carrying either the new package's ID, token and PIN or the reason it was
+rejected; `ImportResult` holds a chunk's lines in memory until `take()`
+hands them to the response, so PINs never touch disk. Rows are
+identified by their 0-based position in the upload, not counting the CSV
+header.
+"""
+
+import csv
+import json
+from typing import List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError, PyMongoError
+from typing_extensions import NotRequired, TypedDict
+
+# Rows validated and written per insert_many
+CHUNK_SIZE = 1000
+
+DUPLICATE_KEY = 11000
+INSERT_ATTEMPTS = 3
+
+
+class PackageRow(TypedDict):
+    order_id: str
+    package_type: str
+    receiver_phone: str
+    device_id: str
+    sender_id: NotRequired[str]
+    notes: NotRequired[Optional[str]]
+
+
+rows_adapter = TypeAdapter(List[PackageRow])
+row_adapter = TypeAdapter(PackageRow)
+
+CSV_COLUMNS = set(PackageRow.__annotations__)
+
+
+class ImportResult:
+    def __init__(self):
+        self.received = 0
+        self.created = 0
+        self.rejected = 0
+        self._lines = []
+
+    def _write(self, line: dict):
+        self._lines.append(json.dumps(line).encode("utf-8") + b"\n")
+
+    def take(self) -> bytes:
+        """The result lines written since the last call, as NDJSON."""
+        lines, self._lines = self._lines, []
+        return b"".join(lines)
+
+    def accept(self, position: int, doc: dict, pin: str):
+        self.created += 1
+        self._write({
+            "row": position,
+            "status": "created",
+            "order_id": doc["order_id"],
+            "package_id": doc["package_id"],
+            "package_token": doc["package_token"],
+            "pin": pin,
+        })
+
+    def reject(self, position: int, error: str):
+        self.rejected += 1
+        self._write({"row": position, "status": "rejected", "error": error})
+
+    def summary(self) -> dict:
+        return {"received": self.received, "created": self.created, "rejected": self.rejected}
+
+
+def validate_rows(raw_items: list, positions: list, result: ImportResult):
+    """Validate a chunk of parsed rows. Returns the valid rows and their positions."""
+    try:
+        return rows_adapter.validate_python(raw_items), positions
+    except ValidationError:
+        pass
+
+    # Slow path: at least one bad row, find out which
+    rows, valid_positions = [], []
+    for item, position in zip(raw_items, positions):
+        try:
+            rows.append(row_adapter.validate_python(item))
+            valid_positions.append(position)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            field = ".".join(str(part) for part in error["loc"])
+            result.reject(position, f"{field}: {error['msg']}" if field else error["msg"])
+    return rows, valid_positions
+
+
+def parse_json_lines(lines: list, offset: int, result: ImportResult):
+    """Parse NDJSON lines. Returns the parsed rows and their positions; bad JSON is rejected."""
+    items, positions = [], []
+    for i, line in enumerate(lines):
+        try:
+            items.append(json.loads(line))
+            positions.append(offset + i)
+        except ValueError:
+            result.reject(offset + i, "Invalid JSON")
+    return items, positions
+
+
+def parse_csv_header(line: bytes) -> list:
+    """Column names from the CSV header line. Raises ValueError if a required column is missing."""
+    header = [name.strip() for name in next(csv.reader([line.decode("utf-8-sig")]))]
+    missing = PackageRow.__required_keys__ - set(header)
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+    return header
+
+
+def parse_csv_lines(lines: list, header: list, offset: int, result: ImportResult):
+    """
+    Parse CSV data lines into row dicts. Unknown columns are ignored and
+    empty optional cells are treated as absent. Quoted values may not span
+    lines.
+    """
+    items, positions = [], []
+    for i, line in enumerate(lines):
+        try:
+            values = next(csv.reader([line.decode("utf-8")]))
+        except (UnicodeDecodeError, csv.Error) as e:
+            result.reject(offset + i, f"Invalid CSV: {e}")
+            continue
+        if len(values) != len(header):
+            result.reject(offset + i, f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        item = {}
+        for name, value in zip(header, values):
+            if name not in CSV_COLUMNS:
+                continue
+            if value == "" and name in PackageRow.__optional_keys__:
+                continue
+            item[name] = value
+        items.append(item)
+        positions.append(offset + i)
+    return items, positions
+
+
+async def insert_rows(insert, rows: list, positions: list, build_doc, result: ImportResult) -> list:
+    """
+    Build and insert documents for validated rows with `insert(docs, pins)`,
+    which writes like insert_many(ordered=False). Rows that hit a duplicate
+    key get fresh IDs and are retried. Returns (document, PIN) pairs for the
+    inserted rows.
+    """
+    docs, pins = {}, {}
+    inserted = []
+    pending = list(range(len(rows)))
+    for attempt in range(INSERT_ATTEMPTS):
+        batch, pending = pending, []
+        if not batch:
+            break
+        for i in batch:
+            docs[i], pins[i] = build_doc(rows[i])
+
+        try:
+            await insert([docs[i] for i in batch], [pins[i] for i in batch])
+            write_errors = []
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+        except PyMongoError as e:
+            for i in batch:
+                result.reject(positions[i], f"Write failed: {e}")
+            continue
+
+        failed = set()
+        for error in write_errors:
+            i = batch[error["index"]]
+            failed.add(i)
+            if error.get("code") == DUPLICATE_KEY and attempt < INSERT_ATTEMPTS - 1:
+                # ID or token clash: draw new ones
+                pending.append(i)
+            else:
+                result.reject(positions[i], error.get("errmsg", "write failed"))
+        for i in batch:
+            if i not in failed:
+                result.accept(positions[i], docs[i], pins[i])
+                inserted.append((docs[i], pins[i]))
+    return inserted
+
+
+async def import_items(insert, raw_items: list, positions: list, build_doc, result: ImportResult) -> list:
+    """Validate and write one chunk of parsed rows. Returns (document, PIN) pairs for the inserted rows."""
+    rows, valid_positions = validate_rows(raw_items, positions, result)
+    if not rows:
+        return []
+    return await insert_rows(insert, rows, valid_positions, build_doc, result)
@@ -0,0 +1,76 @@
+"""
+Keyset pagination helpers for the list endpoints.
+
+Pages are ordered by a timestamp field, newest first unless `ascending`,
+with `_id` as the tie breaker. The cursor handed to clients is an opaque,
+URL-safe encoding of the (timestamp, _id) pair of the last item on a page;
+the next page is everything strictly after that pair in sort order, so
+fetching any page is one index range scan no matter how deep it is.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value: datetime, doc_id) -> str:
+    raw = json.dumps({"t": sort_value.isoformat(), "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_filter(field: str, cursor: str = None, since: datetime = None, until: datetime = None, ascending: bool = False) -> dict:
+    """Filter for the page after `cursor`, optionally limited to a time window on `field`."""
+    query = {}
+    window = {}
+    if since:
+        window["$gte"] = since
+    if until:
+        window["$lte"] = until
+    if window:
+        query[field] = window
+
+    if cursor:
+        sort_value, doc_id = decode_cursor(cursor)
+        after = "$gt" if ascending else "$lt"
+        query["$or"] = [
+            {field: {after: sort_value}},
+            {field: sort_value, "_id": {after: doc_id}}
+        ]
+    return query
+
+
+def page_sort(field: str, ascending: bool = False) -> dict:
+    direction = 1 if ascending else -1
+    return {field: direction, "_id": direction}
+
+
+def next_cursor(items: list, limit: int, field: str):
+    """
+    Given up to limit + 1 items, trim to `limit` and return the cursor for
+    the following page (None when this is the last page).
+    """
+    if len(items) <= limit:
+        return None
+    del items[limit:]
+    last = items[-1]
+    return encode_cursor(last[field], last["_id"])
@@ -0,0 +1,125 @@
+"""
+Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt releases the GIL while it works, so a plain thread pool keeps the
+event loop free without the pickling overhead of a process pool. The pool
+has a fixed number of workers and a cap on how many jobs may be waiting;
+anything beyond that is rejected so a login burst cannot pile up behind
+hashing and drag every other endpoint down with it.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full and the job was not accepted."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = 4, max_queue: int = 64, rounds: int = 12, retry_after: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.retry_after = retry_after
+        self._executor = None
+        self._pending = 0
+        self.metrics = {
+            "hashed": 0,
+            "verified": 0,
+            "rehashed": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "hash_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+        }
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        # Jobs currently running or waiting; only the waiting ones count against the cap
+        if self._pending >= self.workers + self.max_queue:
+            self.metrics["rejected"] += 1
+            raise HashingOverloaded(self.retry_after)
+
+        self.start()
+        self._pending += 1
+        enqueued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            result = fn(*args)
+            return result, started_at - enqueued_at, time.perf_counter() - started_at
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, took = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+
+        self._record("queue_wait_seconds", waited)
+        self._record("hash_seconds", took)
+        return result
+
+    def _record(self, name: str, value: float):
+        self.metrics[f"{name}_total"] += value
+        if value > self.metrics[f"{name}_max"]:
+            self.metrics[f"{name}_max"] = value
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hashpw, password, self.rounds)
+        self.metrics["hashed"] += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        ok = await self._run(_checkpw, password, hashed)
+        self.metrics["verified"] += 1
+        return ok
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if the stored hash was made with a different cost factor than the target."""
+        return hash_rounds(hashed) != self.rounds
+
+    async def rehash(self, password: str) -> str:
+        hashed = await self.hash(password)
+        self.metrics["rehashed"] += 1
+        return hashed
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["workers"] = self.workers
+        stats["max_queue"] = self.max_queue
+        stats["in_flight"] = self._pending
+        stats["target_rounds"] = self.rounds
+        return stats
+
+
+def hash_rounds(hashed: str) -> int:
+    """Read the cost factor out of a "$2b$12$..." bcrypt hash."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return -1
+
+
+def _hashpw(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _checkpw(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
@@ -0,0 +1,84 @@
+"""
+Read-through cache of user profiles, keyed by the user's ObjectId.
+
+Concurrent misses for the same user share a single database query
+(single-flight). Profile updates must call `invalidate`; a load that was
+already running when the profile changed is returned to its waiters but
+not cached. If the request running a load is cancelled (e.g. its client
+disconnected), its waiters start the load again themselves.
+"""
+
+import asyncio
+import time
+
+from ttl_cache import TTLCache
+
+PROFILE_FIELDS = {"username": 1, "email": 1, "role": 1, "phone": 1, "company_name": 1}
+
+
+def to_profile(user: dict) -> dict:
+    return {
+        "id": str(user["_id"]),
+        "username": user["username"],
+        "email": user["email"],
+        "role": user["role"],
+        "phone": user.get("phone"),
+        "company_name": user.get("company_name")
+    }
+
+
+class UserProfileCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self._profiles = TTLCache(maxsize, ttl, clock=time.monotonic)
+        self._loading = {}
+        self._stale = set()
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    async def get(self, users, user_id):
+        """Profile dict for `user_id` (an ObjectId), or None if there is no such user."""
+        profile = self._profiles.get(user_id)
+        if profile is not None:
+            self.metrics["hits"] += 1
+            return profile
+
+        loading = self._loading.get(user_id)
+        if loading is not None:
+            self.metrics["coalesced"] += 1
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise
+            return await self.get(users, user_id)
+
+        self.metrics["misses"] += 1
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = loading
+        try:
+            user = await users.find_one({"_id": user_id}, PROFILE_FIELDS)
+            profile = to_profile(user) if user else None
+            if profile is not None and user_id not in self._stale:
+                self._profiles.set(user_id, profile)
+            loading.set_result(profile)
+            return profile
+        except Exception as e:
+            loading.set_exception(e)
+            # Waiters re-raise it; mark it retrieved in case there are none
+            loading.exception()
+            raise
+        finally:
+            if not loading.done():
+                # Cancelled mid-query: wake the waiters so they retry
+                loading.cancel()
+            del self._loading[user_id]
+            self._stale.discard(user_id)
+
+    def invalidate(self, user_id):
+        self._profiles.pop(user_id)
+        if user_id in self._loading:
+            self._stale.add(user_id)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["cached"] = len(self._profiles)
+        return stats
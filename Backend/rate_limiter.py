@@ -0,0 +1,240 @@
+"""
+Attempt throttling with lockout escalation (PIN guessing and the like).
+
+Each (scope, key) pair, e.g. ("token", package_token) or ("ip", address),
+has a sliding-window counter: the counts of the current and previous fixed
+windows, with the previous one weighted by how much of it still overlaps
+the sliding window. An attempt that would take the estimate past the
+scope's limit locks the key out for `lockout` seconds, doubling with every
+further lockout up to `max_lockout`. A key's strikes are forgotten once it
+has been idle for `max_lockout` past its last lockout.
+
+MemoryBackend keeps the counters in the process: a fixed-size slots object
+per key in an LRU-ordered dict, bounded by `max_keys`, with idle keys swept
+out periodically. When it is full, the least recently used key that is
+neither locked out nor carrying strikes makes room, so flooding it with new
+keys can't push an attacker's lockout out of memory. Nothing touches the
+database. With several workers each one counts separately; a SharedBackend
+(e.g. on Redis) makes the limits global. FakeSharedBackend implements that
+interface in memory for tests.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class Limit(NamedTuple):
+    attempts: int
+    window: float
+    lockout: float
+    max_lockout: float
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+    locked: bool = False  # this attempt started a lockout
+
+
+ALLOWED = Decision(True)
+
+# Keys MemoryBackend looks at, oldest first, for one it can evict
+EVICTION_PROBES = 32
+
+
+class KeyState:
+    __slots__ = ("window_start", "previous", "current", "strikes", "locked_until", "expires_at")
+
+    def __init__(self, now: float):
+        self.window_start = now
+        self.previous = 0
+        self.current = 0
+        self.strikes = 0
+        self.locked_until = 0.0
+        self.expires_at = now
+
+    def protected(self, now: float) -> bool:
+        """Locked out, or has strikes that still count towards the next lockout."""
+        return now < self.locked_until or (self.strikes > 0 and now < self.expires_at)
+
+
+def apply_hit(state: KeyState, limit: Limit, now: float) -> Decision:
+    """Count one attempt against `state`."""
+    if now < state.locked_until:
+        return Decision(False, state.locked_until - now)
+
+    elapsed = int((now - state.window_start) // limit.window)
+    if elapsed > 0:
+        state.previous = state.current if elapsed == 1 else 0
+        state.current = 0
+        state.window_start += elapsed * limit.window
+    if now >= state.expires_at:
+        # Idle long enough: forget earlier lockouts
+        state.strikes = 0
+
+    overlap = 1.0 - (now - state.window_start) / limit.window
+    if state.previous * overlap + state.current + 1 > limit.attempts:
+        lockout = min(limit.max_lockout, limit.lockout * 2 ** state.strikes)
+        state.strikes += 1
+        state.locked_until = now + lockout
+        state.previous = state.current = 0
+        state.expires_at = state.locked_until + limit.max_lockout
+        return Decision(False, lockout, locked=True)
+
+    state.current += 1
+    state.expires_at = max(state.expires_at, now + limit.window)
+    return ALLOWED
+
+
+class MemoryBackend:
+    shared = False
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._states = OrderedDict()
+        self.evicted = 0
+        self.evicted_protected = 0
+
+    def _make_room(self, now: float):
+        # Oldest first; protected keys are moved to the back as they are passed over
+        for _ in range(min(EVICTION_PROBES, len(self._states))):
+            key, state = next(iter(self._states.items()))
+            if not state.protected(now):
+                del self._states[key]
+                self.evicted += 1
+                return
+            self._states.move_to_end(key)
+        # Nearly everything is protected: the oldest has to go anyway
+        self._states.popitem(last=False)
+        self.evicted += 1
+        self.evicted_protected += 1
+
+    def hit(self, key: tuple, limit: Limit) -> Decision:
+        now = self.clock()
+        state = self._states.get(key)
+        if state is None:
+            if len(self._states) >= self.max_keys:
+                self._make_room(now)
+            state = KeyState(now)
+            self._states[key] = state
+        else:
+            self._states.move_to_end(key)
+        return apply_hit(state, limit, now)
+
+    def reset(self, key: tuple):
+        self._states.pop(key, None)
+
+    def evict(self) -> int:
+        """Drop keys with no counts, lockout or strikes worth keeping."""
+        now = self.clock()
+        expired = [key for key, state in self._states.items() if now >= state.expires_at]
+        for key in expired:
+            del self._states[key]
+        self.evicted += len(expired)
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+class SharedBackend:
+    """Counters shared between workers. Implementations must make `hit` atomic per key."""
+    shared = True
+
+    async def hit(self, key: tuple, limit: Limit) -> Decision:
+        raise NotImplementedError
+
+    async def reset(self, key: tuple):
+        raise NotImplementedError
+
+    async def evict(self) -> int:
+        # Shared stores normally expire keys themselves
+        return 0
+
+
+class FakeSharedBackend(SharedBackend):
+    """In-memory SharedBackend for tests; records the calls it gets."""
+
+    def __init__(self, clock=time.monotonic):
+        self._memory = MemoryBackend(clock=clock)
+        self.calls = []
+
+    async def hit(self, key: tuple, limit: Limit) -> Decision:
+        self.calls.append(("hit", key))
+        return self._memory.hit(key, limit)
+
+    async def reset(self, key: tuple):
+        self.calls.append(("reset", key))
+        self._memory.reset(key)
+
+    async def evict(self) -> int:
+        return self._memory.evict()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+
+class RateLimiter:
+    def __init__(self, limits: dict, backend=None, evict_interval: float = 60.0):
+        """`limits` maps scope name -> Limit."""
+        self.limits = limits
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.evict_interval = evict_interval
+        self._task = None
+        self.metrics = {
+            scope: {"allowed": 0, "rejected": 0, "lockouts": 0}
+            for scope in limits
+        }
+
+    async def hit(self, scope: str, key: str) -> Decision:
+        limit = self.limits[scope]
+        if self.backend.shared:
+            decision = await self.backend.hit((scope, key), limit)
+        else:
+            decision = self.backend.hit((scope, key), limit)
+
+        counters = self.metrics[scope]
+        if decision.allowed:
+            counters["allowed"] += 1
+        else:
+            counters["rejected"] += 1
+            if decision.locked:
+                counters["lockouts"] += 1
+        return decision
+
+    async def reset(self, scope: str, key: str):
+        if self.backend.shared:
+            await self.backend.reset((scope, key))
+        else:
+            self.backend.reset((scope, key))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._evict_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            if self.backend.shared:
+                await self.backend.evict()
+            else:
+                self.backend.evict()
+
+    def stats(self) -> dict:
+        stats = {scope: dict(counters) for scope, counters in self.metrics.items()}
+        stats["tracked_keys"] = len(self.backend) if hasattr(self.backend, "__len__") else None
+        stats["evicted"] = getattr(self.backend, "evicted", None)
+        stats["evicted_protected"] = getattr(self.backend, "evicted_protected", None)
+        return stats
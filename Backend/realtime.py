@@ -0,0 +1,185 @@
+"""
+Push channel for package and seal status updates.
+
+Clients subscribe to topics ("sender:<id>", "checkpoint:<id>",
+"package:<id>", "seals") over a WebSocket and receive small delta messages
+whenever something they watch changes, instead of re-polling whole lists.
+
+Updates reach the broker in one of two ways:
+  - change streams: a single watcher per process tails MongoDB and
+    publishes every package/seal change (needs a replica set), or
+  - in-process: the endpoints that mutate state publish directly. This is
+    the fallback for a single node and is switched off while a change
+    stream is running so nothing is delivered twice.
+
+Each connection has a bounded map of pending messages keyed by entity, so
+rapid updates to the same package collapse into the latest one, and a slow
+client can never make the server buffer more than `max_pending` messages.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from pymongo.errors import PyMongoError
+
+PACKAGE_DELTA_FIELDS = (
+    "package_id", "sender_id", "package_type", "current_status", "current_checkpoint",
+    "current_location", "checkpoints_count", "latest_esp32_data", "updated_at"
+)
+
+
+def package_delta(package: dict) -> dict:
+    delta = {"type": "package"}
+    for field in PACKAGE_DELTA_FIELDS:
+        if field in package:
+            delta[field] = package[field]
+    if hasattr(delta.get("updated_at"), "isoformat"):
+        delta["updated_at"] = delta["updated_at"].isoformat()
+    return delta
+
+
+def package_topics(package: dict, previous_checkpoint: str = None) -> list:
+    """
+    Topics a package update goes to. A package that just left
+    `previous_checkpoint` is also published there, so that hub's view can
+    drop it.
+    """
+    topics = [f"package:{package['package_id']}"]
+    if package.get("sender_id"):
+        topics.append(f"sender:{package['sender_id']}")
+    if package.get("current_checkpoint"):
+        topics.append(f"checkpoint:{package['current_checkpoint']}")
+    if previous_checkpoint and previous_checkpoint != package.get("current_checkpoint"):
+        topics.append(f"checkpoint:{previous_checkpoint}")
+    return topics
+
+
+def seal_delta(seal: dict) -> dict:
+    last_updated = seal.get("last_updated")
+    return {
+        "type": "seal",
+        "seal_id": seal["seal_id"],
+        "status": seal.get("status"),
+        "last_updated": last_updated.isoformat() if hasattr(last_updated, "isoformat") else last_updated
+    }
+
+
+class Subscriber:
+    def __init__(self, topics, max_pending: int = 256):
+        self.topics = set(topics)
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def offer(self, key: str, message: dict):
+        if key in self._pending:
+            # Coalesce: keep the slot, replace the content with the newest state
+            self._pending[key] = message
+        else:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = message
+        self._ready.set()
+
+    async def next_batch(self) -> list:
+        await self._ready.wait()
+        self._ready.clear()
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class Broker:
+    def __init__(self, max_pending: int = 256):
+        self.max_pending = max_pending
+        self.source = "local"
+        self._topics = {}
+        self._watch_task = None
+
+    def subscribe(self, topics) -> Subscriber:
+        subscriber = Subscriber(topics, self.max_pending)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topics, key: str, message: dict):
+        delivered = set()
+        for topic in topics:
+            for subscriber in self._topics.get(topic, ()):
+                if subscriber not in delivered:
+                    subscriber.offer(key, message)
+                    delivered.add(subscriber)
+
+    # --- Sources ---
+
+    def publish_package(self, package: dict, previous_checkpoint: str = None):
+        """In-process publish from an endpoint; ignored while a change stream feeds the broker."""
+        if self.source == "local":
+            self._publish_package(package, previous_checkpoint)
+
+    def publish_seal(self, seal: dict):
+        if self.source == "local":
+            self._publish_seal(seal)
+
+    def _publish_package(self, package: dict, previous_checkpoint: str = None):
+        self.publish(
+            package_topics(package, previous_checkpoint), f"package:{package['package_id']}", package_delta(package)
+        )
+
+    def _publish_seal(self, seal: dict):
+        self.publish(["seals", f"seal:{seal['seal_id']}"], f"seal:{seal['seal_id']}", seal_delta(seal))
+
+    def start_change_stream(self, db):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch(db))
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        self.source = "local"
+
+    async def _watch(self, db):
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": ["packages", "seals"]},
+            "operationType": {"$in": ["insert", "update", "replace"]}
+        }}]
+        try:
+            await db.command("collMod", "packages", changeStreamPreAndPostImages={"enabled": True})
+        except PyMongoError as e:
+            # MongoDB < 6.0: updates reach the new hub's topic but not the old one's
+            print(f"⚠️ Package pre-images unavailable ({e})")
+        try:
+            # The pre-image tells which hub a package left
+            async with db.watch(
+                pipeline, full_document="updateLookup", full_document_before_change="whenAvailable"
+            ) as stream:
+                self.source = "change_stream"
+                print("Realtime updates driven by MongoDB change streams")
+                async for change in stream:
+                    document = change.get("fullDocument")
+                    if not document:
+                        continue
+                    if change["ns"]["coll"] == "packages":
+                        before = change.get("fullDocumentBeforeChange") or {}
+                        self._publish_package(document, before.get("current_checkpoint"))
+                    else:
+                        self._publish_seal(document)
+        except PyMongoError as e:
+            print(f"⚠️ Change streams unavailable ({e}), using in-process updates")
+        finally:
+            self.source = "local"
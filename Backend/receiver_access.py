@@ -0,0 +1,124 @@
+"""
+Receiver-side lookups behind the QR scan page: token check, PIN check and
+seal status.
+
+Each package token maps to a small summary, read from `packages` by the
+unique package_token index with a minimal projection and cached in
+process. Checkpoint scans, PIN verification and device alerts invalidate
+the affected entries; the TTL bounds how stale anything else can get.
+
+PINs are stored as an HMAC-SHA256 of token and PIN under a server-side key
+and compared in constant time. Packages created before that still carry a
+plaintext `pin`; `check_pin` accepts it and the caller upgrades the
+package to a hash.
+"""
+
+import hashlib
+import hmac
+import time
+
+from ttl_cache import TTLCache
+
+RECEIVER_FIELDS = {
+    "_id": 0,
+    "package_id": 1,
+    "package_type": 1,
+    "device_id": 1,
+    "pin_hash": 1,
+    "pin": 1,
+    "authenticated": 1,
+    "current_status": 1,
+    "current_checkpoint": 1,
+    "last_checkpoint_status": 1,
+    "latest_esp32_data": 1,
+    "latest_alert": 1,
+}
+
+
+def pin_hash(key: bytes, token: str, pin: str) -> str:
+    return hmac.new(key, f"{token}:{pin}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def check_pin(key: bytes, token: str, pin: str, summary: dict) -> bool:
+    stored = summary.get("pin_hash")
+    if stored is not None:
+        return hmac.compare_digest(pin_hash(key, token, pin), stored)
+    legacy = summary.get("pin")
+    return legacy is not None and hmac.compare_digest(pin.encode("utf-8"), str(legacy).encode("utf-8"))
+
+
+def seal_data(summary: dict) -> dict:
+    """Package details shown to the receiver (no PIN material)."""
+    return {
+        "package_id": summary["package_id"],
+        "package_type": summary.get("package_type"),
+        "seal_id": summary.get("device_id"),
+        "current_status": summary.get("current_status"),
+        "current_checkpoint": summary.get("current_checkpoint"),
+        "authenticated": bool(summary.get("authenticated")),
+    }
+
+
+def seal_status(summary: dict) -> dict:
+    """SAFE unless the seal was tampered with, a checkpoint failed, or an anomaly alert fired."""
+    reading = summary.get("latest_esp32_data") or {}
+    alert = summary.get("latest_alert")
+    if reading.get("tamper_status") == "tampered":
+        violation = "tampered"
+    elif alert:
+        violation = alert.get("type")
+    elif summary.get("last_checkpoint_status") == "failed":
+        violation = "checkpoint_failed"
+    else:
+        violation = None
+    return {
+        "package_id": summary["package_id"],
+        "status": "SAFE" if violation is None else "VIOLATION",
+        "violation_type": violation,
+        "alert": alert.get("message") if alert else None,
+        "current_temp": reading.get("temperature"),
+        "humidity": reading.get("humidity"),
+        "battery_level": reading.get("battery_level"),
+        "current_status": summary.get("current_status"),
+    }
+
+
+class ReceiverCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self._summaries = TTLCache(maxsize, ttl, clock=time.monotonic)
+        # device_id -> tokens cached for it, so device alerts can invalidate them
+        self._by_device = {}
+        self.metrics = {"hits": 0, "misses": 0}
+
+    async def get(self, packages, token: str):
+        """Summary for `token`, or None if no package has it."""
+        summary = self._summaries.get(token)
+        if summary is not None:
+            self.metrics["hits"] += 1
+            return summary
+
+        self.metrics["misses"] += 1
+        summary = await packages.find_one({"package_token": token}, RECEIVER_FIELDS)
+        if summary is not None:
+            self._summaries.set(token, summary)
+            device_id = summary.get("device_id")
+            if device_id is not None:
+                # Drop tokens that have since been evicted while we're here
+                tokens = {cached for cached in self._by_device.get(device_id, ()) if cached in self._summaries}
+                tokens.add(token)
+                self._by_device[device_id] = tokens
+        return summary
+
+    def invalidate(self, token: str):
+        summary = self._summaries.pop(token)
+        if summary is not None:
+            self._by_device.get(summary.get("device_id"), set()).discard(token)
+
+    def invalidate_device(self, device_id: str):
+        for token in self._by_device.pop(device_id, ()):
+            self._summaries.pop(token)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["cached"] = len(self._summaries)
+        return stats
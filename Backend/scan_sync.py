@@ -0,0 +1,177 @@
+"""
+Applying queued offline checkpoint scans in one batch.
+
+Hub scanners that lose connectivity queue scans locally, each with the
+client's timestamp and an idempotency key, and upload the queue when they
+are back online. `plan_sync` takes the packages involved (read in a single
+query) and works out in memory, per package and in timestamp order, which
+scans apply:
+
+  - duplicate: the idempotency key was already applied (the package keeps
+    its last MAX_SCAN_KEYS keys in `scan_keys`) or appears earlier in the
+    batch
+  - out_of_order: scanned before the package's latest recorded scan
+  - rejected: the checkpoint is unknown, or the scan is not a legal
+    transition of the journey state machine
+  - not_found: no package has the token
+
+The scans that do apply become one conditional update per package,
+guarded on the `last_scanned_at` the plan was based on. If another scan
+got in first the update matches nothing and those scans are reported as
+conflicts, to be retried. The update also journals, per key, the hub
+each scan moved the package from, so a scan applied by a request that
+died before recording it can be finished when the queue is re-sent.
+"""
+
+from checkpoint_events import build_event, summary_update
+from hub_rollups import merge_increments, scan_increments
+
+# Idempotency keys remembered per package
+MAX_SCAN_KEYS = 50
+# Keyed scans whose previous hub the package remembers (see `scan_journal`)
+MAX_SCAN_JOURNAL = 10
+
+SYNC_FIELDS = {
+    "package_id": 1,
+    "package_token": 1,
+    "sender_id": 1,
+    "package_type": 1,
+    "device_id": 1,
+    "current_checkpoint": 1,
+    "current_status": 1,
+    "last_scanned_at": 1,
+    "hub_arrived_at": 1,
+    "checkpoints_count": 1,
+    "scan_keys": 1,
+    "scan_journal": 1,
+}
+
+
+def arrived_at(package: dict):
+    """When the package got to its current hub (packages scanned before this was tracked: its last scan)."""
+    return package.get("hub_arrived_at") or package.get("last_scanned_at")
+
+
+class PackagePlan:
+    def __init__(self, package: dict):
+        self.package = package
+        self.entries = []
+        self.keys = []
+        self.positions = []
+        self.previous = []  # (checkpoint, arrived_at) before each entry
+        self.checkpoint = package.get("current_checkpoint")
+        self.last_scanned_at = package.get("last_scanned_at")
+        self.arrived_at = arrived_at(package)
+        self.status = package.get("current_status")
+
+    def filter(self) -> dict:
+        """Matches the package only if nothing was scanned since it was read."""
+        return {"_id": self.package["_id"], "last_scanned_at": self.package.get("last_scanned_at")}
+
+    def update(self, registry, now) -> dict:
+        last = self.entries[-1]
+        checkpoint = registry.get(last["checkpoint_id"])
+        return {
+            "$inc": {"checkpoints_count": len(self.entries)},
+            "$set": {
+                "current_checkpoint": checkpoint.checkpoint_id,
+                "current_location": checkpoint.location,
+                "current_status": self.status,
+                "hub_arrived_at": self.arrived_at,
+                "updated_at": now,
+                **summary_update(last)
+            },
+            "$push": {
+                "scan_keys": {"$each": self.keys, "$slice": -MAX_SCAN_KEYS},
+                "scan_journal": {"$each": [
+                    {"key": key, "previous_checkpoint": hub, "previous_arrived_at": since}
+                    for key, (hub, since) in zip(self.keys, self.previous)
+                ], "$slice": -MAX_SCAN_JOURNAL},
+            },
+        }
+
+
+def plan_sync(scans: list, packages: dict, registry, scanned_by: str) -> tuple:
+    """
+    `scans` are dicts with package_token, checkpoint_id, esp32_data, status,
+    notes, scanned_at and idempotency_key; `packages` maps token -> package
+    (SYNC_FIELDS). Returns (results, plans): one result per
+    scan, in request order, and a PackagePlan per package with scans to apply.
+    """
+    results = [None] * len(scans)
+    plans = {}
+    seen = set()
+
+    order = sorted(range(len(scans)), key=lambda i: (scans[i]["package_token"], scans[i]["scanned_at"]))
+    for i in order:
+        scan = scans[i]
+        key = scan["idempotency_key"]
+        token = scan["package_token"]
+        package = packages.get(token)
+        if package is None:
+            results[i] = {"status": "not_found", "detail": "Package not found"}
+            continue
+
+        plan = plans.get(token)
+        if plan is None:
+            plan = plans[token] = PackagePlan(package)
+
+        if (token, key) in seen or key in (package.get("scan_keys") or ()):
+            results[i] = {"status": "duplicate"}
+            continue
+        seen.add((token, key))
+
+        if plan.last_scanned_at is not None and scan["scanned_at"] < plan.last_scanned_at:
+            results[i] = {"status": "out_of_order", "detail": f"Package was last scanned at {plan.last_scanned_at.isoformat()}"}
+            continue
+
+        checkpoint = registry.get(scan["checkpoint_id"])
+        if checkpoint is None:
+            results[i] = {"status": "rejected", "detail": f"Unknown checkpoint {scan['checkpoint_id']}"}
+            continue
+        status = registry.transitions.next_status(plan.checkpoint, plan.status, checkpoint.checkpoint_id, scan["status"])
+        if status is None:
+            results[i] = {
+                "status": "rejected",
+                "detail": f"Package cannot move from {plan.checkpoint or 'creation'} ({plan.status}) to {checkpoint.checkpoint_id}"
+            }
+            continue
+
+        plan.entries.append({
+            "checkpoint_id": checkpoint.checkpoint_id,
+            "name": checkpoint.name,
+            "location": checkpoint.location,
+            "scanned_by": scanned_by,
+            "scanned_at": scan["scanned_at"],
+            "esp32_data": scan["esp32_data"],
+            "status": scan["status"],
+            "notes": scan.get("notes")
+        })
+        plan.keys.append(key)
+        plan.positions.append(i)
+        plan.previous.append((plan.checkpoint, plan.arrived_at))
+        if checkpoint.checkpoint_id != plan.checkpoint:
+            plan.arrived_at = scan["scanned_at"]
+        plan.checkpoint = checkpoint.checkpoint_id
+        plan.last_scanned_at = scan["scanned_at"]
+        plan.status = status
+        results[i] = {"status": "applied"}
+
+    return results, [plan for plan in plans.values() if plan.entries]
+
+
+def plan_events(plan: PackagePlan) -> list:
+    events = []
+    for entry, key in zip(plan.entries, plan.keys):
+        event = build_event(plan.package, entry)
+        event["scan_key"] = key
+        events.append(event)
+    return events
+
+
+def plan_increments(plan: PackagePlan, increments: dict):
+    """Add the hub rollup counters for the plan's scans to `increments`."""
+    for entry, (checkpoint, since) in zip(plan.entries, plan.previous):
+        merge_increments(increments, scan_increments(
+            checkpoint, since, entry["checkpoint_id"], entry["status"], entry["scanned_at"]
+        ))
@@ -0,0 +1,132 @@
+"""
+Write-behind buffer for seal status upserts from /log.
+
+Updates are collected per seal_id in memory: a newer status replaces an
+older pending one (last write wins) while `last_updated` keeps the latest
+timestamp seen. Pending updates are written as one unordered bulk_write
+every `flush_interval` seconds, or sooner once `max_items` seals are
+waiting.
+
+In durable mode `put` returns only after the update has been written; in
+fast mode it returns as soon as the update is queued, and anything still
+queued is written on shutdown.
+"""
+
+import asyncio
+import time
+
+from pymongo import UpdateOne
+
+
+class SealWriteBuffer:
+    def __init__(self, flush_interval: float = 0.05, max_items: int = 500, durable: bool = True):
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+        self.durable = durable
+        self._collection = None
+        self._pending = {}
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.metrics = {
+            "received": 0,
+            "written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "flush_seconds_total": 0.0,
+            "flush_seconds_max": 0.0,
+        }
+
+    def start(self, collection):
+        self._collection = collection
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def put(self, seal_id: str, status: str, last_updated):
+        self.metrics["received"] += 1
+        entry = self._pending.get(seal_id)
+        if entry is None:
+            entry = {"status": status, "last_updated": last_updated, "waiters": []}
+            self._pending[seal_id] = entry
+        else:
+            entry["status"] = status
+            if last_updated > entry["last_updated"]:
+                entry["last_updated"] = last_updated
+
+        if len(self._pending) >= self.max_items:
+            self._wake.set()
+
+        if self.durable:
+            waiter = asyncio.get_running_loop().create_future()
+            entry["waiters"].append(waiter)
+            await waiter
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing seal updates: {e}")
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending or self._collection is None:
+                return
+            batch, self._pending = self._pending, {}
+
+            started_at = time.perf_counter()
+            try:
+                await self._collection.bulk_write([
+                    UpdateOne(
+                        {"seal_id": seal_id},
+                        {"$set": {"status": entry["status"]}, "$max": {"last_updated": entry["last_updated"]}},
+                        upsert=True
+                    )
+                    for seal_id, entry in batch.items()
+                ], ordered=False)
+            except Exception as e:
+                self.metrics["flush_errors"] += 1
+                for seal_id, entry in batch.items():
+                    if entry["waiters"]:
+                        # Durable callers get the error and may retry themselves
+                        for waiter in entry["waiters"]:
+                            if not waiter.done():
+                                waiter.set_exception(e)
+                    elif seal_id not in self._pending:
+                        # Fast-mode updates go back in the queue for the next flush
+                        entry["waiters"] = []
+                        self._pending[seal_id] = entry
+                raise
+
+            took = time.perf_counter() - started_at
+            self.metrics["flushes"] += 1
+            self.metrics["written"] += len(batch)
+            self.metrics["flush_seconds_total"] += took
+            self.metrics["flush_seconds_max"] = max(self.metrics["flush_seconds_max"], took)
+            for entry in batch.values():
+                for waiter in entry["waiters"]:
+                    if not waiter.done():
+                        waiter.set_result(None)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["pending"] = len(self._pending)
+        stats["mode"] = "durable" if self.durable else "fast"
+        # How many /log calls each database write absorbed on average
+        stats["coalescing_ratio"] = stats["received"] / stats["written"] if stats["written"] else None
+        return stats
@@ -0,0 +1,205 @@
+"""
+Package journey state machine.
+
+A package's state is (current_checkpoint, current_status). The rules are
+declared below and compiled, against the hubs in the checkpoint registry,
+into a dict keyed by (from checkpoint, from status, to checkpoint, scan
+outcome), so checking a scan is a single lookup:
+
+  - a new package ("created", no checkpoint) may only be scanned at an
+    initial hub
+  - a package in transit may be scanned again at its current hub (e.g. to
+    re-check after a failure) or at one of that hub's next hops
+  - a passed scan leaves it "at_checkpoint", or "delivered" at a final hub
+    (one with no next hops); any other scan result is "checkpoint_failed"
+  - "delivered" is terminal
+
+Run this file directly to audit every package's recorded journey against
+the rules in one pass over packages and checkpoint events:
+
+    python state_machine.py
+"""
+
+import asyncio
+import os
+from collections import defaultdict
+from typing import Optional
+
+from checkpoint_events import EVENTS_COLLECTION
+
+INITIAL_STATUS = "created"
+IN_TRANSIT_STATUSES = ("at_checkpoint", "checkpoint_failed")
+TERMINAL_STATUSES = ("delivered",)
+STATUSES = (INITIAL_STATUS,) + IN_TRANSIT_STATUSES + TERMINAL_STATUSES
+
+OUTCOMES = ("passed", "failed")
+
+# (scan outcome, arriving at a final hub) -> package status after the scan
+SCAN_RESULTS = {
+    ("passed", False): "at_checkpoint",
+    ("passed", True): "delivered",
+    ("failed", False): "checkpoint_failed",
+    ("failed", True): "checkpoint_failed",
+}
+
+
+def scan_outcome(scan_status: str) -> str:
+    """Scans report "passed", "failed" or "pending"; anything but passed counts as failed."""
+    return "passed" if scan_status == "passed" else "failed"
+
+
+class TransitionTable:
+    def __init__(self, transitions: dict):
+        self._transitions = transitions
+        # (to checkpoint, outcome) -> {from status: [from checkpoints]}, for query filters
+        self._sources = defaultdict(lambda: defaultdict(list))
+        # (to checkpoint, outcome) -> resulting status, which never depends on where it came from
+        self._results = {}
+        for (from_id, from_status, to_id, outcome), status in transitions.items():
+            self._sources[(to_id, outcome)][from_status].append(from_id)
+            self._results[(to_id, outcome)] = status
+
+    def next_status(self, from_id: Optional[str], from_status: str, to_id: str, scan_status: str) -> Optional[str]:
+        """Package status after the scan, or None if the scan is not allowed."""
+        return self._transitions.get((from_id, from_status, to_id, scan_outcome(scan_status)))
+
+    def status_after(self, to_id: str, scan_status: str) -> Optional[str]:
+        """Package status after a legal scan at `to_id` (None for an unknown hub)."""
+        return self._results.get((to_id, scan_outcome(scan_status)))
+
+    def scan_filter(self, to_id: str, scan_status: str) -> dict:
+        """Query matching packages that may take this scan (matches nothing for an unknown hub)."""
+        sources = self._sources.get((to_id, scan_outcome(scan_status)))
+        if not sources:
+            return {"current_status": {"$in": []}}
+        return {"$or": [
+            {"current_status": from_status, "current_checkpoint": {"$in": from_ids}}
+            for from_status, from_ids in sources.items()
+        ]}
+
+    def __len__(self) -> int:
+        return len(self._transitions)
+
+
+def compile_transitions(checkpoints) -> TransitionTable:
+    """Build the lookup table for a set of hubs (objects with checkpoint_id, initial, next_hops)."""
+    checkpoints = list(checkpoints)
+    transitions = {}
+    for target in checkpoints:
+        final = not target.next_hops
+        sources = [
+            hub.checkpoint_id for hub in checkpoints
+            if hub.checkpoint_id == target.checkpoint_id or target.checkpoint_id in hub.next_hops
+        ]
+        for outcome in OUTCOMES:
+            status = SCAN_RESULTS[(outcome, final)]
+            if target.initial:
+                transitions[(None, INITIAL_STATUS, target.checkpoint_id, outcome)] = status
+            for from_id in sources:
+                for from_status in IN_TRANSIT_STATUSES:
+                    transitions[(from_id, from_status, target.checkpoint_id, outcome)] = status
+    return TransitionTable(transitions)
+
+
+def check_journey(table: TransitionTable, package: dict, scans: list) -> list:
+    """
+    Replay a package's scans (dicts with checkpoint_id and status, oldest
+    first) and return its problems: illegal steps, and a stored
+    checkpoint/status that doesn't match where the journey ends.
+    """
+    problems = []
+    checkpoint, status = None, INITIAL_STATUS
+    for number, scan in enumerate(scans, 1):
+        to_id = scan.get("checkpoint_id")
+        next_status = table.next_status(checkpoint, status, to_id, scan.get("status"))
+        if next_status is None:
+            problems.append(f"scan {number}: illegal move from {checkpoint or 'creation'} ({status}) to {to_id}")
+            # Carry on as if the package had got there legally
+            next_status = table.next_status(to_id, IN_TRANSIT_STATUSES[0], to_id, scan.get("status")) or status
+        checkpoint, status = to_id, next_status
+
+    stored = (package.get("current_checkpoint"), package.get("current_status"))
+    if stored != (checkpoint, status):
+        problems.append(
+            f"package is at {stored[0] or 'creation'} ({stored[1]}) but its scans end at "
+            f"{checkpoint or 'creation'} ({status})"
+        )
+    return problems
+
+
+async def audit_journeys(db, table: TransitionTable, batch_size: int = 1000):
+    """
+    Yield (package_id, problems) for every package whose journey breaks the
+    rules. Packages and events are both streamed in package_id order and
+    merged, so only one package's scans are in memory at a time. Events
+    whose package doesn't exist are reported too.
+    """
+    packages = db.packages.find(
+        {},
+        {"package_id": 1, "current_checkpoint": 1, "current_status": 1, "checkpoints.checkpoint_id": 1, "checkpoints.status": 1}
+    ).sort("package_id", 1).batch_size(batch_size)
+    events = db[EVENTS_COLLECTION].find(
+        {},
+        {"meta.package_id": 1, "checkpoint_id": 1, "status": 1}
+    ).sort([("meta.package_id", 1), ("scanned_at", 1)]).batch_size(batch_size)
+
+    async def next_event():
+        try:
+            return await events.next()
+        except StopAsyncIteration:
+            return None
+
+    event = await next_event()
+    async for package in packages:
+        package_id = package["package_id"]
+        orphans = set()
+        while event is not None and event["meta"]["package_id"] < package_id:
+            orphans.add(event["meta"]["package_id"])
+            event = await next_event()
+        for orphan in sorted(orphans):
+            yield orphan, ["checkpoint events for a package that doesn't exist"]
+
+        scans = []
+        while event is not None and event["meta"]["package_id"] == package_id:
+            scans.append(event)
+            event = await next_event()
+        if not scans:
+            # Not migrated yet: checkpoints still embedded in the package
+            scans = package.get("checkpoints") or []
+
+        problems = check_journey(table, package, scans)
+        if problems:
+            yield package_id, problems
+
+    orphans = set()
+    while event is not None:
+        orphans.add(event["meta"]["package_id"])
+        event = await next_event()
+    for orphan in sorted(orphans):
+        yield orphan, ["checkpoint events for a package that doesn't exist"]
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from checkpoint_registry import CheckpointRegistry
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI"))
+    db = client["veriseal_db"]
+    registry = CheckpointRegistry()
+    await registry.load(db)
+
+    print(f"Checking journeys against {len(registry.transitions)} allowed transitions")
+    illegal = 0
+    async for package_id, problems in audit_journeys(db, registry.transitions):
+        illegal += 1
+        for problem in problems:
+            print(f"{package_id}: {problem}")
+    print(f"✅ Audit finished: {illegal} package(s) with illegal journeys")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,122 @@
+"""
+Bulk ingestion of ESP32 sensor readings.
+
+Devices post batches of readings, either as a JSON array or as an NDJSON
+stream. Each chunk is validated in one call through a pydantic TypeAdapter
+over a list of TypedDicts (so valid readings come out as plain dicts, ready
+to insert), and only falls back to per-item validation when the chunk has
+errors, to work out which items were bad. Valid readings are written with
+unordered insert_many into the `telemetry` time-series collection.
+"""
+
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+from pymongo.errors import BulkWriteError
+from typing_extensions import NotRequired, TypedDict
+
+from indexes import ensure_timeseries_collection
+
+TELEMETRY_COLLECTION = "telemetry"
+
+# Readings validated and written per insert_many
+CHUNK_SIZE = 5000
+
+
+class TelemetryReading(TypedDict):
+    recorded_at: datetime
+    temperature: float
+    humidity: NotRequired[Optional[float]]
+    battery_level: int
+    shock_detected: NotRequired[bool]
+    tamper_status: NotRequired[Optional[str]]
+    gps_location: NotRequired[Optional[str]]
+
+
+readings_adapter = TypeAdapter(List[TelemetryReading])
+reading_adapter = TypeAdapter(TelemetryReading)
+
+
+async def ensure_telemetry_collection(db):
+    await ensure_timeseries_collection(db, TELEMETRY_COLLECTION, "recorded_at", "device_id", "seconds")
+
+
+class IngestResult:
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.received = 0
+        self.accepted = 0
+        self.errors = []
+
+    def reject(self, index: int, error: str):
+        self.errors.append({"index": index, "error": error})
+
+    def to_dict(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "received": self.received,
+            "accepted": self.accepted,
+            "rejected": len(self.errors),
+            "errors": sorted(self.errors, key=lambda e: e["index"])
+        }
+
+
+def validate_chunk(raw_items: list, positions: list, result: IngestResult):
+    """
+    Validate a chunk of already-parsed items. `positions` holds each item's
+    index in the request. Returns the valid readings as dicts along with
+    their positions; invalid items are recorded on `result`.
+    """
+    try:
+        return readings_adapter.validate_python(raw_items), positions
+    except ValidationError:
+        pass
+
+    # Slow path: at least one bad item, find out which
+    readings, valid_positions = [], []
+    for item, position in zip(raw_items, positions):
+        try:
+            readings.append(reading_adapter.validate_python(item))
+            valid_positions.append(position)
+        except ValidationError as e:
+            error = e.errors(include_url=False)[0]
+            field = ".".join(str(part) for part in error["loc"])
+            result.reject(position, f"{field}: {error['msg']}" if field else error["msg"])
+    return readings, valid_positions
+
+
+async def write_chunk(db, device_id: str, readings: list, positions: list, result: IngestResult):
+    """Insert readings unordered, recording any that the server refused."""
+    if not readings:
+        return
+    for reading in readings:
+        reading["device_id"] = device_id
+    try:
+        await db[TELEMETRY_COLLECTION].insert_many(readings, ordered=False)
+        result.accepted += len(readings)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        for error in write_errors:
+            result.reject(positions[error["index"]], error.get("errmsg", "write failed"))
+        result.accepted += len(readings) - len(write_errors)
+
+
+async def ingest_items(db, device_id: str, raw_items: list, positions: list, result: IngestResult) -> list:
+    """Validate and write one chunk of parsed items. Returns the valid readings."""
+    readings, valid_positions = validate_chunk(raw_items, positions, result)
+    await write_chunk(db, device_id, readings, valid_positions, result)
+    return readings
+
+
+def parse_lines(lines: list, offset: int, result: IngestResult):
+    """Parse NDJSON lines. Returns the parsed items and their positions; bad JSON is rejected."""
+    items, positions = [], []
+    for i, line in enumerate(lines):
+        try:
+            items.append(json.loads(line))
+            positions.append(offset + i)
+        except ValueError:
+            result.reject(offset + i, "Invalid JSON")
+    return items, positions
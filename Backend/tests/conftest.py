@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+import mongomock.aggregate
+import mongomock.collection
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+
+def _ignore_sort(method):
+    # pymongo 4.11+ passes `sort` for UpdateOne/ReplaceOne in bulk writes; mongomock predates it
+    def add(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return add
+
+
+for _name in ("add_update", "add_replace"):
+    setattr(mongomock.collection.BulkOperationBuilder, _name, _ignore_sort(getattr(mongomock.collection.BulkOperationBuilder, _name)))
+
+
+def _parse_arrays(method):
+    # MongoDB evaluates the expressions inside an array literal; mongomock returns the array as written
+    def parse(self, expression):
+        if isinstance(expression, list):
+            return list(self.parse_many(expression))
+        return method(self, expression)
+    return parse
+
+
+mongomock.aggregate._Parser._parse_basic_expression = _parse_arrays(mongomock.aggregate._Parser._parse_basic_expression)
+
+
+class InterleavedCollection:
+    """A mongomock-motor collection whose calls yield to the event loop first, like a real round trip."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attr(*args, **kwargs)
+        return call
+
+
+class InterleavedDatabase:
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        return InterleavedCollection(self._db[name])
+
+    def __getattr__(self, name):
+        return InterleavedCollection(getattr(self._db, name))
+
+
+@pytest.fixture
+def db():
+    return InterleavedDatabase(AsyncMongoMockClient()["veriseal_test"])
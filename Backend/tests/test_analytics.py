@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from analytics import event_filter, export_column, summarize
+from checkpoint_events import EVENTS_COLLECTION
+from checkpoint_registry import COLLECTION as CHECKPOINTS_COLLECTION, DEFAULT_CHECKPOINTS, CheckpointRegistry
+
+
+@pytest.mark.asyncio
+async def test_export_column_streams_numeric_values(db):
+    await db[EVENTS_COLLECTION].insert_many([
+        {"meta": {"sender_id": "s1"}, "scanned_at": datetime(2026, 1, 1), "esp32_data": {"temperature": t}}
+        for t in (20.5, 30, None, 25.0)
+    ] + [
+        {"meta": {"sender_id": "s2"}, "scanned_at": datetime(2026, 1, 1), "esp32_data": {"temperature": 99.0}},
+        {"meta": {"sender_id": "s1"}, "scanned_at": datetime(2026, 1, 1), "esp32_data": {}},
+    ])
+
+    values = await export_column(db, {"meta.sender_id": "s1"}, "esp32_data.temperature")
+
+    assert sorted(values) == [20.5, 25.0, 30.0]
+    assert summarize(values)["count"] == 3
+
+
+def test_summarize_empty_column():
+    assert summarize([]) == {"count": 0}
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_range_follows_the_journey_not_the_ids(db):
+    # A transit hub whose id sorts after every CP0xx id
+    hubs = [dict(doc) for doc in DEFAULT_CHECKPOINTS]
+    hubs[1]["next_hops"] = ["CP003", "TRANSIT-DEL"]
+    hubs.append({"checkpoint_id": "TRANSIT-DEL", "name": "Delhi Transit", "location": "Delhi",
+                 "coordinates": None, "initial": False, "next_hops": ["CP004"]})
+    await db[CHECKPOINTS_COLLECTION].insert_many(hubs)
+    registry = CheckpointRegistry()
+    await registry.load(db)
+
+    assert registry.between("CP002", "CP004") == ["CP002", "CP003", "TRANSIT-DEL", "CP004"]
+    assert registry.between(to_id="CP002") == ["CP001", "CP002"]
+
+    await db[EVENTS_COLLECTION].insert_many([
+        {"meta": {"sender_id": "s1"}, "checkpoint_id": checkpoint_id, "scanned_at": datetime(2026, 1, 1)}
+        for checkpoint_id in ("CP001", "CP002", "TRANSIT-DEL", "CP004", "CP005")
+    ])
+    query = event_filter("s1", checkpoints=registry.between("CP002", "CP004"))
+    matched = [event["checkpoint_id"] async for event in db[EVENTS_COLLECTION].find(query)]
+    assert sorted(matched) == ["CP002", "CP004", "TRANSIT-DEL"]
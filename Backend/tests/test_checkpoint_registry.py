@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from checkpoint_registry import COLLECTION, DEFAULT_CHECKPOINTS, CheckpointRegistry
+
+
+class WithoutChangeStreams:
+    """A database whose collections refuse to be watched, like a standalone server."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        return WithoutChangeStreamsCollection(self._db[name])
+
+
+class WithoutChangeStreamsCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def hub(checkpoint_id, next_hops, initial=False):
+    return {"checkpoint_id": checkpoint_id, "name": f"Hub {checkpoint_id}", "location": f"City {checkpoint_id}",
+            "coordinates": [1.0, 2.0], "initial": initial, "next_hops": next_hops}
+
+
+def test_defaults_are_usable_before_loading():
+    registry = CheckpointRegistry()
+
+    assert [checkpoint.checkpoint_id for checkpoint in registry.all()] == [doc["checkpoint_id"] for doc in DEFAULT_CHECKPOINTS]
+    assert registry.name("CP002") == "Local Hub"
+    assert registry.name("CP999") == "Checkpoint CP999"
+    assert registry.location("CP999") == "Location CP999"
+    assert registry.transitions.next_status(None, "created", "CP001", "passed") == "at_checkpoint"
+
+
+@pytest.mark.asyncio
+async def test_loading_an_empty_collection_seeds_the_default_hubs(db):
+    registry = CheckpointRegistry()
+    await registry.load(db)
+    await registry.load(db)
+
+    assert await db[COLLECTION].count_documents({}) == len(DEFAULT_CHECKPOINTS)
+    assert registry.get("CP006").to_dict() == {**DEFAULT_CHECKPOINTS[5], "next_hops": []}
+
+
+@pytest.mark.asyncio
+async def test_loading_replaces_the_snapshot_and_its_state_machine(db):
+    await db[COLLECTION].insert_many([hub("A", ["B"], initial=True), hub("B", [])])
+    registry = CheckpointRegistry()
+    before = registry.all()
+    await registry.load(db)
+
+    assert registry.get("CP001") is None
+    assert registry.get("A").coordinates == (1.0, 2.0)
+    assert registry.get("A").next_hops == frozenset({"B"})
+    assert registry.transitions.next_status("A", "at_checkpoint", "B", "passed") == "delivered"
+    assert registry.transitions.next_status(None, "created", "CP001", "passed") is None
+    assert registry.between() == ["A", "B"]
+    # Readers holding the old snapshot are unaffected
+    assert before[0].checkpoint_id == "CP001"
+    with pytest.raises(TypeError):
+        registry._checkpoints["C"] = None
+
+
+@pytest.mark.asyncio
+async def test_without_change_streams_the_registry_polls(db):
+    registry = CheckpointRegistry(ttl=0.01)
+    await registry.load(db)
+    registry.start(WithoutChangeStreams(db))
+    try:
+        await db[COLLECTION].insert_one(hub("CP007", []))
+        for _ in range(100):
+            if registry.get("CP007") is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert registry.get("CP007").name == "Hub CP007"
+    finally:
+        await registry.stop()
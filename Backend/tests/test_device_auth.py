@@ -0,0 +1,53 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+from device_auth import DEVICE_KEY_HEADER, DEVICES_COLLECTION
+
+SENDER = {"sub": "merchant-1", "role": "sender"}
+
+
+class DeviceRequest:
+    def __init__(self, device_key=None):
+        self.headers = {DEVICE_KEY_HEADER: device_key} if device_key else {}
+
+
+@pytest.fixture
+def devices(db):
+    main.app.mongodb = db
+    return db
+
+
+@pytest.mark.asyncio
+async def test_only_the_current_key_is_accepted(devices):
+    first = (await main.create_device_key("ESP32-1", SENDER))["device_key"]
+    await main.require_device("ESP32-1", DeviceRequest(first))
+
+    second = (await main.create_device_key("ESP32-1", SENDER))["device_key"]
+    await main.require_device("ESP32-1", DeviceRequest(second))
+    for device_key in (first, None, "guess"):
+        with pytest.raises(HTTPException) as denied:
+            await main.require_device("ESP32-1", DeviceRequest(device_key))
+        assert denied.value.status_code == 401
+
+    # The key is only stored hashed
+    device = await devices[DEVICES_COLLECTION].find_one({"_id": "ESP32-1"})
+    assert second not in device.values()
+
+
+@pytest.mark.asyncio
+async def test_a_key_works_only_for_its_own_device(devices):
+    device_key = (await main.create_device_key("ESP32-1", SENDER))["device_key"]
+    with pytest.raises(HTTPException) as denied:
+        await main.require_device("ESP32-2", DeviceRequest(device_key))
+    assert denied.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_another_sender_cannot_take_over_a_device(devices):
+    device_key = (await main.create_device_key("ESP32-1", SENDER))["device_key"]
+
+    with pytest.raises(HTTPException) as denied:
+        await main.create_device_key("ESP32-1", {"sub": "merchant-2", "role": "sender"})
+    assert denied.value.status_code == 403
+    await main.require_device("ESP32-1", DeviceRequest(device_key))
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from checkpoint_events import EVENTS_COLLECTION
+from hub_rollups import ROLLUP_COLLECTION, STAGING_COLLECTION, backfill, scan_increments
+
+T0 = datetime(2026, 3, 1, 9, 0)
+
+
+def event(package_id, checkpoint_id, minutes, status="passed"):
+    return {
+        "meta": {"package_id": package_id},
+        "checkpoint_id": checkpoint_id,
+        "status": status,
+        "scanned_at": T0 + timedelta(minutes=minutes),
+    }
+
+
+def test_rescan_at_the_same_hub_is_not_an_arrival():
+    assert scan_increments("CP001", T0, "CP001", "passed", T0 + timedelta(minutes=5)) == {}
+    increments = scan_increments("CP001", T0, "CP002", "failed", T0 + timedelta(minutes=10))
+    assert increments[("CP002", T0)] == {"arrivals": 1, "failures": 1}
+    assert increments[("CP001", T0)]["dwell_seconds_total"] == 600
+
+
+@pytest.mark.asyncio
+async def test_backfill_replaces_the_live_rollups_in_one_step(db):
+    await db[ROLLUP_COLLECTION].insert_one({"hub": "CP009", "hour": T0, "arrivals": 99})
+    await db[EVENTS_COLLECTION].insert_many([
+        event("PKG-1", "CP001", 0),
+        event("PKG-1", "CP001", 5),
+        event("PKG-1", "CP002", 20),
+        event("PKG-2", "CP001", 10),
+    ])
+
+    assert await backfill(db, batch_size=2) == 4
+
+    rows = {row["hub"]: row async for row in db[ROLLUP_COLLECTION].find({}, {"_id": 0})}
+    assert set(rows) == {"CP001", "CP002"}
+    assert rows["CP001"]["arrivals"] == 2
+    assert rows["CP001"]["departures"] == 1
+    assert rows["CP001"]["dwell_seconds_total"] == 1200
+    assert rows["CP002"]["arrivals"] == 1
+    assert STAGING_COLLECTION not in await db._db.list_collection_names()
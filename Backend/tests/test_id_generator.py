@@ -0,0 +1,75 @@
+import id_generator
+from id_generator import (
+    EPOCH_MS, ID_PREFIX, MAX_NODE, MAX_SEQUENCE, NODE_BITS, SEQUENCE_BITS,
+    PackageIdGenerator, encode_base32, new_package_token, new_pin
+)
+
+
+class FrozenTime:
+    def __init__(self, ms):
+        self.ms = ms
+
+    def time(self):
+        return self.ms / 1000
+
+
+def frozen(monkeypatch, ms=EPOCH_MS + 1_000_000):
+    clock = FrozenTime(ms)
+    monkeypatch.setattr(id_generator, "time", clock)
+    return clock
+
+
+def test_ids_are_unique_fixed_width_and_sorted():
+    ids = PackageIdGenerator(node_id=7).next_ids(50_000)
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert {len(package_id) for package_id in ids} == {len(ID_PREFIX) + 13}
+    assert all(package_id.startswith(ID_PREFIX) for package_id in ids)
+
+
+def test_id_layout(monkeypatch):
+    clock = frozen(monkeypatch)
+    value = PackageIdGenerator(node_id=5).next_int()
+    assert value >> (NODE_BITS + SEQUENCE_BITS) == clock.ms - EPOCH_MS
+    assert (value >> SEQUENCE_BITS) & MAX_NODE == 5
+    assert value & MAX_SEQUENCE == 0
+
+
+def test_exhausted_sequence_borrows_the_next_millisecond(monkeypatch):
+    frozen(monkeypatch)
+    generator = PackageIdGenerator(node_id=1)
+    values = [generator.next_int() for _ in range(MAX_SEQUENCE + 3)]
+    assert values == sorted(set(values))
+    assert values[-1] >> (NODE_BITS + SEQUENCE_BITS) == (values[0] >> (NODE_BITS + SEQUENCE_BITS)) + 1
+
+
+def test_clock_going_backwards_keeps_ids_increasing(monkeypatch):
+    clock = frozen(monkeypatch)
+    generator = PackageIdGenerator(node_id=1)
+    first = generator.next_int()
+    clock.ms -= 5000
+    assert generator.next_int() > first
+
+
+def test_nodes_never_collide(monkeypatch):
+    frozen(monkeypatch)
+    a, b = PackageIdGenerator(node_id=1), PackageIdGenerator(node_id=2)
+    assert not set(a.next_ids(1000)) & set(b.next_ids(1000))
+
+
+def test_node_id_from_environment(monkeypatch):
+    monkeypatch.setenv("NODE_ID", str(MAX_NODE + 3))
+    assert PackageIdGenerator().node_id == 2
+
+
+def test_encode_base32_keeps_numeric_order():
+    values = [0, 1, 31, 32, 1023, 2 ** 40, 2 ** 63]
+    assert [encode_base32(v) for v in values] == sorted(encode_base32(v) for v in values)
+
+
+def test_tokens_and_pins():
+    tokens = {new_package_token() for _ in range(1000)}
+    assert len(tokens) == 1000
+    assert {len(token) for token in tokens} == {32}
+    pin = new_pin()
+    assert len(pin) == 6 and pin.isdigit()
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from indexes import HOT_QUERIES, INDEXES, find_collscans
+
+IXSCAN_PLAN = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+COLLSCAN_PLAN = {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}
+SHARDED_COLLSCAN_PLAN = {"queryPlanner": {"winningPlan": {"stage": "SHARD_MERGE", "shards": [
+    {"winningPlan": {"stage": "IXSCAN"}},
+    {"winningPlan": {"stage": "COLLSCAN"}},
+]}}}
+
+
+class ExplainCursor:
+    def __init__(self, plan):
+        self.plan = plan
+        self.sorted_by = None
+
+    def sort(self, sort):
+        self.sorted_by = sort
+        return self
+
+    async def explain(self):
+        return self.plan
+
+
+class ExplainCollection:
+    def __init__(self, plans, name):
+        self.plans = plans
+        self.name = name
+
+    def find(self, query):
+        return ExplainCursor(self.plans(self.name, query))
+
+
+class ExplainDatabase:
+    """Answers explain() with a plan chosen per (collection, query)."""
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    def __getitem__(self, name):
+        return ExplainCollection(self.plans, name)
+
+
+@pytest.mark.asyncio
+async def test_find_collscans_reports_only_collection_scans():
+    def plans(collection, query):
+        if collection == "seals":
+            return COLLSCAN_PLAN
+        if "package_token" in query:
+            return SHARDED_COLLSCAN_PLAN
+        return IXSCAN_PLAN
+
+    collscans = await find_collscans(ExplainDatabase(plans))
+
+    expected = [description for description, collection, query, _ in HOT_QUERIES
+                if collection == "seals" or "package_token" in query]
+    assert collscans == expected
+    assert "scan by package_token" in collscans
+
+
+@pytest.mark.asyncio
+async def test_find_collscans_with_every_query_indexed():
+    assert await find_collscans(ExplainDatabase(lambda collection, query: IXSCAN_PLAN)) == []
+
+
+def _serves(index_keys, query, sort):
+    """
+    Without a sort, the index must lead with one of the equality fields. With
+    one, it must lead with all of them (any order), then the sort fields in
+    order or all reversed.
+    """
+    fields = [field for field, _ in index_keys]
+    equality = set(query)
+    if not sort:
+        return bool(fields) and fields[0] in equality
+    if set(fields[:len(equality)]) != equality:
+        return False
+    rest = index_keys[len(equality):]
+    wanted = list(sort)
+    reversed_wanted = [(field, -direction) for field, direction in sort]
+    return rest[:len(sort)] in (wanted, reversed_wanted)
+
+
+@pytest.mark.parametrize("description,collection,query,sort", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_every_hot_query_has_an_index(description, collection, query, sort):
+    indexes = [list(model.document["key"].items()) for model in INDEXES.get(collection, [])]
+    assert any(_serves(keys, query, sort) for keys in indexes), f"no index serves {description!r}"
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URI"), reason="needs a MongoDB server in MONGO_TEST_URI")
+@pytest.mark.asyncio
+async def test_no_collscans_on_a_real_server():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from checkpoint_events import ensure_events_collection
+    from indexes import ensure_indexes
+
+    client = AsyncIOMotorClient(os.environ["MONGO_TEST_URI"])
+    db = client["veriseal_index_test"]
+    try:
+        await ensure_events_collection(db)
+        await ensure_indexes(db)
+        assert await find_collscans(db) == []
+    finally:
+        await client.drop_database("veriseal_index_test")
+        client.close()
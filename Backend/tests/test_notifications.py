@@ -0,0 +1,144 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+from notifications import (
+    DEAD_LETTER_COLLECTION, OUTBOX_COLLECTION, FakeProvider, NotificationDispatcher, NotificationOutbox,
+    PermanentFailure, pin_notification
+)
+
+PACKAGE = {"package_id": "PKG1", "receiver_phone": "+910000000000"}
+
+
+class RejectingProvider(FakeProvider):
+    async def send(self, to, message):
+        raise PermanentFailure("invalid number")
+
+
+async def deliver(db, provider):
+    dispatcher = NotificationDispatcher([provider])
+    dispatcher._db = db
+    await db[OUTBOX_COLLECTION].insert_one(pin_notification(PACKAGE, "424242"))
+    await dispatcher._slots.acquire()
+    await dispatcher._deliver(await dispatcher._claim())
+    return dispatcher
+
+
+@pytest.mark.asyncio
+async def test_sent_message_drops_its_text(db):
+    provider = FakeProvider()
+    dispatcher = await deliver(db, provider)
+
+    assert provider.sent == [("+910000000000", "Your VeriSeal PIN is 424242")]
+    stored = await db[OUTBOX_COLLECTION].find_one({})
+    assert stored["status"] == "sent"
+    assert "message" not in stored
+    assert dispatcher.metrics["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_is_redacted(db):
+    await deliver(db, RejectingProvider())
+
+    assert await db[OUTBOX_COLLECTION].count_documents({}) == 0
+    dead = await db[DEAD_LETTER_COLLECTION].find_one({})
+    assert dead["status"] == "dead"
+    assert dead["last_error"] == "invalid number"
+    assert "message" not in dead
+
+
+class TransactionalCollection:
+    """In-memory collection with a unique package_id whose session writes only land on commit."""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True, session=None):
+        taken = {doc.get("package_id") for doc in self.docs + session.pending(self)}
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc.get("package_id") is not None and doc["package_id"] in taken:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+                continue
+            taken.add(doc.get("package_id"))
+            session.writes.append((self, doc))
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+class Transaction:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        self.session.writes = []
+
+    async def __aexit__(self, error_type, error, tb):
+        if error is None:
+            for collection, doc in self.session.writes:
+                collection.docs.append(doc)
+        self.session.writes = []
+
+
+class Session:
+    writes = []
+
+    def pending(self, collection):
+        return [doc for target, doc in self.writes if target is collection]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def start_transaction(self):
+        return Transaction(self)
+
+
+class TransactionalDb:
+    def __init__(self):
+        self.collections = {}
+        self.client = self
+
+    async def start_session(self):
+        return Session()
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, TransactionalCollection())
+
+
+def packages(*ids):
+    return [{"package_id": package_id, "receiver_phone": "+910000000000"} for package_id in ids]
+
+
+@pytest.mark.asyncio
+async def test_insert_many_with_writes_packages_and_messages_together():
+    db = TransactionalDb()
+    db["packages"].docs.append({"package_id": "PKG2"})
+    outbox = NotificationOutbox(db)
+    docs = packages("PKG1", "PKG2", "PKG3")
+
+    with pytest.raises(BulkWriteError) as failed:
+        await outbox.insert_many_with(db["packages"], docs, [pin_notification(doc, "111111") for doc in docs])
+
+    # The clash rolled the first transaction back; the other rows went in with their messages
+    assert [error["index"] for error in failed.value.details["writeErrors"]] == [1]
+    assert [doc["package_id"] for doc in db["packages"].docs] == ["PKG2", "PKG1", "PKG3"]
+    assert [message["package_id"] for message in db[OUTBOX_COLLECTION].docs] == ["PKG1", "PKG3"]
+    assert outbox.transactions is True
+
+
+@pytest.mark.asyncio
+async def test_insert_many_with_queues_messages_for_inserted_rows_without_transactions(db):
+    await db.packages.create_index("package_id", unique=True)
+    await db.packages.insert_one({"package_id": "PKG2"})
+    outbox = NotificationOutbox(db)
+    outbox.transactions = False
+    docs = packages("PKG1", "PKG2", "PKG3")
+
+    with pytest.raises(BulkWriteError):
+        await outbox.insert_many_with(db.packages, docs, [pin_notification(doc, "111111") for doc in docs])
+
+    assert await db.packages.count_documents({}) == 3
+    queued = [message["package_id"] async for message in db[OUTBOX_COLLECTION].find({})]
+    assert sorted(queued) == ["PKG1", "PKG3"]
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import main
+from body_streams import InvalidBody, aiter_json_array
+from notifications import OUTBOX_COLLECTION, NotificationOutbox
+from package_import import (
+    ImportResult, import_items, parse_csv_header, parse_csv_lines, parse_json_lines
+)
+
+ROW = {"order_id": "ORD-1", "package_type": "electronics", "receiver_phone": "+910000000000", "device_id": "ESP32-1"}
+
+
+def lines(result: ImportResult) -> list:
+    return [json.loads(line) for line in result.take().splitlines()]
+
+
+def test_csv_header_must_have_the_required_columns():
+    assert parse_csv_header(b"\xef\xbb\xbforder_id, package_type,receiver_phone,device_id,extra") == [
+        "order_id", "package_type", "receiver_phone", "device_id", "extra"
+    ]
+    with pytest.raises(ValueError, match="device_id, receiver_phone"):
+        parse_csv_header(b"order_id,package_type")
+
+
+def test_csv_lines_reject_bad_rows_and_drop_unknown_and_empty_optional_columns():
+    header = ["order_id", "package_type", "receiver_phone", "device_id", "notes", "extra"]
+    result = ImportResult()
+    items, positions = parse_csv_lines([
+        b"ORD-1,fragile,+91000,ESP32-1,,ignored",
+        b"ORD-2,fragile",
+        b"\xff\xfe,broken",
+    ], header, 10, result)
+
+    assert items == [{"order_id": "ORD-1", "package_type": "fragile", "receiver_phone": "+91000", "device_id": "ESP32-1"}]
+    assert positions == [10]
+    rejected = lines(result)
+    assert [(line["row"], line["status"]) for line in rejected] == [(11, "rejected"), (12, "rejected")]
+    assert rejected[0]["error"] == "Expected 6 columns, got 2"
+    assert rejected[1]["error"].startswith("Invalid CSV")
+
+
+def test_json_lines_reject_invalid_json():
+    result = ImportResult()
+    items, positions = parse_json_lines([json.dumps(ROW).encode(), b"{not json"], 0, result)
+    assert items == [ROW] and positions == [0]
+    assert lines(result) == [{"row": 1, "status": "rejected", "error": "Invalid JSON"}]
+
+
+@pytest.mark.asyncio
+async def test_invalid_rows_are_rejected_and_clashes_retried():
+    result = ImportResult()
+    built = []
+    attempts = []
+
+    def build_doc(row):
+        built.append(row["order_id"])
+        return {**row, "package_id": f"PKG-{len(built)}", "package_token": f"tok-{len(built)}"}, "123456"
+
+    async def insert(docs, pins):
+        attempts.append([doc["package_id"] for doc in docs])
+        if len(attempts) == 1:
+            # The second row's generated ID is already taken
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000"}]})
+
+    created = await import_items(insert, [ROW, {**ROW, "order_id": "ORD-2"}, {"order_id": "ORD-3"}], [0, 1, 2], build_doc, result)
+
+    assert [doc["order_id"] for doc, _ in created] == ["ORD-1", "ORD-2"]
+    assert attempts == [["PKG-1", "PKG-2"], ["PKG-3"]]
+    by_row = {line["row"]: line for line in lines(result)}
+    assert by_row[2]["status"] == "rejected" and by_row[2]["error"].startswith("package_type")
+    assert by_row[1]["package_id"] == "PKG-3"
+    assert result.summary() == {"received": 0, "created": 2, "rejected": 1}
+
+
+async def stream(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_json_array_elements_stream_across_chunk_boundaries():
+    body = json.dumps([ROW, {"order_id": "ORD-é"}]).encode()
+    items = [item async for item in aiter_json_array(stream(*(body[i:i + 3] for i in range(0, len(body), 3))))]
+    assert items == [ROW, {"order_id": "ORD-é"}]
+
+    with pytest.raises(InvalidBody):
+        [item async for item in aiter_json_array(stream(b'{"rows": []}'))]
+    with pytest.raises(InvalidBody):
+        [item async for item in aiter_json_array(stream(b'[{"a": 1}, {"a": '))]
+
+
+class UploadRequest:
+    def __init__(self, body: bytes, content_type: str, chunk_size: int = 64):
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i:i + self._chunk_size]
+
+
+@pytest.fixture
+def importer(db, monkeypatch):
+    main.app.mongodb = db
+    main.app.notification_outbox = NotificationOutbox(db)
+    main.app.notification_outbox.transactions = False
+    monkeypatch.setattr(main, "PACKAGE_IMPORT_CHUNK_SIZE", 2)
+    return db
+
+
+async def upload(body: bytes, content_type: str) -> list:
+    response = await main.bulk_create_packages(UploadRequest(body, content_type), {"sub": "merchant-1"})
+    return [part async for part in response.body_iterator]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_streams_results_per_chunk(importer):
+    body = b"\n".join(json.dumps({**ROW, "order_id": f"ORD-{i}"}).encode() for i in range(5))
+    parts = await upload(body, "application/x-ndjson")
+
+    # Three chunks of rows, then the summary
+    assert len(parts) == 4
+    results = [json.loads(line) for part in parts for line in part.splitlines()]
+    assert [r["row"] for r in results[:-1]] == [0, 1, 2, 3, 4]
+    assert all(r["status"] == "created" and len(r["pin"]) == 6 for r in results[:-1])
+    assert results[-1] == {"summary": {"received": 5, "created": 5, "rejected": 0}}
+    assert await importer.packages.count_documents({"sender_id": "merchant-1"}) == 5
+    assert await importer[OUTBOX_COLLECTION].count_documents({}) == 5
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_from_csv_and_a_json_array_that_breaks_off(importer):
+    csv_body = b"order_id,package_type,receiver_phone,device_id\nORD-1,fragile,+91000,ESP32-1\nORD-2,fragile\n"
+    results = [json.loads(line) for part in await upload(csv_body, "text/csv") for line in part.splitlines()]
+    assert sorted((r["row"], r["status"]) for r in results[:-1]) == [(0, "created"), (1, "rejected")]
+    assert results[-1]["summary"] == {"received": 2, "created": 1, "rejected": 1}
+
+    json_body = json.dumps([ROW, ROW, ROW]).encode()[:-20]
+    results = [json.loads(line) for part in await upload(json_body, "application/json") for line in part.splitlines()]
+    assert sorted((r["row"], r["status"]) for r in results[:-1]) == [(0, "created"), (1, "created"), (2, "rejected")]
+    assert results[-1]["summary"] == {"received": 3, "created": 2, "rejected": 1}
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_rejects_a_body_that_isnt_an_import(importer):
+    with pytest.raises(main.HTTPException) as not_array:
+        await upload(b'{"order_id": "ORD-1"}', "application/json")
+    assert not_array.value.status_code == 400
+
+    with pytest.raises(main.HTTPException) as no_columns:
+        await upload(b"order_id,notes\n", "text/csv")
+    assert no_columns.value.status_code == 400
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+
+import main
+from checkpoint_events import EVENTS_COLLECTION
+
+SENDER = {"sub": "merchant-1", "role": "sender"}
+T0 = datetime(2026, 3, 1, 9, 0)
+
+
+def checkpoint(i: int, at: datetime) -> dict:
+    return {
+        "checkpoint_id": f"CP00{i % 6 + 1}", "name": "Hub", "location": "Mumbai", "scanned_by": "courier-1",
+        "scanned_at": at, "esp32_data": {"temperature": 20.0 + i}, "status": "passed", "notes": None
+    }
+
+
+@pytest_asyncio.fixture
+async def package(db):
+    main.app.mongodb = db
+    doc = {
+        "package_id": "PKG-1", "order_id": "ORD-1", "sender_id": SENDER["sub"],
+        "current_status": "in_transit", "current_location": "Mumbai", "created_at": T0, "updated_at": T0
+    }
+    await db.packages.insert_one(doc)
+    return doc
+
+
+async def whole_journey(package_id: str, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page = await main.get_package_journey(package_id, cursor, limit, SENDER)
+        pages.append(page["checkpoints"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_pages_dont_skip_scans_that_share_a_timestamp(db, package):
+    # A burst of scans recorded within the same instant, straddling page boundaries
+    times = [T0, T0, T0, T0 + timedelta(minutes=1), T0 + timedelta(minutes=1), T0 + timedelta(minutes=2)]
+    await db[EVENTS_COLLECTION].insert_many([
+        {"_id": ObjectId(), "meta": {"package_id": "PKG-1"}, **checkpoint(i, at)} for i, at in enumerate(times)
+    ])
+
+    pages = await whole_journey("PKG-1", limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 2]
+    temperatures = [entry["esp32_data"]["temperature"] for page in pages for entry in page]
+    assert temperatures == [20.0, 21.0, 22.0, 23.0, 24.0, 25.0]
+
+
+@pytest.mark.asyncio
+async def test_unmigrated_journey_pages_past_the_first_page(db, package):
+    await db.packages.update_one({"_id": package["_id"]}, {"$set": {
+        "checkpoints": [checkpoint(i, T0 + timedelta(minutes=i // 2)) for i in range(5)]
+    }})
+
+    pages = await whole_journey("PKG-1", limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [entry["esp32_data"]["temperature"] for page in pages for entry in page] == [20.0, 21.0, 22.0, 23.0, 24.0]
+    assert "_id" not in pages[0][0]
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import (
+    MAX_PAGE_SIZE, clamp_limit, decode_cursor, encode_cursor, next_cursor, page_filter, page_sort
+)
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+async def seed(db):
+    # Three items share each timestamp, so pages have to break ties on _id
+    docs = [{"_id": ObjectId(), "updated_at": T0 + timedelta(minutes=i // 3)} for i in range(10)]
+    await db.packages.insert_many(docs)
+    return docs
+
+
+async def walk(db, limit, ascending=False, **window):
+    pages, cursor = [], None
+    while True:
+        query = page_filter("updated_at", cursor, ascending=ascending, **window)
+        items = await db.packages.find(query).sort(page_sort("updated_at", ascending)).limit(limit + 1).to_list(length=None)
+        cursor = next_cursor(items, limit, "updated_at")
+        pages.append([item["_id"] for item in items])
+        if cursor is None:
+            return pages
+
+
+def order(docs, ascending=False):
+    return [doc["_id"] for doc in sorted(docs, key=lambda doc: (doc["updated_at"], doc["_id"]), reverse=not ascending)]
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_item_once_across_ties(db):
+    docs = await seed(db)
+
+    pages = await walk(db, limit=4)
+
+    assert [len(page) for page in pages] == [4, 4, 2]
+    assert [doc_id for page in pages for doc_id in page] == order(docs)
+
+
+@pytest.mark.asyncio
+async def test_ascending_pages_start_from_the_oldest(db):
+    docs = await seed(db)
+
+    pages = await walk(db, limit=3, ascending=True)
+
+    assert [doc_id for page in pages for doc_id in page] == order(docs, ascending=True)
+
+
+@pytest.mark.asyncio
+async def test_pages_stay_inside_the_time_window(db):
+    docs = await seed(db)
+    since, until = T0 + timedelta(minutes=1), T0 + timedelta(minutes=2)
+
+    pages = await walk(db, limit=2, since=since, until=until)
+
+    inside = [doc for doc in docs if since <= doc["updated_at"] <= until]
+    assert [doc_id for page in pages for doc_id in page] == order(inside)
+
+
+def test_last_page_has_no_cursor():
+    items = [{"_id": ObjectId(), "updated_at": T0}]
+    assert next_cursor(items, 1, "updated_at") is None
+    assert len(items) == 1
+
+
+def test_cursor_round_trips_and_is_url_safe():
+    doc_id = ObjectId()
+    cursor = encode_cursor(T0, doc_id)
+
+    assert decode_cursor(cursor) == (T0, doc_id)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(T0, "x")[:-4], "eyJ0IjoiMjAyNiJ9"])
+def test_bad_cursors_are_a_400(cursor):
+    with pytest.raises(HTTPException) as bad:
+        decode_cursor(cursor)
+    assert bad.value.status_code == 400
+
+
+def test_limits_are_clamped():
+    assert [clamp_limit(limit) for limit in (-5, 0, 1, 50, 10 ** 6)] == [1, 1, 1, 50, MAX_PAGE_SIZE]
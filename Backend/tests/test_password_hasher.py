@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from password_hasher import HashingOverloaded, PasswordHasher, hash_rounds
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify():
+    hasher = PasswordHasher(workers=2, rounds=4)
+    try:
+        hashed = await hasher.hash("correct horse")
+        assert await hasher.verify("correct horse", hashed)
+        assert not await hasher.verify("wrong horse", hashed)
+    finally:
+        hasher.shutdown()
+
+    assert hash_rounds(hashed) == 4
+    assert hasher.metrics["hashed"] == 1 and hasher.metrics["verified"] == 2
+
+
+@pytest.mark.asyncio
+async def test_hashes_with_another_cost_factor_need_a_rehash():
+    legacy, hasher = PasswordHasher(rounds=4), PasswordHasher(rounds=5)
+    try:
+        old = await legacy.hash("secret")
+        assert hasher.needs_rehash(old)
+
+        new = await hasher.rehash("secret")
+        assert not hasher.needs_rehash(new)
+        assert await hasher.verify("secret", new)
+    finally:
+        legacy.shutdown()
+        hasher.shutdown()
+    assert hasher.metrics["rehashed"] == 1
+
+
+def test_hash_rounds_of_something_that_is_not_a_bcrypt_hash():
+    assert hash_rounds("$2b$12$abcdefghijklmnopqrstuv") == 12
+    assert hash_rounds("plaintext") == -1
+
+
+@pytest.mark.asyncio
+async def test_jobs_beyond_the_queue_are_rejected_not_queued():
+    hasher = PasswordHasher(workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+    try:
+        # One job running, one waiting: the pool is full
+        jobs = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HashingOverloaded) as overloaded:
+            await hasher._run(release.wait)
+        assert overloaded.value.retry_after == 3
+        assert hasher.stats()["in_flight"] == 2
+
+        release.set()
+        assert await asyncio.gather(*jobs) == [True, True]
+    finally:
+        release.set()
+        hasher.shutdown()
+
+    assert hasher.metrics["rejected"] == 1
+    assert hasher.stats()["in_flight"] == 0
+    # Room again once the backlog has drained
+    assert await hasher._run(lambda: "done") == "done"
+    hasher.shutdown()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from profile_cache import UserProfileCache
+
+USER_ID = ObjectId()
+
+
+class Users:
+    """A users collection whose find_one waits until released."""
+
+    def __init__(self, error=None):
+        self.queries = 0
+        self.error = error
+        self.release = asyncio.Event()
+        self.user = {"_id": USER_ID, "username": "asha", "email": "asha@example.com", "role": "sender"}
+
+    async def find_one(self, query, projection=None):
+        self.queries += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return dict(self.user) if query["_id"] == self.user["_id"] else None
+
+
+async def started(*coroutines):
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    await asyncio.sleep(0)
+    return tasks
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_query():
+    cache, users = UserProfileCache(), Users()
+    tasks = await started(*(cache.get(users, USER_ID) for _ in range(10)))
+    users.release.set()
+
+    profiles = await asyncio.gather(*tasks)
+
+    assert users.queries == 1
+    assert all(profile["username"] == "asha" for profile in profiles)
+    assert cache.metrics == {"hits": 0, "misses": 1, "coalesced": 9}
+    assert await cache.get(users, USER_ID) is profiles[0]
+    assert cache.metrics["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_during_a_load_keeps_it_out_of_the_cache():
+    cache, users = UserProfileCache(), Users()
+    [task] = await started(cache.get(users, USER_ID))
+    cache.invalidate(USER_ID)
+    users.release.set()
+    assert (await task)["username"] == "asha"
+
+    users.user["username"] = "asha.k"
+    assert (await cache.get(users, USER_ID))["username"] == "asha.k"
+    assert users.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_loader_error_reaches_every_waiter_and_isnt_cached():
+    cache, users = UserProfileCache(), Users(error=ConnectionError("down"))
+    tasks = await started(*(cache.get(users, USER_ID) for _ in range(3)))
+    users.release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    users.error = None
+    assert (await cache.get(users, USER_ID))["username"] == "asha"
+    assert users.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_waiters_reload_when_the_loading_request_is_cancelled():
+    cache, users = UserProfileCache(), Users()
+    loader, *waiters = await started(*(cache.get(users, USER_ID) for _ in range(3)))
+
+    loader.cancel()
+    await asyncio.sleep(0)
+    users.release.set()
+
+    profiles = await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+    assert [profile["username"] for profile in profiles] == ["asha", "asha"]
+    assert loader.cancelled()
+    # The waiters' retry is itself coalesced
+    assert users.queries == 2
@@ -0,0 +1,98 @@
+import pytest
+
+from rate_limiter import KeyState, Limit, MemoryBackend, RateLimiter, apply_hit
+
+LIMIT = Limit(attempts=3, window=60, lockout=60, max_lockout=3600)
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_apply_hit_allows_up_to_the_limit_then_locks_out():
+    state = KeyState(0.0)
+    assert [apply_hit(state, LIMIT, t).allowed for t in (0, 1, 2)] == [True, True, True]
+
+    decision = apply_hit(state, LIMIT, 3)
+    assert not decision.allowed and decision.locked
+    assert decision.retry_after == 60
+
+    # Still locked: rejected without starting a new lockout
+    decision = apply_hit(state, LIMIT, 30)
+    assert not decision.allowed and not decision.locked
+    assert decision.retry_after == pytest.approx(33)
+
+
+def test_apply_hit_doubles_lockouts_up_to_the_maximum():
+    state = KeyState(0.0)
+    now, lockouts = 0.0, []
+    for _ in range(8):
+        decision = apply_hit(state, LIMIT, now)
+        while decision.allowed:
+            decision = apply_hit(state, LIMIT, now)
+        lockouts.append(decision.retry_after)
+        now = state.locked_until
+    assert lockouts == [60, 120, 240, 480, 960, 1920, 3600, 3600]
+
+
+def test_apply_hit_forgets_strikes_after_idling():
+    state = KeyState(0.0)
+    for t in range(4):
+        apply_hit(state, LIMIT, t)
+    assert state.strikes == 1
+
+    later = state.expires_at + 1
+    assert apply_hit(state, LIMIT, later).allowed
+    assert state.strikes == 0
+
+
+def test_apply_hit_weights_the_previous_window():
+    state = KeyState(0.0)
+    for t in (50, 51, 52):
+        assert apply_hit(state, LIMIT, t).allowed
+    # Half of the previous window still overlaps: 3 * 0.5 + 1 attempt fits, 3 * 0.5 + 2 doesn't
+    assert apply_hit(state, LIMIT, 90).allowed
+    assert not apply_hit(state, LIMIT, 90).allowed
+
+
+def test_full_backend_keeps_lockouts_when_flooded():
+    clock = Clock()
+    backend = MemoryBackend(max_keys=10, clock=clock)
+    for _ in range(4):
+        backend.hit(("token", "victim"), LIMIT)
+    assert not backend.hit(("token", "victim"), LIMIT).allowed
+
+    for i in range(1000):
+        backend.hit(("token", f"flood-{i}"), LIMIT)
+
+    assert len(backend) == 10
+    assert not backend.hit(("token", "victim"), LIMIT).allowed
+    assert backend.evicted_protected == 0
+
+
+def test_full_backend_of_locked_keys_evicts_the_oldest():
+    clock = Clock()
+    backend = MemoryBackend(max_keys=3, clock=clock)
+    for name in ("a", "b", "c", "d"):
+        for _ in range(4):
+            backend.hit(("token", name), LIMIT)
+
+    assert len(backend) == 3
+    assert backend.evicted_protected == 1
+    assert backend.hit(("token", "a"), LIMIT).allowed
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_counts_per_scope():
+    limiter = RateLimiter({"token": LIMIT, "ip": Limit(1, 60, 60, 60)}, backend=MemoryBackend(clock=Clock()))
+    assert (await limiter.hit("ip", "10.0.0.1")).allowed
+    assert not (await limiter.hit("ip", "10.0.0.1")).allowed
+    assert (await limiter.hit("token", "t")).allowed
+
+    stats = limiter.stats()
+    assert stats["ip"] == {"allowed": 1, "rejected": 1, "lockouts": 1}
+    assert stats["token"]["allowed"] == 1
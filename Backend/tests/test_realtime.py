@@ -0,0 +1,53 @@
+import pytest
+
+import main
+from realtime import Broker, package_topics
+
+DELIVERY_USER = {"sub": "courier-1", "role": "delivery"}
+
+
+async def create_package(db):
+    doc = main.build_package_doc({
+        "order_id": "ORD-1",
+        "package_type": "electronics",
+        "device_id": "ESP32-realtime",
+        "sender_id": "merchant-1",
+        "receiver_phone": "+910000000000",
+    }, "123456")
+    await db.packages.insert_one(doc)
+    return doc
+
+
+def scan(package, checkpoint_id="CP001", key=None):
+    return main.CheckpointScan(
+        package_token=package["package_token"],
+        checkpoint_id=checkpoint_id,
+        esp32_data=main.ESP32Data(temperature=21.5, tamper_status="secure", battery_level=90),
+        status="passed",
+        idempotency_key=key,
+    )
+
+
+def test_a_move_is_published_to_the_hub_the_package_left():
+    package = {"package_id": "PKG-1", "sender_id": "merchant-1", "current_checkpoint": "CP002"}
+
+    assert package_topics(package, "CP001") == ["package:PKG-1", "sender:merchant-1", "checkpoint:CP002", "checkpoint:CP001"]
+    assert package_topics(package, "CP002") == ["package:PKG-1", "sender:merchant-1", "checkpoint:CP002"]
+
+
+@pytest.mark.asyncio
+async def test_hub_subscribers_see_packages_leave(db, monkeypatch):
+    main.app.mongodb = db
+    broker = Broker()
+    monkeypatch.setattr(main, "broker", broker)
+    package = await create_package(db)
+    await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+
+    warehouse = broker.subscribe(["checkpoint:CP001"])
+    hub = broker.subscribe(["checkpoint:CP002"])
+    await main.scan_checkpoint(scan(package, "CP002", key="to-hub"), DELIVERY_USER)
+
+    for subscriber in (warehouse, hub):
+        [delta] = await subscriber.next_batch()
+        assert delta["package_id"] == package["package_id"]
+        assert delta["current_checkpoint"] == "CP002"
@@ -0,0 +1,83 @@
+import pytest
+
+from receiver_access import ReceiverCache, check_pin, pin_hash, seal_data, seal_status
+
+KEY = b"pin-key"
+
+
+def package(token="tok-1", device_id="ESP32-1", **fields):
+    return {"package_id": f"PKG-{token}", "package_token": token, "device_id": device_id,
+            "pin_hash": pin_hash(KEY, token, "123456"), "current_status": "at_checkpoint", **fields}
+
+
+def test_pin_is_checked_against_the_hash_for_its_own_token():
+    summary = package()
+
+    assert check_pin(KEY, "tok-1", "123456", summary)
+    assert not check_pin(KEY, "tok-1", "654321", summary)
+    # The same PIN for another package hashes differently
+    assert not check_pin(KEY, "tok-2", "123456", summary)
+    assert not check_pin(b"other-key", "tok-1", "123456", summary)
+
+
+def test_legacy_plaintext_pins_still_verify():
+    assert check_pin(KEY, "tok-1", "123456", {"pin": 123456})
+    assert not check_pin(KEY, "tok-1", "000000", {"pin": "123456"})
+    assert not check_pin(KEY, "tok-1", "123456", {})
+
+
+def test_seal_data_carries_no_pin_material():
+    data = seal_data(package(authenticated=None))
+
+    assert data["seal_id"] == "ESP32-1" and data["authenticated"] is False
+    assert not {"pin", "pin_hash"} & set(data)
+
+
+@pytest.mark.parametrize("fields, violation", [
+    ({}, None),
+    ({"last_checkpoint_status": "failed"}, "checkpoint_failed"),
+    ({"latest_alert": {"type": "temperature_spike", "message": "41°C"}, "last_checkpoint_status": "failed"}, "temperature_spike"),
+    ({"latest_esp32_data": {"tamper_status": "tampered"}, "latest_alert": {"type": "shock"}}, "tampered"),
+])
+def test_seal_status_reports_the_most_serious_violation(fields, violation):
+    status = seal_status(package(**fields))
+
+    assert status["violation_type"] == violation
+    assert status["status"] == ("SAFE" if violation is None else "VIOLATION")
+
+
+@pytest.mark.asyncio
+async def test_summaries_are_cached_until_invalidated(db):
+    await db.packages.insert_one(package())
+    cache = ReceiverCache()
+
+    assert (await cache.get(db.packages, "tok-1"))["current_status"] == "at_checkpoint"
+    await db.packages.update_one({"package_token": "tok-1"}, {"$set": {"current_status": "delivered"}})
+    assert (await cache.get(db.packages, "tok-1"))["current_status"] == "at_checkpoint"
+
+    cache.invalidate("tok-1")
+    assert (await cache.get(db.packages, "tok-1"))["current_status"] == "delivered"
+    assert cache.stats() == {"hits": 1, "misses": 2, "cached": 1}
+
+
+@pytest.mark.asyncio
+async def test_device_alerts_invalidate_every_package_on_the_device(db):
+    await db.packages.insert_many([package("tok-1"), package("tok-2"), package("tok-3", device_id="ESP32-2")])
+    cache = ReceiverCache()
+    for token in ("tok-1", "tok-2", "tok-3"):
+        await cache.get(db.packages, token)
+
+    cache.invalidate_device("ESP32-1")
+
+    assert cache.stats()["cached"] == 1
+    assert await cache.get(db.packages, "tok-3") is not None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_tokens_are_not_cached(db):
+    cache = ReceiverCache()
+
+    assert await cache.get(db.packages, "missing") is None
+    assert await cache.get(db.packages, "missing") is None
+    assert cache.stats() == {"hits": 0, "misses": 2, "cached": 0}
@@ -0,0 +1,178 @@
+import asyncio
+import random
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+import main
+from checkpoint_events import EVENTS_COLLECTION
+from hub_rollups import ROLLUP_COLLECTION
+
+DELIVERY_USER = {"sub": "courier-1", "role": "delivery"}
+
+
+async def create_package(db, order_id="ORD-1"):
+    doc = main.build_package_doc({
+        "order_id": order_id,
+        "package_type": "electronics",
+        "device_id": f"ESP32-{order_id}",
+        "sender_id": "merchant-1",
+        "receiver_phone": "+910000000000",
+    }, "123456")
+    await db.packages.insert_one(doc)
+    return doc
+
+
+@pytest_asyncio.fixture
+async def package(db):
+    main.app.mongodb = db
+    return await create_package(db)
+
+
+def scan(package, checkpoint_id="CP001", status="passed", key=None):
+    return main.CheckpointScan(
+        package_token=package["package_token"],
+        checkpoint_id=checkpoint_id,
+        esp32_data=main.ESP32Data(temperature=21.5, tamper_status="secure", battery_level=90),
+        status=status,
+        idempotency_key=key,
+    )
+
+
+async def event_keys(db, package):
+    return [
+        event.get("scan_key")
+        async for event in db[EVENTS_COLLECTION].find({"meta.package_id": package["package_id"]})
+    ]
+
+
+async def hub_total(db, hub, counter):
+    return sum([row.get(counter, 0) async for row in db[ROLLUP_COLLECTION].find({"hub": hub})])
+
+
+@pytest.mark.asyncio
+async def test_parallel_scans_are_recorded_exactly_once(db, package):
+    # 1000 scans over 50 packages (the first package is the fixture's), 20 each,
+    # well inside the MAX_SCAN_KEYS retry window
+    packages = [package] + [await create_package(db, f"ORD-{i}") for i in range(2, 51)]
+    scans = [(p, f"{p['order_id']}-scan-{i}") for p in packages for i in range(20)]
+    # Every scan sent twice, all at once, in random order
+    requests = scans + scans
+    random.Random(7).shuffle(requests)
+
+    responses = await asyncio.gather(
+        *(main.scan_checkpoint(scan(p, key=key), DELIVERY_USER) for p, key in requests),
+        return_exceptions=True
+    )
+
+    failures = [r for r in responses if isinstance(r, BaseException) and not (
+        isinstance(r, HTTPException) and r.status_code == 409 and "still being recorded" in r.detail
+    )]
+    assert failures == []
+
+    for p in packages:
+        stored = await db.packages.find_one({"_id": p["_id"]})
+        assert stored["checkpoints_count"] == 20
+        assert sorted(await event_keys(db, p)) == sorted(key for owner, key in scans if owner is p)
+    assert await db[main.SCAN_RECEIPTS_COLLECTION].count_documents({"response": {"$exists": True}}) == 1000
+
+    # Each package arrived at the hub once; its other scans were re-scans there
+    assert await hub_total(db, "CP001", "arrivals") == 50
+
+
+@pytest.mark.asyncio
+async def test_retry_returns_the_original_response(db, package):
+    first = await main.scan_checkpoint(scan(package, key="retry-me"), DELIVERY_USER)
+    again = await main.scan_checkpoint(scan(package, key="retry-me"), DELIVERY_USER)
+
+    assert again == first
+    assert await event_keys(db, package) == ["retry-me"]
+
+
+@pytest.mark.asyncio
+async def test_retry_finishes_a_scan_cut_short_after_the_package_update(db, package, monkeypatch):
+    await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+
+    async def crash(*args, **kwargs):
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(main, "record_hub_scan", crash)
+    with pytest.raises(HTTPException) as failed:
+        await main.scan_checkpoint(scan(package, "CP002", key="to-hub"), DELIVERY_USER)
+    assert failed.value.status_code == 500
+    monkeypatch.undo()
+
+    # The package moved, but the rollup and receipt were never written
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    assert stored["current_checkpoint"] == "CP002"
+    assert await db[ROLLUP_COLLECTION].find_one({"hub": "CP002"}) is None
+
+    # Let the failed request's claim run out, then retry
+    await db[main.SCAN_RECEIPTS_COLLECTION].update_many(
+        {"response": {"$exists": False}},
+        {"$set": {"claimed_at": stored["updated_at"] - main.SCAN_RECORDING_LEASE}}
+    )
+    response = await main.scan_checkpoint(scan(package, "CP002", key="to-hub"), DELIVERY_USER)
+
+    assert response["message"] == "Checkpoint scan recorded successfully"
+    assert response["checkpoint_id"] == "CP002"
+    assert sorted(await event_keys(db, package)) == ["at-warehouse", "to-hub"]
+    assert await hub_total(db, "CP002", "arrivals") == 1
+    assert await hub_total(db, "CP001", "departures") == 1
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    assert stored["checkpoints_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_illegal_move_is_rejected(db, package):
+    with pytest.raises(HTTPException) as rejected:
+        await main.scan_checkpoint(scan(package, "CP004", key="skip-ahead"), DELIVERY_USER)
+    assert rejected.value.status_code == 409
+    assert await event_keys(db, package) == []
+
+
+@pytest.mark.asyncio
+async def test_scan_journal_keeps_only_where_the_package_came_from(db, package):
+    await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+    await main.scan_checkpoint(scan(package, "CP002", key="to-hub"), DELIVERY_USER)
+
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    journal = stored["scan_journal"]
+    assert [entry["key"] for entry in journal] == ["at-warehouse", "to-hub"]
+    assert journal[1]["previous_checkpoint"] == "CP001"
+    assert set(journal[1]) == {"key", "previous_checkpoint", "previous_arrived_at"}
+    # A finished receipt keeps the response, not the scan
+    receipt = await db[main.SCAN_RECEIPTS_COLLECTION].find_one({"_id": f"{package['package_token']}:to-hub"})
+    assert "entry" not in receipt and receipt["response"]["checkpoint_id"] == "CP002"
+
+
+@pytest.mark.asyncio
+async def test_retry_records_a_scan_cut_short_before_the_package_update(db, package, monkeypatch):
+    def crash(*args, **kwargs):
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(main, "summary_update", crash)
+    with pytest.raises(HTTPException):
+        await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+    monkeypatch.undo()
+
+    # Claimed but never applied: a retry inside the lease is told to wait
+    with pytest.raises(HTTPException) as waiting:
+        await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+    assert waiting.value.status_code == 409
+
+    await db[main.SCAN_RECEIPTS_COLLECTION].update_many(
+        {}, {"$set": {"claimed_at": main.datetime.now() - main.SCAN_RECORDING_LEASE}}
+    )
+    response = await main.scan_checkpoint(scan(package, key="at-warehouse"), DELIVERY_USER)
+
+    assert response["message"] == "Checkpoint scan recorded successfully"
+    assert await event_keys(db, package) == ["at-warehouse"]
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    assert stored["checkpoints_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rejected_scan_releases_its_key(db, package):
+    with pytest.raises(HTTPException):
+        await main.scan_checkpoint(scan(package, "CP004", key="reused"), DELIVERY_USER)
+    assert await db[main.SCAN_RECEIPTS_COLLECTION].count_documents({}) == 0
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from checkpoint_registry import CheckpointRegistry
+from hub_rollups import hour_of
+from scan_sync import plan_events, plan_increments, plan_sync
+
+T0 = datetime(2026, 3, 1, 9, 0)
+READING = {"temperature": 21.0, "tamper_status": "secure", "battery_level": 90}
+
+
+def package(token="tok-1", **fields):
+    return {
+        "_id": ObjectId(),
+        "package_id": f"PKG-{token}",
+        "package_token": token,
+        "sender_id": "merchant-1",
+        "device_id": "ESP32-1",
+        "current_checkpoint": None,
+        "current_status": "created",
+        "last_scanned_at": None,
+        "checkpoints_count": 0,
+        **fields
+    }
+
+
+def scan(key, checkpoint_id, minutes, token="tok-1", status="passed"):
+    return {
+        "package_token": token,
+        "checkpoint_id": checkpoint_id,
+        "esp32_data": READING,
+        "status": status,
+        "notes": None,
+        "scanned_at": T0 + timedelta(minutes=minutes),
+        "idempotency_key": key,
+    }
+
+
+def plan(scans, *packages):
+    return plan_sync(scans, {p["package_token"]: p for p in packages}, CheckpointRegistry(), "courier-1")
+
+
+def test_scans_apply_in_time_order():
+    # Sent out of order: the queue is sorted per package by scanned_at
+    results, plans = plan([scan("b", "CP002", 30), scan("a", "CP001", 0), scan("c", "CP003", 90)], package())
+
+    assert [r["status"] for r in results] == ["applied"] * 3
+    [p] = plans
+    assert [e["checkpoint_id"] for e in p.entries] == ["CP001", "CP002", "CP003"]
+    assert p.keys == ["a", "b", "c"]
+    assert p.positions == [1, 0, 2]
+
+    update = p.update(CheckpointRegistry(), T0)
+    assert update["$inc"] == {"checkpoints_count": 3}
+    assert update["$set"]["current_checkpoint"] == "CP003"
+    assert update["$set"]["current_status"] == "at_checkpoint"
+    assert update["$set"]["hub_arrived_at"] == T0 + timedelta(minutes=90)
+    assert update["$push"]["scan_keys"]["$each"] == ["a", "b", "c"]
+    assert update["$push"]["scan_journal"]["$each"][1] == {
+        "key": "b", "previous_checkpoint": "CP001", "previous_arrived_at": T0
+    }
+    assert p.filter() == {"_id": p.package["_id"], "last_scanned_at": None}
+    assert [event["scan_key"] for event in plan_events(p)] == ["a", "b", "c"]
+
+
+def test_duplicates_in_batch_and_already_applied():
+    existing = package(current_checkpoint="CP001", current_status="at_checkpoint",
+                       last_scanned_at=T0, hub_arrived_at=T0, scan_keys=["seen"])
+    results, plans = plan([scan("seen", "CP002", 10), scan("new", "CP002", 20), scan("new", "CP002", 20)], existing)
+
+    assert [r["status"] for r in results] == ["duplicate", "applied", "duplicate"]
+    assert plans[0].keys == ["new"]
+
+
+def test_out_of_order_unknown_illegal_and_missing():
+    existing = package(current_checkpoint="CP002", current_status="at_checkpoint",
+                       last_scanned_at=T0 + timedelta(hours=1))
+    results, plans = plan([
+        scan("old", "CP003", 30),
+        scan("nowhere", "CP999", 70),
+        scan("skip", "CP006", 80),
+        scan("lost", "CP001", 0, token="missing"),
+    ], existing)
+
+    assert [r["status"] for r in results] == ["out_of_order", "rejected", "rejected", "not_found"]
+    assert "Unknown checkpoint" in results[1]["detail"]
+    assert "cannot move from CP002" in results[2]["detail"]
+    assert plans == []
+
+
+def test_rejected_scan_doesnt_move_the_plan():
+    results, plans = plan([scan("a", "CP001", 0), scan("b", "CP004", 10), scan("c", "CP002", 20)], package())
+    assert [r["status"] for r in results] == ["applied", "rejected", "applied"]
+    assert [e["checkpoint_id"] for e in plans[0].entries] == ["CP001", "CP002"]
+
+
+def test_failed_scan_then_rescan_at_same_hub():
+    results, plans = plan([
+        scan("a", "CP001", 0),
+        scan("b", "CP002", 10, status="failed"),
+        scan("c", "CP002", 20),
+    ], package())
+    assert [r["status"] for r in results] == ["applied"] * 3
+    update = plans[0].update(CheckpointRegistry(), T0)
+    assert update["$set"]["current_status"] == "at_checkpoint"
+    # Arrived at CP002 with the failed scan; the re-scan doesn't move that
+    assert update["$set"]["hub_arrived_at"] == T0 + timedelta(minutes=10)
+
+
+def test_plan_increments_count_arrivals_and_dwell():
+    existing = package(current_checkpoint="CP001", current_status="at_checkpoint",
+                       last_scanned_at=T0 + timedelta(minutes=5), hub_arrived_at=T0)
+    _, plans = plan([scan("a", "CP001", 10), scan("b", "CP002", 20), scan("c", "CP002", 50)], existing)
+
+    increments = {}
+    plan_increments(plans[0], increments)
+    hour = hour_of(T0)
+    # Re-scan at CP001 is not an arrival; dwell there counts from the original arrival
+    assert increments[("CP001", hour)] == {
+        "departures": 1, "dwell_seconds_total": 1200.0, "dwell_histogram.le_1800": 1
+    }
+    assert increments[("CP002", hour)] == {"arrivals": 1}
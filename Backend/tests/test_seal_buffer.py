@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from seal_buffer import SealWriteBuffer
+
+T0 = datetime(2026, 1, 1, 12, 0)
+
+
+class FlakyCollection:
+    """Fails the first `failures` bulk writes."""
+
+    def __init__(self, collection, failures=1):
+        self.collection = collection
+        self.failures = failures
+
+    async def bulk_write(self, requests, **kwargs):
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        return await self.collection.bulk_write(requests, **kwargs)
+
+
+async def seal(db, seal_id):
+    return await db.seals.find_one({"seal_id": seal_id}, {"_id": 0})
+
+
+@pytest.mark.asyncio
+async def test_durable_puts_return_once_written_and_coalesce_per_seal(db):
+    buffer = SealWriteBuffer(flush_interval=0.01)
+    buffer.start(db.seals)
+    try:
+        await asyncio.gather(
+            buffer.put("seal-1", "SECURE", T0 + timedelta(seconds=5)),
+            buffer.put("seal-1", "TAMPERED", T0),
+            buffer.put("seal-2", "SECURE", T0),
+        )
+        assert await seal(db, "seal-1") == {"seal_id": "seal-1", "status": "TAMPERED", "last_updated": T0 + timedelta(seconds=5)}
+        assert (await seal(db, "seal-2"))["status"] == "SECURE"
+    finally:
+        await buffer.stop()
+
+    stats = buffer.stats()
+    assert stats["received"] == 3 and stats["written"] == 2 and stats["flushes"] == 1
+    assert stats["coalescing_ratio"] == 1.5
+
+
+@pytest.mark.asyncio
+async def test_a_full_buffer_flushes_before_the_interval(db):
+    buffer = SealWriteBuffer(flush_interval=60, max_items=2)
+    buffer.start(db.seals)
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            buffer.put("seal-1", "SECURE", T0),
+            buffer.put("seal-2", "SECURE", T0),
+        ), timeout=1)
+    finally:
+        await buffer.stop()
+    assert buffer.metrics["written"] == 2
+
+
+@pytest.mark.asyncio
+async def test_fast_mode_writes_what_is_queued_on_stop(db):
+    buffer = SealWriteBuffer(flush_interval=60, durable=False)
+    buffer.start(db.seals)
+    await buffer.put("seal-1", "TAMPERED", T0)
+    assert await seal(db, "seal-1") is None
+
+    await buffer.stop()
+    assert (await seal(db, "seal-1"))["status"] == "TAMPERED"
+
+
+@pytest.mark.asyncio
+async def test_a_failed_flush_fails_durable_puts(db):
+    buffer = SealWriteBuffer(flush_interval=0.01)
+    buffer.start(FlakyCollection(db.seals))
+    try:
+        with pytest.raises(AutoReconnect):
+            await buffer.put("seal-1", "TAMPERED", T0)
+        # Nothing is retried behind the caller's back
+        assert buffer.stats()["pending"] == 0
+        await buffer.put("seal-1", "TAMPERED", T0)
+    finally:
+        await buffer.stop()
+    assert buffer.metrics["flush_errors"] == 1
+    assert (await seal(db, "seal-1"))["status"] == "TAMPERED"
+
+
+@pytest.mark.asyncio
+async def test_a_failed_flush_requeues_fast_mode_updates_behind_newer_ones(db):
+    buffer = SealWriteBuffer(durable=False)
+    buffer.start(FlakyCollection(db.seals))
+    await buffer.stop()  # flush by hand from here on
+
+    await buffer.put("seal-1", "SECURE", T0)
+    await buffer.put("seal-2", "SECURE", T0)
+    flush = asyncio.ensure_future(buffer.flush())
+    await asyncio.sleep(0)
+    # Reported while the failing flush is in flight: newer than the requeued update
+    await buffer.put("seal-2", "TAMPERED", T0 + timedelta(seconds=1))
+    with pytest.raises(AutoReconnect):
+        await flush
+
+    await buffer.flush()
+    assert (await seal(db, "seal-1"))["status"] == "SECURE"
+    assert (await seal(db, "seal-2"))["status"] == "TAMPERED"
@@ -0,0 +1,108 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+from checkpoint_events import EVENTS_COLLECTION
+from checkpoint_registry import CheckpointRegistry
+from state_machine import INITIAL_STATUS, audit_journeys, check_journey, compile_transitions
+
+Hub = namedtuple("Hub", "checkpoint_id initial next_hops")
+
+# A -> B -> (C | D), C -> D; D is final
+HUBS = [
+    Hub("A", True, frozenset({"B"})),
+    Hub("B", False, frozenset({"C", "D"})),
+    Hub("C", False, frozenset({"D"})),
+    Hub("D", False, frozenset()),
+]
+
+
+@pytest.fixture
+def table():
+    return compile_transitions(HUBS)
+
+
+def test_new_package_only_starts_at_an_initial_hub(table):
+    assert table.next_status(None, INITIAL_STATUS, "A", "passed") == "at_checkpoint"
+    assert table.next_status(None, INITIAL_STATUS, "B", "passed") is None
+
+
+def test_moves_along_next_hops_or_stays(table):
+    assert table.next_status("A", "at_checkpoint", "B", "passed") == "at_checkpoint"
+    assert table.next_status("B", "checkpoint_failed", "B", "passed") == "at_checkpoint"
+    assert table.next_status("A", "at_checkpoint", "C", "passed") is None
+    assert table.next_status("C", "at_checkpoint", "B", "passed") is None
+
+
+def test_final_hub_delivers_and_delivered_is_terminal(table):
+    assert table.next_status("C", "at_checkpoint", "D", "passed") == "delivered"
+    assert table.next_status("C", "at_checkpoint", "D", "pending") == "checkpoint_failed"
+    assert table.next_status("D", "delivered", "D", "passed") is None
+
+
+def test_status_after_and_scan_filter(table):
+    assert table.status_after("B", "failed") == "checkpoint_failed"
+    assert table.status_after("Z", "passed") is None
+
+    query = table.scan_filter("D", "passed")
+    sources = {(branch["current_status"], frozenset(branch["current_checkpoint"]["$in"])) for branch in query["$or"]}
+    assert sources == {
+        ("at_checkpoint", frozenset({"B", "C", "D"})),
+        ("checkpoint_failed", frozenset({"B", "C", "D"})),
+    }
+    assert table.scan_filter("Z", "passed") == {"current_status": {"$in": []}}
+
+
+def test_default_hubs_compile():
+    registry = CheckpointRegistry()
+    assert len(registry.transitions) > 0
+    assert registry.transitions.next_status(None, INITIAL_STATUS, "CP001", "passed") == "at_checkpoint"
+    assert registry.transitions.next_status("CP005", "at_checkpoint", "CP006", "passed") == "delivered"
+
+
+def scans(*steps):
+    return [{"checkpoint_id": checkpoint_id, "status": status} for checkpoint_id, status in steps]
+
+
+def test_check_journey_accepts_a_legal_journey(table):
+    journey = scans(("A", "passed"), ("B", "failed"), ("B", "passed"), ("D", "passed"))
+    assert check_journey(table, {"current_checkpoint": "D", "current_status": "delivered"}, journey) == []
+
+
+def test_check_journey_reports_illegal_steps_and_carries_on(table):
+    journey = scans(("A", "passed"), ("C", "passed"), ("D", "passed"))
+    problems = check_journey(table, {"current_checkpoint": "D", "current_status": "delivered"}, journey)
+    assert problems == ["scan 2: illegal move from A (at_checkpoint) to C"]
+
+
+def test_check_journey_reports_a_stored_state_mismatch(table):
+    problems = check_journey(table, {"current_checkpoint": "A", "current_status": "at_checkpoint"}, scans(("A", "passed"), ("B", "passed")))
+    assert problems == ["package is at A (at_checkpoint) but its scans end at B (at_checkpoint)"]
+    assert check_journey(table, {"current_status": INITIAL_STATUS}, []) == []
+
+
+@pytest.mark.asyncio
+async def test_audit_journeys_merges_packages_and_events(db, table):
+    t0 = datetime(2026, 3, 1)
+    await db.packages.insert_many([
+        {"package_id": "P1", "current_checkpoint": "B", "current_status": "at_checkpoint"},
+        {"package_id": "P3", "current_checkpoint": "C", "current_status": "at_checkpoint"},
+        # Not migrated: checkpoints still embedded
+        {"package_id": "P5", "current_checkpoint": "B", "current_status": "at_checkpoint",
+         "checkpoints": scans(("A", "passed"), ("B", "passed"))},
+    ])
+    events = [("P1", "A"), ("P1", "B"), ("P2", "A"), ("P3", "A"), ("P3", "C"), ("P9", "A")]
+    await db[EVENTS_COLLECTION].insert_many([
+        {"meta": {"package_id": package_id}, "checkpoint_id": checkpoint_id, "status": "passed",
+         "scanned_at": t0 + timedelta(minutes=i)}
+        for i, (package_id, checkpoint_id) in enumerate(events)
+    ])
+
+    report = [(package_id, problems) async for package_id, problems in audit_journeys(db, table)]
+
+    assert report == [
+        ("P2", ["checkpoint events for a package that doesn't exist"]),
+        ("P3", ["scan 2: illegal move from A (at_checkpoint) to C"]),
+        ("P9", ["checkpoint events for a package that doesn't exist"]),
+    ]
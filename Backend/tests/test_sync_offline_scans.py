@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+import main
+from checkpoint_events import EVENTS_COLLECTION
+from hub_rollups import ROLLUP_COLLECTION
+
+DELIVERY_USER = {"sub": "courier-1", "role": "delivery"}
+
+
+@pytest_asyncio.fixture
+async def package(db):
+    main.app.mongodb = db
+    doc = main.build_package_doc({
+        "order_id": "ORD-1",
+        "package_type": "electronics",
+        "device_id": "ESP32-sync",
+        "sender_id": "merchant-1",
+        "receiver_phone": "+910000000000",
+    }, "123456")
+    await db.packages.insert_one(doc)
+    return doc
+
+
+def queue(package, *scans):
+    start = datetime.now() - timedelta(hours=1)
+    return main.ScanSyncBatch(scans=[
+        main.OfflineScan(
+            package_token=package["package_token"],
+            checkpoint_id=checkpoint_id,
+            esp32_data=main.ESP32Data(temperature=21.5, tamper_status="secure", battery_level=90),
+            status="passed",
+            scanned_at=start + timedelta(minutes=minutes),
+            idempotency_key=key,
+        )
+        for key, checkpoint_id, minutes in scans
+    ])
+
+
+QUEUE = (("a", "CP001", 0), ("b", "CP002", 20))
+
+
+async def event_keys(db, package):
+    return sorted([
+        event.get("scan_key")
+        async for event in db[EVENTS_COLLECTION].find({"meta.package_id": package["package_id"]})
+    ])
+
+
+async def hub_total(db, hub, counter):
+    return sum([row.get(counter, 0) async for row in db[ROLLUP_COLLECTION].find({"hub": hub})])
+
+
+@pytest.mark.asyncio
+async def test_sync_records_events_rollups_and_receipts(db, package):
+    response = await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+
+    assert response["applied"] == 2
+    assert await event_keys(db, package) == ["a", "b"]
+    assert await hub_total(db, "CP002", "arrivals") == 1
+    assert await hub_total(db, "CP001", "departures") == 1
+    assert await db[main.SCAN_RECEIPTS_COLLECTION].count_documents({"response": {"$exists": True}}) == 2
+
+    again = await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+    assert [result["status"] for result in again["results"]] == ["duplicate", "duplicate"]
+    assert await event_keys(db, package) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_resend_finishes_a_sync_killed_after_the_package_update(db, package, monkeypatch):
+    def crash(plan):
+        raise ConnectionError("connection reset")
+    monkeypatch.setattr(main, "plan_events", crash)
+    with pytest.raises(HTTPException) as failed:
+        await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+    assert failed.value.status_code == 500
+    monkeypatch.undo()
+
+    # The package moved, but no events or rollups were written
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    assert stored["current_checkpoint"] == "CP002"
+    assert await event_keys(db, package) == []
+
+    # While the dead request's claim lasts, the scans aren't reported as done
+    waiting = await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+    assert [result["status"] for result in waiting["results"]] == ["conflict", "conflict"]
+
+    await db[main.SCAN_RECEIPTS_COLLECTION].update_many(
+        {}, {"$set": {"claimed_at": datetime.now() - main.SCAN_RECORDING_LEASE}}
+    )
+    resent = await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+
+    assert [result["status"] for result in resent["results"]] == ["duplicate", "duplicate"]
+    assert await event_keys(db, package) == ["a", "b"]
+    assert await hub_total(db, "CP002", "arrivals") == 1
+    assert await hub_total(db, "CP001", "departures") == 1
+    assert await db[main.SCAN_RECEIPTS_COLLECTION].count_documents({"response": {"$exists": True}}) == 2
+    stored = await db.packages.find_one({"_id": package["_id"]})
+    assert stored["checkpoints_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_conflicted_scans_are_not_recorded_or_observed(db, package, monkeypatch):
+    claim = main.claim_scan_receipts
+
+    async def claim_then_scan_concurrently(entries):
+        unclaimed = await claim(entries)
+        await db.packages.update_one({"_id": package["_id"]}, {"$set": {"last_scanned_at": datetime.now()}})
+        return unclaimed
+    monkeypatch.setattr(main, "claim_scan_receipts", claim_then_scan_concurrently)
+    readings = main.anomaly_detector.metrics["readings"]
+
+    response = await main.sync_offline_scans(queue(package, *QUEUE), DELIVERY_USER)
+
+    assert [result["status"] for result in response["results"]] == ["conflict", "conflict"]
+    assert main.anomaly_detector.metrics["readings"] == readings
+    assert await event_keys(db, package) == []
+    # Released, so the re-send can claim them
+    assert await db[main.SCAN_RECEIPTS_COLLECTION].count_documents({}) == 0
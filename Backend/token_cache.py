@@ -0,0 +1,87 @@
+"""
+Cached JWT verification.
+
+Verified tokens are remembered by their SHA-256 digest until they expire, so
+a dashboard sending the same token on every request pays for the HMAC check
+once. Revoked tokens (logout) are remembered until their own expiry and
+rejected before the cache is consulted.
+
+Both caches are per process: with several workers a logout takes effect
+immediately on the worker that handled it and at token expiry elsewhere.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+import jwt
+
+from ttl_cache import TTLCache
+
+
+class InvalidToken(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: str
+    email: str
+    role: str
+    expires_at: float
+    token_digest: str
+    claims: dict = field(repr=False, compare=False)
+
+
+class TokenVerifier:
+    def __init__(self, secret: str, algorithm: str, maxsize: int = 10000, max_revoked: int = 100000):
+        self.secret = secret
+        self.algorithm = algorithm
+        self._verified = TTLCache(maxsize)
+        self._revoked = TTLCache(max_revoked)
+        self.metrics = {"hits": 0, "misses": 0, "revoked_rejections": 0}
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def verify(self, token: str) -> Principal:
+        digest = self.digest(token)
+        if digest in self._revoked:
+            self.metrics["revoked_rejections"] += 1
+            raise InvalidToken("Token has been revoked")
+
+        principal = self._verified.get(digest)
+        if principal is not None:
+            self.metrics["hits"] += 1
+            return principal
+
+        self.metrics["misses"] += 1
+        try:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        if payload.get("sub") is None:
+            raise InvalidToken("Token has no subject")
+
+        expires_at = float(payload.get("exp", time.time()))
+        principal = Principal(
+            user_id=payload["sub"],
+            email=payload.get("email"),
+            role=payload.get("role"),
+            expires_at=expires_at,
+            token_digest=digest,
+            claims=payload
+        )
+        self._verified.set(digest, principal, expires_at=expires_at)
+        return principal
+
+    def revoke(self, principal: Principal):
+        self._revoked.set(principal.token_digest, True, expires_at=principal.expires_at)
+        self._verified.pop(principal.token_digest)
+
+    def stats(self) -> dict:
+        stats = dict(self.metrics)
+        stats["cached"] = len(self._verified)
+        stats["revoked"] = len(self._revoked)
+        return stats
@@ -0,0 +1,63 @@
+# chain_reader.py
+import asyncio
+
+# Read layer for view calls on the contract.
+#
+# Calls are grouped into JSON-RPC batches (one HTTP request carrying up to
+# `batch_size` eth_call payloads) and the batches run concurrently, at most
+# `max_concurrency` at a time. Results come back in the same order as the
+# calls went in, so reading 10k logs with the defaults costs 100 requests
+# instead of 10k.
+#
+# Web3 versions without batch_requests (checked once, at construction) and
+# providers that refuse a batch fall back to plain calls, one per entry, so
+# the same code still works against local test chains. A refused batch only
+# falls back for that batch; the next one is tried as a batch again.
+
+
+class ContractReader:
+    def __init__(self, web3, contract, batch_size=100, max_concurrency=4, retries=3, backoff=0.5):
+        self.web3 = web3
+        self.contract = contract
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._batching = hasattr(web3, "batch_requests")
+
+    async def log_count(self):
+        return await asyncio.to_thread(self.contract.functions.getLogCount().call)
+
+    async def read_logs(self, indices):
+        """Returns [(index, timestamp, deviceId, userId), ...] in the order given."""
+        indices = list(indices)
+        results = await self.call_many([self.contract.functions.allLogs(i) for i in indices])
+        return [(i, entry[0], entry[1], entry[2]) for i, entry in zip(indices, results)]
+
+    async def call_many(self, calls):
+        batches = [calls[i:i + self.batch_size] for i in range(0, len(calls), self.batch_size)]
+        results = await asyncio.gather(*(self._run_batch(batch) for batch in batches))
+        return [result for batch in results for result in batch]
+
+    async def _run_batch(self, calls):
+        async with self._semaphore:
+            for attempt in range(self.retries):
+                try:
+                    return await asyncio.to_thread(self._execute, calls)
+                except Exception as e:
+                    if attempt == self.retries - 1:
+                        raise
+                    delay = self.backoff * (2 ** attempt)
+                    print(f"Batch of {len(calls)} calls failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    def _execute(self, calls):
+        if self._batching:
+            try:
+                with self.web3.batch_requests() as batch:
+                    for call in calls:
+                        batch.add(call)
+                    return list(batch.execute())
+            except NotImplementedError as e:
+                print(f"Provider refused a batch request ({e}), using single calls")
+        return [call.call() for call in calls]
@@ -0,0 +1,153 @@
+# log_mirror.py
+import asyncio
+import sqlite3
+import threading
+
+# Local SQLite copy of the contract's access logs.
+#
+# The contract stores logs in an append-only array, so the mirror only has
+# to fetch indices at or above what it already has, in batched reads through
+# ContractReader. To cope with reorgs the last few entries are re-read on
+# every pass and overwritten if they changed, and the table is truncated if
+# the chain's log count goes down.
+#
+# Indices are stored without gaps from 0, so the row count is MAX(idx) + 1,
+# read once from the primary key at startup and kept up to date by every
+# write instead of running COUNT(*) on each request and sync pass.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS access_logs (
+    idx INTEGER PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    device_id TEXT NOT NULL,
+    user_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_access_logs_device ON access_logs (device_id, idx);
+CREATE INDEX IF NOT EXISTS idx_access_logs_user ON access_logs (user_id, idx);
+CREATE INDEX IF NOT EXISTS idx_access_logs_time ON access_logs (timestamp, idx);
+"""
+
+
+class LogMirror:
+    def __init__(self, path, reader, reorg_depth=12, chunk_size=1000):
+        self.reader = reader
+        self.reorg_depth = reorg_depth
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._count = self._db.execute("SELECT COALESCE(MAX(idx) + 1, 0) FROM access_logs").fetchone()[0]
+        self._task = None
+        self.chain_count = None
+        self.reorgs_repaired = 0
+
+    # --- Queries ---
+
+    def count(self):
+        return self._count
+
+    def query(self, cursor=None, limit=100, device_id=None, user_id=None, since=None, until=None):
+        """
+        Newest-first page of logs. `cursor` is the index of the last log on
+        the previous page; the returned cursor is None on the last page.
+        """
+        clauses, params = [], []
+        if cursor is not None:
+            clauses.append("idx < ?")
+            params.append(cursor)
+        if device_id:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until)
+
+        sql = "SELECT idx, timestamp, device_id, user_id FROM access_logs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY idx DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        logs = [
+            {"index": idx, "timestamp": ts, "deviceId": device, "userId": user}
+            for idx, ts, device, user in rows[:limit]
+        ]
+        return logs, next_cursor
+
+    # --- Syncing ---
+
+    def start(self, interval=15.0):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._db.close()
+
+    async def _run(self, interval):
+        while True:
+            try:
+                await self.sync_once()
+            except Exception as e:
+                print(f"Error syncing log mirror: {e}")
+            await asyncio.sleep(interval)
+
+    async def sync_once(self):
+        total = await self.reader.log_count()
+        self.chain_count = total
+
+        synced = self.count()
+        if total < synced:
+            # The chain lost entries we had already mirrored
+            self._truncate(total)
+            self.reorgs_repaired += 1
+            synced = total
+
+        start = max(0, synced - self.reorg_depth)
+        while start < total:
+            end = min(total, max(start + self.chunk_size, synced))
+            rows = await self.reader.read_logs(range(start, end))
+            self._store(rows, verify_below=synced)
+            start = end
+
+        return total
+
+    def _store(self, rows, verify_below):
+        with self._lock:
+            if verify_below:
+                existing = dict(
+                    (r[0], r) for r in self._db.execute(
+                        "SELECT idx, timestamp, device_id, user_id FROM access_logs WHERE idx >= ? AND idx < ?",
+                        (rows[0][0], verify_below),
+                    )
+                )
+                if any(row[0] in existing and existing[row[0]] != row for row in rows):
+                    self.reorgs_repaired += 1
+            self._db.executemany(
+                "INSERT OR REPLACE INTO access_logs (idx, timestamp, device_id, user_id) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            self._count = max(self._count, max(row[0] for row in rows) + 1)
+
+    def _truncate(self, count):
+        with self._lock:
+            self._db.execute("DELETE FROM access_logs WHERE idx >= ?", (count,))
+            self._db.commit()
+            self._count = min(self._count, count)
@@ -0,0 +1,224 @@
+# log_writer.py
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from web3.exceptions import TransactionNotFound
+
+# Background pipeline that writes access logs to the contract.
+#
+# The API only enqueues a (deviceId, userId) pair and hands back a tracking
+# id. A single writer task owns the nonce counter, so transactions can be
+# signed and sent back to back without asking the node for a nonce each
+# time, and receipts are awaited in separate tasks so many transactions can
+# be in flight at once. Those tasks poll for the receipt and sleep between
+# polls, so a pending transaction doesn't hold a worker thread.
+#
+# web3 is used through its normal synchronous API, with every call pushed
+# onto a worker thread. That keeps this working with any provider, including
+# EthereumTesterProvider for local testing:
+#
+#   w3 = Web3(Web3.EthereumTesterProvider())
+#   writer = LogWriter(w3, contract, account, private_key)
+
+logger = logging.getLogger(__name__)
+
+# How nodes word a rejected nonce (geth/erigon, openethereum, eth-tester);
+# the cure is the same for all of them: ask the node for the next one
+STALE_NONCE_ERRORS = ("nonce too low", "nonce is too low", "invalid transaction nonce")
+
+
+class NonceRetriesExhausted(Exception):
+    """The node kept rejecting the nonce after every resync."""
+
+
+class LogWriter:
+    def __init__(
+        self,
+        web3,
+        contract,
+        account,
+        private_key,
+        gas_limit=200000,
+        gas_price_ttl=15.0,
+        batch_size=16,
+        max_in_flight=64,
+        receipt_timeout=300,
+        receipt_poll_interval=1.0,
+        max_tracked=10000,
+    ):
+        self.web3 = web3
+        self.contract = contract
+        self.account = account
+        self.private_key = private_key
+        self.gas_limit = gas_limit
+        self.gas_price_ttl = gas_price_ttl
+        self.batch_size = batch_size
+        self.max_tracked = max_tracked
+        self.receipt_timeout = receipt_timeout
+        self.receipt_poll_interval = receipt_poll_interval
+
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._queue = None
+        self._task = None
+        self._receipt_tasks = set()
+        self._nonce = None
+        self._gas_price = None
+        self._gas_price_at = 0.0
+        self._jobs = OrderedDict()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._receipt_tasks):
+            task.cancel()
+
+    # --- Public API ---
+
+    def submit(self, device_id, user_id):
+        """Queue a log entry and return its tracking id."""
+        tracking_id = uuid.uuid4().hex
+        job = {
+            "tracking_id": tracking_id,
+            "deviceId": device_id,
+            "userId": user_id,
+            "status": "queued",
+            "queued_at": time.time(),
+            "transaction_hash": None,
+            "nonce": None,
+            "block_number": None,
+            "error": None,
+        }
+        self._track(job)
+        self._queue.put_nowait(job)
+        return tracking_id
+
+    def get(self, tracking_id):
+        job = self._jobs.get(tracking_id)
+        return dict(job) if job else None
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "next_nonce": self._nonce,
+            "jobs": counts,
+        }
+
+    # --- Writer ---
+
+    def _track(self, job):
+        self._jobs[job["tracking_id"]] = job
+        # Forget the oldest finished jobs once the table is full
+        while len(self._jobs) > self.max_tracked:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest["status"] in ("queued", "pending"):
+                break
+            del self._jobs[oldest_id]
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            for job in batch:
+                await self._in_flight.acquire()
+                try:
+                    await self._send(job)
+                except Exception as e:
+                    self._in_flight.release()
+                    job["status"] = "failed"
+                    job["error"] = str(e)
+                    logger.error("Error submitting log %s: %s", job["tracking_id"], e)
+                    # The nonce may or may not have been consumed; ask the node
+                    self._nonce = None
+
+    async def _send(self, job, retries=3):
+        for _ in range(retries):
+            if self._nonce is None:
+                await self._sync_nonce()
+            nonce = self._nonce
+            try:
+                tx_hash = await asyncio.to_thread(self._sign_and_send, job, nonce, await self._current_gas_price())
+            except Exception as e:
+                if not any(error in str(e).lower() for error in STALE_NONCE_ERRORS):
+                    raise
+                logger.warning("Nonce %d rejected for log %s (%s), resyncing", nonce, job["tracking_id"], e)
+                self._nonce = None
+                continue
+
+            self._nonce = nonce + 1
+            job["status"] = "pending"
+            job["nonce"] = nonce
+            job["transaction_hash"] = tx_hash.hex()
+
+            task = asyncio.create_task(self._confirm(job, tx_hash))
+            self._receipt_tasks.add(task)
+            task.add_done_callback(self._receipt_tasks.discard)
+            return
+
+        raise NonceRetriesExhausted(f"Nonce still rejected after {retries} attempts")
+
+    def _sign_and_send(self, job, nonce, gas_price):
+        tx = self.contract.functions.addLog(job["deviceId"], job["userId"]).build_transaction({
+            'from': self.account.address,
+            'nonce': nonce,
+            'gas': self.gas_limit,
+            'gasPrice': gas_price
+        })
+        signed_tx = self.web3.eth.account.sign_transaction(tx, private_key=self.private_key)
+        return self.web3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+    async def _sync_nonce(self):
+        # "pending" includes our own transactions that are not mined yet
+        self._nonce = await asyncio.to_thread(
+            self.web3.eth.get_transaction_count, self.account.address, "pending"
+        )
+
+    async def _current_gas_price(self):
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self.gas_price_ttl:
+            self._gas_price = await asyncio.to_thread(lambda: self.web3.eth.gas_price)
+            self._gas_price_at = now
+        return self._gas_price
+
+    async def _wait_for_receipt(self, tx_hash):
+        deadline = time.monotonic() + self.receipt_timeout
+        while True:
+            try:
+                return await asyncio.to_thread(self.web3.eth.get_transaction_receipt, tx_hash)
+            except TransactionNotFound:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"Transaction {tx_hash.hex()} not mined after {self.receipt_timeout} seconds"
+                    )
+            await asyncio.sleep(self.receipt_poll_interval)
+
+    async def _confirm(self, job, tx_hash):
+        try:
+            receipt = await self._wait_for_receipt(tx_hash)
+            job["block_number"] = receipt.blockNumber
+            job["status"] = "confirmed" if receipt.status == 1 else "reverted"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            logger.error("Error confirming log %s: %s", job["tracking_id"], e)
+        finally:
+            self._in_flight.release()
@@ -1,8 +1,11 @@
 # main.py
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from web3 import Web3
 from dotenv import load_dotenv
+from log_writer import LogWriter
+from log_mirror import LogMirror
+from chain_reader import ContractReader
 
 # Load your secret keys from the .env file
 load_dotenv()
@@ -13,6 +16,14 @@ load_dotenv()
 YOUR_HELPER_PRIVATE_KEY = os.getenv("SERVER_PRIVATE_KEY")
 YOUR_ALCHEMY_URL = os.getenv("ALCHEMY_URL")
 
+# Where the local copy of the on-chain logs lives, and how often it syncs
+LOG_MIRROR_PATH = os.getenv("LOG_MIRROR_PATH", "access_logs.db")
+LOG_SYNC_INTERVAL = float(os.getenv("LOG_SYNC_INTERVAL", "15"))
+
+# How contract reads are grouped: calls per JSON-RPC batch and batches in flight
+READ_BATCH_SIZE = int(os.getenv("READ_BATCH_SIZE", "100"))
+READ_CONCURRENCY = int(os.getenv("READ_CONCURRENCY", "4"))
+
 # Your contract details
 CONTRACT_ADDRESS = "0x4b96Ec59eB55a82D4F35A381250e97d7E0Ddae09"
 
@@ -98,12 +109,32 @@ contract = web3.eth.contract(address=CONTRACT_ADDRESS, abi=CONTRACT_ABI)
 
 app = FastAPI()
 
+# Background writer that owns the nonce and submits transactions
+log_writer = LogWriter(web3, contract, server_account, YOUR_HELPER_PRIVATE_KEY)
+
+# Batched, concurrent view calls on the contract
+contract_reader = ContractReader(web3, contract, batch_size=READ_BATCH_SIZE, max_concurrency=READ_CONCURRENCY)
+
+# Local, indexed copy of the on-chain logs that /api/get-all-logs reads from
+log_mirror = LogMirror(LOG_MIRROR_PATH, contract_reader)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    log_writer.start()
+    log_mirror.start(LOG_SYNC_INTERVAL)
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await log_writer.stop()
+    await log_mirror.stop()
+
 # --- API ENDPOINT 1: WRITE TO BLOCKCHAIN ---
 @app.post("/api/log-access")
 async def log_access(data: dict):
     """
-    Receives data from the website and writes it to the blockchain.
+    Receives data from the website and queues it to be written to the blockchain.
     Expected JSON: {"deviceId": "ESP32_001", "userId": "User_Alice"}
+    Returns straight away with a tracking id; poll /api/log-access/{id} for the result.
     """
     device_id = data.get("deviceId")
     user_id = data.get("userId")
@@ -113,80 +144,64 @@ async def log_access(data: dict):
 
     print(f"Received log request: Device={device_id}, User={user_id}")
 
-    try:
-        # 1. Build the transaction to call the "addLog" function
-        tx = contract.functions.addLog(
-            device_id,
-            user_id
-        ).build_transaction({
-            'from': server_account.address,
-            'nonce': web3.eth.get_transaction_count(server_account.address),
-            'gas': 200000,
-            'gasPrice': web3.eth.gas_price
-        })
-
-        # 2. Sign the transaction with the helper's private key ("pen")
-        signed_tx = web3.eth.account.sign_transaction(tx, private_key=YOUR_HELPER_PRIVATE_KEY)
-        
-        # 3. Send the transaction to the "post office" (Alchemy)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        
-        # 4. Wait for the "delivery confirmation" (transaction receipt)
-        tx_receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-
-        print(f"Success! Log added to blockchain.")
-        print(f"Transaction hash: {tx_hash.hex()}")
+    tracking_id = log_writer.submit(device_id, user_id)
 
-        return {
-            "status": "success",
-            "transaction_hash": tx_hash.hex(),
-            "block_number": tx_receipt.blockNumber
-        }
+    return {
+        "status": "queued",
+        "tracking_id": tracking_id
+    }
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return {"status": "error", "message": str(e)}
+@app.get("/api/log-access/{tracking_id}")
+async def get_log_access_status(tracking_id: str):
+    """
+    Status of a queued log: queued, pending (sent, waiting to be mined),
+    confirmed, reverted or failed.
+    """
+    job = log_writer.get(tracking_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown tracking id")
+    return job
 
 # --- API ENDPOINT 2: READ FROM BLOCKCHAIN ---
 @app.get("/api/get-all-logs")
-async def get_all_logs():
+async def get_all_logs(
+    cursor: int = None,
+    limit: int = 100,
+    deviceId: str = None,
+    userId: str = None,
+    since: int = None,
+    until: int = None
+):
     """
-    Reads all access logs directly from the smart contract.
-    This is a "read-only" call, so it costs no gas.
+    Reads access logs, newest first, from the local mirror of the contract.
+    The mirror is kept up to date in the background, so this makes no RPC calls.
+    Optional filters: deviceId, userId, since/until (unix seconds).
+    Pass the returned next_cursor back as `cursor` to get the next page.
     """
     print("Received request to get all logs...")
-    
-    log_list = []
-    
+
+    limit = max(1, min(limit, 1000))
+
     try:
-        # 1. Call the "getLogCount" function on the contract
-        total_logs = contract.functions.getLogCount().call()
-        
-        # 2. Loop from the newest log to the oldest
-        # (We loop backwards so the newest logs are first)
-        for i in range(total_logs - 1, -1, -1):
-            
-            # 3. Call the "allLogs(i)" function to get the log
-            # This calls the "allLogs" function from your ABI
-            log_entry = contract.functions.allLogs(i).call()
-            
-            # log_entry looks like: [1698765432, "Device-001", "User-Alice"]
-            
-            # Format it nicely for the website
-            log_list.append({
-                "timestamp": log_entry[0],
-                "deviceId": log_entry[1],
-                "userId": log_entry[2]
-            })
+        log_list, next_cursor = log_mirror.query(
+            cursor=cursor,
+            limit=limit,
+            device_id=deviceId,
+            user_id=userId,
+            since=since,
+            until=until
+        )
 
         print(f"Successfully retrieved {len(log_list)} logs.")
-        
+
         return {
             "status": "success",
-            "log_count": total_logs,
-            "logs": log_list
+            "log_count": log_mirror.count(),
+            "chain_log_count": log_mirror.chain_count,
+            "logs": log_list,
+            "next_cursor": next_cursor
         }
-    
+
     except Exception as e:
         print(f"Error reading logs: {e}")
         return {"status": "error", "message": str(e)}
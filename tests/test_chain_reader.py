@@ -0,0 +1,63 @@
+import asyncio
+
+from chain_reader import ContractReader
+
+
+class Call:
+    def __init__(self, value):
+        self.value = value
+
+    def call(self):
+        return self.value
+
+
+class Batch:
+    def __init__(self, web3):
+        self.web3 = web3
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, call):
+        self.calls.append(call)
+
+    def execute(self):
+        if self.web3.refuse:
+            self.web3.refuse -= 1
+            raise NotImplementedError("batching not supported")
+        self.web3.batches += 1
+        return [call.value for call in self.calls]
+
+
+class BatchingWeb3:
+    def __init__(self, refuse=0):
+        self.refuse = refuse
+        self.batches = 0
+
+    def batch_requests(self):
+        return Batch(self)
+
+
+class PlainWeb3:
+    pass
+
+
+def test_a_refused_batch_falls_back_for_that_batch_only():
+    web3 = BatchingWeb3(refuse=1)
+    reader = ContractReader(web3, None, batch_size=2, max_concurrency=1)
+
+    results = asyncio.run(reader.call_many([Call(i) for i in range(6)]))
+
+    assert results == list(range(6))
+    # The first batch went out as single calls, the next two still batched
+    assert web3.batches == 2
+
+
+def test_web3_without_batch_requests_uses_single_calls():
+    reader = ContractReader(PlainWeb3(), None, batch_size=2)
+
+    assert asyncio.run(reader.call_many([Call(i) for i in range(5)])) == list(range(5))
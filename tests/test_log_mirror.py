@@ -0,0 +1,82 @@
+import asyncio
+
+from log_mirror import LogMirror
+
+
+class FakeReader:
+    """The chain's log array; read_logs records which indices were asked for."""
+
+    def __init__(self, logs):
+        self.logs = list(logs)
+        self.reads = []
+
+    async def log_count(self):
+        return len(self.logs)
+
+    async def read_logs(self, indices):
+        indices = list(indices)
+        self.reads.append(indices)
+        return [(i, *self.logs[i]) for i in indices]
+
+
+def chain(n, user="user-1"):
+    return [(1700000000 + i, f"ESP32-{i}", user) for i in range(n)]
+
+
+def mirrored(mirror):
+    logs, _ = mirror.query(limit=1000)
+    return [(log["timestamp"], log["deviceId"], log["userId"]) for log in reversed(logs)]
+
+
+def test_sync_rereads_the_newest_entries_and_repairs_a_reorg():
+    reader = FakeReader(chain(30))
+    mirror = LogMirror(":memory:", reader, reorg_depth=5, chunk_size=10)
+    asyncio.run(mirror.sync_once())
+    assert mirror.count() == 30 and mirrored(mirror) == reader.logs
+
+    # A reorg replaced two of the last entries and two more were added
+    reader.logs[27] = (1700009999, "ESP32-other", "user-2")
+    reader.logs[29] = (1700009998, "ESP32-other", "user-2")
+    reader.logs += chain(32)[30:]
+    reader.reads = []
+    asyncio.run(mirror.sync_once())
+
+    # Only the reorg window and the new entries were read
+    assert reader.reads == [list(range(25, 32))]
+    assert mirror.count() == 32 and mirrored(mirror) == reader.logs
+    assert mirror.reorgs_repaired == 1
+
+
+def test_sync_without_changes_is_not_a_reorg():
+    reader = FakeReader(chain(8))
+    mirror = LogMirror(":memory:", reader, reorg_depth=5)
+    asyncio.run(mirror.sync_once())
+    asyncio.run(mirror.sync_once())
+
+    assert mirror.reorgs_repaired == 0
+    assert mirrored(mirror) == reader.logs
+
+
+def test_sync_truncates_when_the_chain_loses_entries():
+    reader = FakeReader(chain(10))
+    mirror = LogMirror(":memory:", reader, reorg_depth=3)
+    asyncio.run(mirror.sync_once())
+
+    reader.logs = reader.logs[:6]
+    asyncio.run(mirror.sync_once())
+
+    assert mirror.count() == 6 and mirrored(mirror) == reader.logs
+    assert mirror.reorgs_repaired == 1
+
+
+def test_query_pages_newest_first():
+    reader = FakeReader(chain(5, "user-1") + chain(5, "user-2"))
+    mirror = LogMirror(":memory:", reader)
+    asyncio.run(mirror.sync_once())
+
+    first, cursor = mirror.query(limit=3, user_id="user-2")
+    second, end = mirror.query(cursor=cursor, limit=3, user_id="user-2")
+
+    assert [log["index"] for log in first] == [9, 8, 7]
+    assert [log["index"] for log in second] == [6, 5]
+    assert end is None
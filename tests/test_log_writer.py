@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("eth_tester")
+from web3 import Web3
+
+from log_writer import LogWriter
+
+# AccessLog with just what LogWriter needs, compiled with vyper 0.4.3 from:
+#
+#   struct Log:
+#       timestamp: uint256
+#       deviceId: String[64]
+#       userId: String[64]
+#
+#   logs: DynArray[Log, 1024]
+#
+#   @external
+#   def addLog(_deviceId: String[64], _userId: String[64]):
+#       self.logs.append(Log(timestamp=block.timestamp, deviceId=_deviceId, userId=_userId))
+#
+#   @external
+#   @view
+#   def getLogCount() -> uint256:
+#       return len(self.logs)
+ACCESS_LOG_BYTECODE = (
+    "0x61011d6100116100003961011d610000f35f3560e01c60026001821660011b61011901601e395f51565b63a273079a81186101115760"
+    "443610341761011557600435600401803560408111610115575060608160403750602435600401803560408111610115575060608160"
+    "a037505f546103ff81116101155760078102600101428155602060405101600182015f82601f0160051c600381116101155780156100"
+    "ab57905b8060051b6040015181840155600101818118610094575b50505050602060a05101600482015f82601f0160051c6003811161"
+    "01155780156100e857905b8060051b60a00151818401556001018181186100d1575b5050505050600181015f5550005b63618033db81"
+    "186101115734610115575f5460405260206040f35b5f5ffd5b5f80fd001800f6855820dcba1efd92fc2bd5508965b15a6b06770c8f8c"
+    "d8039040de1a5d19aed52672fc19011d810400a1657679706572830004030036"
+)
+ACCESS_LOG_ABI = [
+    {"inputs": [{"name": "_deviceId", "type": "string"}, {"name": "_userId", "type": "string"}],
+     "name": "addLog", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
+    {"inputs": [], "name": "getLogCount", "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+]
+
+
+@pytest.fixture
+def chain():
+    web3 = Web3(Web3.EthereumTesterProvider())
+    funder = web3.eth.accounts[0]
+    tx_hash = web3.eth.contract(abi=ACCESS_LOG_ABI, bytecode=ACCESS_LOG_BYTECODE).constructor().transact({"from": funder})
+    address = web3.eth.wait_for_transaction_receipt(tx_hash).contractAddress
+    account = web3.eth.account.create()
+    web3.eth.wait_for_transaction_receipt(
+        web3.eth.send_transaction({"from": funder, "to": account.address, "value": 10 ** 18})
+    )
+    return web3, web3.eth.contract(address=address, abi=ACCESS_LOG_ABI), account
+
+
+def writer_for(chain):
+    web3, contract, account = chain
+    return LogWriter(web3, contract, account, account.key, receipt_poll_interval=0.01)
+
+
+async def settled(writer, tracking_ids):
+    while True:
+        jobs = [writer.get(tracking_id) for tracking_id in tracking_ids]
+        if all(job["status"] not in ("queued", "pending") for job in jobs):
+            return jobs
+        await asyncio.sleep(0.01)
+
+
+def test_back_to_back_submits_get_consecutive_nonces_and_are_confirmed(chain):
+    web3, contract, account = chain
+
+    async def run():
+        writer = writer_for(chain)
+        writer.start()
+        try:
+            tracking_ids = [writer.submit(f"ESP32-{i}", "user-1") for i in range(5)]
+            return await settled(writer, tracking_ids)
+        finally:
+            await writer.stop()
+
+    jobs = asyncio.run(run())
+
+    assert [job["status"] for job in jobs] == ["confirmed"] * 5
+    assert [job["nonce"] for job in jobs] == [0, 1, 2, 3, 4]
+    assert all(job["block_number"] is not None for job in jobs)
+    assert contract.functions.getLogCount().call() == 5
+
+
+def test_a_nonce_used_elsewhere_is_resynced(chain):
+    web3, contract, account = chain
+
+    async def run():
+        writer = writer_for(chain)
+        writer.start()
+        try:
+            [first] = await settled(writer, [writer.submit("ESP32-1", "user-1")])
+            # Another sender with the same key takes the nonce the writer expects next
+            tx = {"to": account.address, "value": 0, "gas": 21000, "gasPrice": web3.eth.gas_price,
+                  "nonce": first["nonce"] + 1, "chainId": web3.eth.chain_id}
+            web3.eth.send_raw_transaction(account.sign_transaction(tx).raw_transaction)
+            return await settled(writer, [writer.submit("ESP32-2", "user-1")])
+        finally:
+            await writer.stop()
+
+    [job] = asyncio.run(run())
+
+    assert job["status"] == "confirmed"
+    assert job["nonce"] == 2
+    assert contract.functions.getLogCount().call() == 2
+
+
+def test_send_fails_once_the_nonce_retries_run_out(chain):
+    async def run():
+        writer = writer_for(chain)
+
+        def rejected(*args):
+            raise ValueError("nonce too low")
+        writer._sign_and_send = rejected
+        writer.start()
+        try:
+            return await settled(writer, [writer.submit("ESP32-1", "user-1")])
+        finally:
+            await writer.stop()
+
+    [job] = asyncio.run(run())
+
+    assert job["status"] == "failed"
+    assert "after 3 attempts" in job["error"]